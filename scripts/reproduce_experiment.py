@@ -11,33 +11,30 @@ from pathlib import Path
 import yaml
 from mlflow.tracking import MlflowClient
 
+# Registry access layer and model cache shared with the pipeline stages, on
+# PYTHONPATH like in the stage images (make reproduce sets it)
+from model_cache import ModelCache
+from registry import ModelRegistry
 
-def get_experiment_info(model_name, version_or_alias):
-    """Get experiment parameters and metadata"""
-    client = MlflowClient()
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+# Host side of the stages' /models/model_cache
+MODEL_CACHE_DIR = PROJECT_ROOT / "models" / "model_cache"
 
-    # Get model version
-    try:
-        # Try as alias first
-        mv = client.get_model_version_by_alias(model_name, version_or_alias)
-    except Exception:
-        # Otherwise treat as version number
-        mv = client.get_model_version(model_name, version_or_alias)
 
-    # Get run
-    run = client.get_run(mv.run_id)
+def get_experiment_info(model_name, version_or_alias):
+    """Get experiment parameters and metadata"""
+    # Alias or version number, with the run's params/metrics in one lookup
+    mv = ModelRegistry(MlflowClient()).resolve(model_name, version_or_alias)
 
     # Extract info
-    data_version = run.data.params.get("data_version") or run.data.tags.get(
-        "dvc_data_version"
-    )
-    git_commit = run.data.tags.get("git_commit")
+    data_version = mv.params.get("data_version") or mv.tags.get("dvc_data_version")
+    git_commit = mv.tags.get("git_commit")
 
     return {
-        "run_id": run.info.run_id,
-        "model_version": mv.version,
-        "params": run.data.params,
-        "metrics": run.data.metrics,
+        "run_id": mv.run_id,
+        "model_version": str(mv.version),
+        "params": mv.params,
+        "metrics": mv.metrics,
         "data_version": data_version,
         "git_commit": git_commit,
     }
@@ -73,6 +70,11 @@ def main():
     parser.add_argument(
         "--update-params", action="store_true", help="Update params.yaml automatically"
     )
+    parser.add_argument(
+        "--fetch-model",
+        action="store_true",
+        help="Put the model in the local model cache and print its path",
+    )
 
     args = parser.parse_args()
 
@@ -112,6 +114,12 @@ def main():
     if args.update_params:
         update_params_yaml(info["params"])
 
+    if args.fetch_model:
+        models = ModelCache(MODEL_CACHE_DIR)
+        model_dir = models.fetch(info["run_id"], "model")
+        source = "cache hit" if models.hits else "downloaded"
+        print(f"\n📦 Model ({source}): {model_dir}")
+
     # Instructions
     print("\n🔄 To reproduce:")
     if info.get("git_commit"):
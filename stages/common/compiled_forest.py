@@ -0,0 +1,233 @@
+"""
+Array-backed random forest predictor
+
+A fitted RandomForestClassifier is flattened into a few contiguous arrays
+shared by all trees (split feature, threshold, children, per-node class
+probabilities) and saved as .npy files. Loading memory-maps them, so it costs
+no unpickling and the pages are shared by every process on the host.
+
+Prediction walks all trees level-synchronously: each step advances the
+current node of every (row, tree) pair that has not reached a leaf yet with
+a few vectorized gathers, and pairs drop out of the active set at their leaf.
+Splits, the float32 input cast, the per-node probabilities and the
+tree-by-tree float64 sum followed by one division follow sklearn exactly, so
+predictions are bit-identical to model.predict_proba (summing trees in order,
+as sklearn does with n_jobs=1). The train stage verifies this with
+verify() before logging the arrays as the run artifact ARTIFACT, and
+load_run_predictor() serves them to the evaluate stage.
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+META_FILE = "forest.json"
+CHUNK_ROWS = 4096
+# Run artifact holding the saved arrays
+ARTIFACT = "compiled_model"
+
+
+class CompiledForest:
+    """Flattened forest: every tree's nodes concatenated into shared arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = arrays["classes"]
+        self.max_depth = int(meta["max_depth"])
+        self.feature_names: Optional[Sequence[str]] = meta.get("feature_names")
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted RandomForestClassifier (single output)"""
+        if getattr(model, "n_outputs_", 1) != 1 or not hasattr(model, "classes_"):
+            raise ValueError("Only single-output forest classifiers can be compiled")
+
+        normalize = _sklearn_version() < (1, 4)
+        parts = {name: [] for name in ("feature", "threshold", "left", "right")}
+        values, roots = [], []
+        offset, max_depth = 0, 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            # Leaves are marked by feature -1 and keep -1 children
+            parts["left"].append(np.where(is_leaf, -1, tree.children_left + offset))
+            parts["right"].append(np.where(is_leaf, -1, tree.children_right + offset))
+            parts["feature"].append(np.where(is_leaf, -1, tree.feature))
+            parts["threshold"].append(tree.threshold)
+            values.append(_leaf_probabilities(tree.value[:, 0, :], normalize))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {
+            "feature": np.concatenate(parts["feature"]).astype(np.int32),
+            "threshold": np.concatenate(parts["threshold"]).astype(np.float64),
+            "left": np.concatenate(parts["left"]).astype(np.int32),
+            "right": np.concatenate(parts["right"]).astype(np.int32),
+            "value": np.ascontiguousarray(np.concatenate(values)),
+            "roots": np.asarray(roots, dtype=np.int32),
+            "classes": np.asarray(model.classes_),
+        }
+        names = getattr(model, "feature_names_in_", None)
+        meta = {
+            "max_depth": max_depth,
+            "n_trees": len(model.estimators_),
+            "n_nodes": offset,
+            "n_features": int(model.n_features_in_),
+            "feature_names": None if names is None else [str(n) for n in names],
+        }
+        return cls(arrays, meta)
+
+    def save(self, path: Path) -> Path:
+        """Write one .npy per array plus forest.json into path"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            values = self.arrays[name]
+            if values.dtype == object:
+                values = values.astype(str)
+            np.save(path / f"{name}.npy", values, allow_pickle=False)
+        (path / META_FILE).write_text(json.dumps(self.meta, indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "CompiledForest":
+        """Open a saved forest; arrays are memory-mapped read-only by default"""
+        path = Path(path)
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode=mode, allow_pickle=False)
+            for name in ARRAYS
+        }
+        return cls(arrays, json.loads((path / META_FILE).read_text()))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.arrays.values())
+
+    def predict_proba(self, X, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+        """Mean class probabilities of all trees, shape (rows, classes)"""
+        X = self._as_float32(X)
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            proba[start : start + chunk_rows] = self._predict_chunk(
+                X[start : start + chunk_rows]
+            )
+        return proba
+
+    def predict(self, X, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X, chunk_rows), axis=1)]
+
+    def verify(self, model, X):
+        """
+        Raise ValueError unless predict_proba on X is bit-identical to model's
+
+        The model sums its trees in order (n_jobs=1) for the comparison, as
+        threaded prediction adds them in completion order.
+        """
+        n_jobs = model.get_params().get("n_jobs")
+        model.set_params(n_jobs=1)
+        try:
+            expected = model.predict_proba(X)
+        finally:
+            model.set_params(n_jobs=n_jobs)
+
+        actual = self.predict_proba(X)
+        if not np.array_equal(actual, expected):
+            rows = int(np.any(actual != expected, axis=1).sum())
+            raise ValueError(
+                f"Compiled forest probabilities differ from sklearn's on "
+                f"{rows} of {len(expected)} rows"
+            )
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_trees = len(X), len(self.roots)
+        n_features = X.shape[1]
+        X = X.ravel()
+
+        # One slot per (row, tree), row-major; active slots are not at a leaf
+        node = np.tile(self.roots, n_rows)
+        offset = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        feature = self.feature[node]
+        active = np.flatnonzero(feature >= 0)
+        feature = feature[active]
+        while active.size:
+            current = node[active]
+            go_left = X[offset[active] + feature] <= self.threshold[current]
+            step = np.where(go_left, self.left[current], self.right[current])
+            node[active] = step
+            feature = self.feature[step]
+            inner = feature >= 0
+            active, feature = active[inner], feature[inner]
+
+        # Sum trees in order, as sklearn does, for bit-identical probabilities
+        leaves = node.reshape(n_rows, n_trees)
+        total = np.zeros((n_rows, len(self.classes_)), dtype=np.float64)
+        for tree in range(n_trees):
+            total += self.value[leaves[:, tree]]
+        total /= n_trees
+        return total
+
+    def _as_float32(self, X) -> np.ndarray:
+        if self.feature_names is not None and hasattr(X, "columns"):
+            missing = set(self.feature_names) - set(map(str, X.columns))
+            if missing:
+                raise ValueError(f"Missing feature columns: {sorted(missing)}")
+            X = X[list(self.feature_names)]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.meta["n_features"]:
+            raise ValueError(
+                f"Expected {self.meta['n_features']} features, got shape {X.shape}"
+            )
+        return X
+
+
+def load_run_predictor(models, run_id: str):
+    """
+    Predictor for a run's model, read through a ModelCache
+
+    Returns:
+        The run's CompiledForest, or its sklearn model when the run logged
+        no compiled forest (e.g. runs from before it was exported)
+    """
+    try:
+        return models.load(run_id, ARTIFACT, loader=CompiledForest.load)
+    except Exception as e:
+        logger.info(f"No compiled forest for run {run_id} ({e}), loading the model")
+    return models.load(run_id, "model")
+
+
+def _sklearn_version():
+    import sklearn
+
+    return tuple(int(part) for part in re.findall(r"\d+", sklearn.__version__)[:2])
+
+
+def _leaf_probabilities(value: np.ndarray, normalize: bool) -> np.ndarray:
+    """
+    Per-node class probabilities exactly as the tree's predict_proba gives them
+
+    sklearn >= 1.4 stores proportions and returns them as is; older versions
+    store weighted counts and divide by their sum at prediction time.
+    """
+    value = np.array(value, dtype=np.float64)
+    if not normalize:
+        return np.ascontiguousarray(value)
+    normalizer = value.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    value /= normalizer
+    return value
@@ -0,0 +1,248 @@
+"""
+Declarative, vectorized feature transforms with persisted fitted state
+
+A transform spec is a list of steps from params.yaml, e.g.:
+
+    - {type: log1p, columns: [petal width (cm)]}
+    - {type: standardize}
+    - {type: bin, columns: [sepal length (cm)], n_bins: 8}
+
+Steps run in order; "columns" defaults to every feature column. Stateful
+steps are fitted from mergeable per-chunk statistics (count/mean/M2, min/max,
+category sets), so chunks can be profiled in parallel and combined. The fitted
+state is a small JSON document that featurize writes once and evaluate or any
+inference path loads instead of refitting.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+STATELESS = {"log1p"}
+STATEFUL = {"standardize", "minmax", "bin", "category"}
+TRANSFORMS = STATELESS | STATEFUL
+STATE_FILE = "feature_state.json"
+# Artifact directory train logs STATE_FILE under, next to the model
+RUN_ARTIFACT = "features"
+
+
+def normalize_spec(spec: Optional[Sequence[Dict]], feature_columns: List[str]):
+    """
+    Validate transform steps and fill in default columns
+
+    Args:
+        spec: Transform steps from params.yaml
+        feature_columns: Columns transforms may apply to (target excluded)
+
+    Returns:
+        List of step dicts with "type" and "columns" set
+    """
+    steps = []
+    for i, step in enumerate(spec or []):
+        step = dict(step)
+        kind = step.get("type")
+        if kind not in TRANSFORMS:
+            raise ValueError(
+                f"Unknown transform '{kind}' in step {i}, expected {sorted(TRANSFORMS)}"
+            )
+
+        columns = step.get("columns") or list(feature_columns)
+        unknown = [c for c in columns if c not in feature_columns]
+        if unknown:
+            raise ValueError(f"Step {i} ({kind}) references unknown columns {unknown}")
+
+        step["columns"] = list(columns)
+        if kind == "bin":
+            step["n_bins"] = int(step.get("n_bins", 10))
+        steps.append(step)
+    return steps
+
+
+def plan_pass(steps: List[Dict], fitted: List[Optional[Dict]]) -> List[int]:
+    """
+    Choose the unfitted steps whose statistics can be collected in one pass
+
+    A step can be profiled once every earlier step touching its columns is
+    fitted or stateless; otherwise it waits for a later pass.
+    """
+    blocked = set()
+    collect = []
+    for i, step in enumerate(steps):
+        columns = set(step["columns"])
+        ready = step["type"] in STATELESS or fitted[i] is not None
+        if ready and not columns & blocked:
+            continue
+        if step["type"] in STATEFUL and fitted[i] is None and not columns & blocked:
+            collect.append(i)
+        blocked |= columns
+    return collect
+
+
+def collect_stats(
+    df: pd.DataFrame,
+    steps: List[Dict],
+    fitted: List[Optional[Dict]],
+    collect: List[int],
+) -> Dict[int, Dict]:
+    """
+    Compute mergeable statistics of one chunk for the steps in collect
+
+    Earlier steps are applied first, so each step is profiled on its actual
+    input. Returns {step index: {column: stats}}.
+    """
+    data = {c: df[c].to_numpy() for c in df.columns}
+    stats = {}
+    for i, step in enumerate(steps):
+        if i in collect:
+            stats[i] = {c: _column_stats(step, data[c]) for c in step["columns"]}
+        if i >= max(collect, default=-1):
+            break
+        if step["type"] in STATELESS or fitted[i] is not None:
+            _apply_step(step, fitted[i], data)
+    return stats
+
+
+def merge_stats(a: Dict[int, Dict], b: Dict[int, Dict]) -> Dict[int, Dict]:
+    """Combine the statistics of two chunks"""
+    merged = dict(a)
+    for i, columns in b.items():
+        if i not in merged:
+            merged[i] = columns
+            continue
+        merged[i] = {c: _merge_column(merged[i][c], s) for c, s in columns.items()}
+    return merged
+
+
+def fit_step(step: Dict, stats: Dict[str, Dict]) -> Dict:
+    """Turn the merged statistics of a step into its fitted parameters"""
+    kind = step["type"]
+    params = {}
+    for column in step["columns"]:
+        s = stats[column]
+        if kind in ("minmax", "bin") and s["min"] is None:
+            # Column was all-null in train; fit a degenerate [0, 0] range
+            s = {"min": 0.0, "max": 0.0}
+
+        if kind == "standardize":
+            std = float(np.sqrt(s["m2"] / s["n"])) if s["n"] else 0.0
+            params[column] = {"mean": s["mean"], "scale": std or 1.0}
+        elif kind == "minmax":
+            span = s["max"] - s["min"]
+            params[column] = {"min": s["min"], "scale": span or 1.0}
+        elif kind == "bin":
+            edges = np.linspace(s["min"], s["max"], step["n_bins"] + 1)[1:-1]
+            params[column] = {"edges": edges.tolist()}
+        elif kind == "category":
+            params[column] = {"categories": sorted(s["values"])}
+    return params
+
+
+def transform(state: Dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply fitted transforms to a frame with vectorized NumPy operations
+
+    Args:
+        state: Fitted state from build_state/load_state
+        df: Frame containing at least the transformed columns
+
+    Returns:
+        New frame with transformed columns (other columns unchanged)
+    """
+    data = {c: df[c].to_numpy() for c in df.columns}
+    for step, params in zip(state["steps"], state["params"]):
+        _apply_step(step, params, data)
+    return pd.DataFrame(data, columns=list(df.columns))
+
+
+def build_state(steps: List[Dict], fitted: List[Optional[Dict]]) -> Dict:
+    """Bundle steps and their fitted parameters (None for stateless steps)"""
+    return {"version": 1, "steps": steps, "params": fitted}
+
+
+def save_state(state: Dict, path: Path):
+    """Write fitted state as JSON"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(state, indent=2))
+
+
+def load_state(path: Path) -> Dict:
+    """Load fitted state written by save_state"""
+    return json.loads(Path(path).read_text())
+
+
+def load_run_state(models, run_id: str) -> Optional[Dict]:
+    """
+    Fitted state a run logged with its model, read through a ModelCache
+
+    Returns:
+        The state, or None if the run logged none or it cannot be fetched
+    """
+    try:
+        return models.load(
+            run_id,
+            RUN_ARTIFACT,
+            loader=lambda path: load_state(Path(path) / STATE_FILE),
+        )
+    except Exception:
+        return None
+
+
+def _column_stats(step: Dict, values: np.ndarray) -> Dict:
+    if step["type"] == "category":
+        return {"values": sorted(set(pd.unique(values[~pd.isna(values)]).tolist()))}
+
+    x = values.astype(np.float64)
+    x = x[~np.isnan(x)]
+    if step["type"] == "standardize":
+        n = len(x)
+        mean = float(x.mean()) if n else 0.0
+        return {"n": n, "mean": mean, "m2": float(((x - mean) ** 2).sum())}
+    if len(x) == 0:
+        return {"min": None, "max": None}
+    return {"min": float(x.min()), "max": float(x.max())}
+
+
+def _merge_column(a: Dict, b: Dict) -> Dict:
+    if "values" in a:
+        return {"values": sorted(set(a["values"]) | set(b["values"]))}
+
+    if "n" in a:
+        # Chan et al. parallel variance update
+        n = a["n"] + b["n"]
+        if n == 0:
+            return dict(a)
+        delta = b["mean"] - a["mean"]
+        mean = a["mean"] + delta * b["n"] / n
+        m2 = a["m2"] + b["m2"] + delta**2 * a["n"] * b["n"] / n
+        return {"n": n, "mean": mean, "m2": m2}
+
+    lows = [v for v in (a["min"], b["min"]) if v is not None]
+    highs = [v for v in (a["max"], b["max"]) if v is not None]
+    return {"min": min(lows, default=None), "max": max(highs, default=None)}
+
+
+def _apply_step(step: Dict, params: Optional[Dict], data: Dict[str, np.ndarray]):
+    kind = step["type"]
+    for column in step["columns"]:
+        x = data[column]
+        if kind == "log1p":
+            data[column] = np.log1p(np.clip(x.astype(np.float64), 0, None))
+        elif kind == "standardize":
+            p = params[column]
+            data[column] = (x.astype(np.float64) - p["mean"]) / p["scale"]
+        elif kind == "minmax":
+            p = params[column]
+            data[column] = (x.astype(np.float64) - p["min"]) / p["scale"]
+        elif kind == "bin":
+            edges = np.asarray(params[column]["edges"], dtype=np.float64)
+            data[column] = np.digitize(x.astype(np.float64), edges).astype(np.int64)
+        elif kind == "category":
+            categories = np.asarray(params[column]["categories"])
+            codes = np.searchsorted(categories, x)
+            codes = np.clip(codes, 0, max(len(categories) - 1, 0))
+            known = len(categories) > 0
+            hit = (categories[codes] == x) if known else np.zeros(len(x), bool)
+            data[column] = np.where(hit, codes, -1).astype(np.int64)
@@ -0,0 +1,215 @@
+"""
+Local content-addressed cache of run model artifacts
+
+Loading "runs:/<run_id>/model" downloads the whole artifact from the
+tracking server. The cache keeps downloaded (or just-uploaded) artifact
+directories on local disk:
+
+    objects/<sha256 of the directory contents>/   the artifact files
+    refs/<run_id>/<artifact path>.json            {"digest": ...}
+
+Objects are populated in a temp dir and renamed into place, so a reader
+never sees a partial model, and identical artifacts are stored once.
+Readers hold a shared flock on the cache while they load, and eviction
+(least recently used objects first, down to max_bytes) holds it exclusively,
+so a model is never deleted under a process that is reading it.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import quote
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_DIR = Path("/models/model_cache")
+DEFAULT_MAX_BYTES = 1 << 30
+LOCK_FILE = ".lock"
+
+
+def tree_digest(path: Path) -> str:
+    """sha256 over the relative paths and contents of a directory's files"""
+    path = Path(path)
+    digest = hashlib.sha256()
+    for file in sorted(p for p in path.rglob("*") if p.is_file()):
+        digest.update(f"{file.relative_to(path).as_posix()}\x00".encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Size-capped LRU cache of {(run_id, artifact path): artifact directory}"""
+
+    def __init__(
+        self, root: Path = MODEL_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def load(
+        self,
+        run_id: str,
+        artifact_path: str = "model",
+        loader: Optional[Callable] = None,
+    ):
+        """
+        Load a run's artifact through the cache
+
+        loader receives the local directory (default: mlflow.sklearn.load_model)
+        and runs under the shared lock, so eviction cannot remove the files
+        while they are read.
+        """
+        if loader is None:
+            import mlflow.sklearn
+
+            loader = mlflow.sklearn.load_model
+        while True:
+            path = self.fetch(run_id, artifact_path)
+            with self._lock(fcntl.LOCK_SH):
+                # Fetch again if another process evicted it before the lock
+                if path.is_dir():
+                    return loader(str(path))
+
+    def fetch(self, run_id: str, artifact_path: str = "model") -> Path:
+        """Local directory of a run's artifact, downloading it on a miss"""
+        path = self.get(run_id, artifact_path)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        logger.info(f"Model cache miss: downloading runs:/{run_id}/{artifact_path}")
+        return self._download(run_id, artifact_path)
+
+    def get(self, run_id: str, artifact_path: str = "model") -> Optional[Path]:
+        """Cached directory of the artifact (marked recently used), or None"""
+        ref = self._ref_path(run_id, artifact_path)
+        try:
+            digest = json.loads(ref.read_text())["digest"]
+        except (OSError, ValueError, KeyError):
+            return None
+        path = self.root / "objects" / digest
+        if not path.is_dir():
+            ref.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, run_id: str, artifact_path: str, local_dir: Path) -> Path:
+        """Copy a local artifact directory (e.g. the one just uploaded) in"""
+        tmp_dir = self._tmp_dir()
+        try:
+            shutil.copytree(local_dir, tmp_dir, dirs_exist_ok=True)
+            return self._commit(run_id, artifact_path, tmp_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def stats(self) -> Dict:
+        with self._lock(fcntl.LOCK_SH):
+            objects = self._objects()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "objects": len(objects),
+            "bytes": sum(size for _, size in objects),
+        }
+
+    def evict(self, keep: Optional[Path] = None):
+        """Drop least recently used objects until the cache fits max_bytes"""
+        with self._lock(fcntl.LOCK_EX):
+            objects = self._objects()
+            total = sum(size for _, size in objects)
+            for path, size in objects:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                logger.info(f"Evicted cached model {path.name[:12]} ({size} bytes)")
+
+    def _download(self, run_id: str, artifact_path: str) -> Path:
+        import mlflow.artifacts
+
+        tmp_dir = self._tmp_dir()
+        try:
+            # Lands in <tmp_dir>/<artifact name>
+            with tracing.span("mlflow.download_artifacts"):
+                downloaded = mlflow.artifacts.download_artifacts(
+                    run_id=run_id, artifact_path=artifact_path, dst_path=str(tmp_dir)
+                )
+            return self._commit(run_id, artifact_path, Path(downloaded))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _commit(self, run_id: str, artifact_path: str, staged: Path) -> Path:
+        """Move a staged directory to its content address and point the ref at it"""
+        digest = tree_digest(staged)
+        target = self.root / "objects" / digest
+        with self._lock(fcntl.LOCK_SH):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.rename(staged, target)
+            except OSError:
+                # Same content already cached (possibly by another process)
+                shutil.rmtree(staged, ignore_errors=True)
+                os.utime(target)
+            self._write_ref(run_id, artifact_path, digest)
+        self.evict(keep=target)
+        return target
+
+    def _write_ref(self, run_id: str, artifact_path: str, digest: str):
+        ref = self._ref_path(run_id, artifact_path)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".ref-", dir=ref.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"digest": digest}, f)
+        os.replace(tmp, ref)
+
+    def _ref_path(self, run_id: str, artifact_path: str) -> Path:
+        name = quote(artifact_path.strip("/"), safe="")
+        return self.root / "refs" / quote(run_id, safe="") / f"{name}.json"
+
+    def _tmp_dir(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+
+    def _objects(self):
+        """(path, bytes) of every object, least recently used first"""
+        objects_dir = self.root / "objects"
+        if not objects_dir.exists():
+            return []
+        objects = [p for p in objects_dir.iterdir() if p.is_dir()]
+        objects.sort(key=lambda p: p.stat().st_mtime)
+        return [(p, _dir_size(p)) for p in objects]
+
+    @contextmanager
+    def _lock(self, mode: int):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_FILE, "a") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
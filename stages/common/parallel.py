@@ -0,0 +1,96 @@
+"""
+Process-pool and CPU-budget helpers shared by the stages
+"""
+
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> Optional[float]:
+    """
+    CPU quota of this container in CPUs, or None if unlimited
+
+    Reads cgroup v2 (cpu.max: "<quota> <period>" or "max <period>") and falls
+    back to cgroup v1 (cpu.cfs_quota_us / cpu.cfs_period_us, quota -1 = none).
+    """
+    try:
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    for controller in ("cpu", "cpu,cpuacct", "cpuacct,cpu"):
+        try:
+            quota = int((root / controller / "cpu.cfs_quota_us").read_text())
+            period = int((root / controller / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        if quota <= 0 or period <= 0:
+            return None
+        return quota / period
+    return None
+
+
+def affinity_cpus() -> int:
+    """Number of CPUs this process may be scheduled on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """
+    CPUs this process can actually use: affinity capped by the cgroup quota
+
+    A fractional quota is rounded up (1.5 CPUs -> 2 workers), as loky does.
+    """
+    cpus = affinity_cpus()
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def ordered_map(fn: Callable, tasks: Iterable, n_jobs: int) -> Iterator:
+    """
+    Map fn over tasks on a process pool, yielding results in task order
+
+    At most 2 * n_jobs results are in flight, so a slow consumer (e.g. a file
+    writer) bounds memory instead of letting finished results pile up.
+    With n_jobs <= 1 everything runs in the calling process. Workers are
+    started by a forkserver rather than forked from the caller, which may
+    already run threads (e.g. background uploads) whose locks a forked child
+    would inherit held.
+
+    Args:
+        fn: Picklable top-level function applied to each task
+        tasks: Iterable of task arguments
+        n_jobs: Number of worker processes
+
+    Yields:
+        fn(task) for each task, in order
+    """
+    if n_jobs <= 1:
+        yield from map(fn, tasks)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, mp_context=get_context("forkserver")
+    ) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
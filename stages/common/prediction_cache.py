@@ -0,0 +1,174 @@
+"""
+Local cache of a model's predictions on a data split
+
+Predictions are stored as .npy arrays under <run_id>-<split digest>/, so a
+later comparison against that model (e.g. the promotion test or the
+evaluate stage) reads them instead of downloading and re-running the model.
+The digest is the md5 of the file(s) backing the split, which keeps
+predictions from being reused on other rows.
+
+The train stage also logs its entry as the run artifact
+test_predictions/<digest>, so another host fetches a few arrays instead of
+the model.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import tracing
+from processed_data import (
+    FEATURE_STORE,
+    FEATURES_DIR,
+    FORMATS,
+    partition_files,
+    split_path,
+)
+
+logger = logging.getLogger(__name__)
+
+PREDICTIONS_DIR = Path("/models/predictions")
+DEFAULT_KEEP = 50
+# Run artifact holding <digest>/<name>.npy, logged by the train stage
+ARTIFACT_PATH = "test_predictions"
+
+
+def split_md5(name: str, input_dir: Path = FEATURES_DIR) -> str:
+    """
+    md5 of the file(s) backing a processed split
+
+    Hashes the bytes on disk without parsing them. Partitioned splits hash each
+    partition file with its name, and indexed splits hash the row indices and
+    the feature store.
+    """
+    path = split_path(name, input_dir)
+    paths = [path]
+    if path.suffix == ".npy":
+        paths.append(split_path(FEATURE_STORE, path.parent.parent))
+
+    digest = hashlib.md5()
+    for path in paths:
+        files = [path]
+        if path.is_dir():
+            files = partition_files(path, FORMATS["feather"]) or partition_files(
+                path, FORMATS["csv"]
+            )
+        for file in files:
+            digest.update(file.name.encode() + b"\x00")
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Directory of {(run_id, split digest): named prediction arrays}"""
+
+    def __init__(self, root: Path = PREDICTIONS_DIR, keep: int = DEFAULT_KEEP):
+        self.root = Path(root)
+        self.keep = keep
+
+    def path(self, run_id: str, digest: str) -> Path:
+        return self.root / f"{run_id}-{digest}"
+
+    def save(self, run_id: str, digest: str, **arrays: np.ndarray):
+        """Write arrays (e.g. y_pred=...) atomically, then prune old runs"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.path(run_id, digest)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            if target.exists():
+                for existing in target.glob("*.npy"):
+                    shutil.copy2(existing, tmp_dir / existing.name)
+            for name, values in arrays.items():
+                values = np.asarray(values)
+                if values.dtype == object:
+                    values = values.astype(str)
+                np.save(tmp_dir / f"{name}.npy", values, allow_pickle=False)
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(tmp_dir, target)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.prune()
+
+    def load(self, run_id: str, digest: str, name: str = "y_pred"):
+        """Cached array, or None if this run has none for this split"""
+        path = self.path(run_id, digest) / f"{name}.npy"
+        if not path.exists():
+            return None
+        try:
+            values = np.load(path, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached predictions {path}: {e}")
+            return None
+        os.utime(path.parent)
+        return values
+
+    def fetch(
+        self,
+        run_id: str,
+        digest: str,
+        name: str = "y_pred",
+        artifact_path: str = ARTIFACT_PATH,
+    ):
+        """
+        Cached array, else download the run's <artifact_path>/<digest> arrays
+
+        Returns:
+            The array, or None if neither the cache nor the run has it for
+            this split
+        """
+        values = self.load(run_id, digest, name)
+        if values is not None:
+            return values
+        try:
+            self._download(run_id, digest, artifact_path)
+        except Exception as e:
+            logger.info(f"No {artifact_path}/{digest} artifact in run {run_id}: {e}")
+            return None
+        return self.load(run_id, digest, name)
+
+    def _download(self, run_id: str, digest: str, artifact_path: str):
+        import mlflow.artifacts
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            with tracing.span("mlflow.download_artifacts"):
+                downloaded = mlflow.artifacts.download_artifacts(
+                    run_id=run_id,
+                    artifact_path=f"{artifact_path}/{digest}",
+                    dst_path=str(tmp_dir),
+                )
+            arrays = {
+                path.stem: np.load(path, mmap_mode="r", allow_pickle=False)
+                for path in Path(downloaded).glob("*.npy")
+            }
+            self.save(run_id, digest, **arrays)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def prune(self, keep: Optional[int] = None):
+        """Keep only the most recently used runs"""
+        keep = self.keep if keep is None else keep
+        entries = sorted(
+            (p for p in self.root.iterdir() if p.is_dir() and p.name[0] != "."),
+            key=_mtime,
+            reverse=True,
+        )
+        for stale in entries[keep:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _mtime(path: Path) -> float:
+    # Another thread or process may prune the entry in the meantime
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
@@ -0,0 +1,358 @@
+"""
+Processed data I/O shared by the preprocess, train and evaluate stages
+
+Splits are stored as uncompressed Arrow IPC (Feather v2) files, which keep the
+column schema next to the data and can be memory-mapped without parsing.
+CSV is still available as an opt-in compatibility format. A split is either a
+single file (train.feather) or a directory with one file per raw partition
+(train/<partition>.feather) when preprocessing runs incrementally.
+
+Processed splits keep the raw metadata columns (METADATA_COLUMNS, e.g. the
+class name) next to the features and target, for evaluation reports. They are
+not model inputs, so featurize leaves them out of the feature splits.
+
+With the indexed layout, rows are stored once in a canonical feature store
+(features.feather) and each split is a sorted int64 row-index array
+(splits/<name>.npy). Adding a split costs 8 bytes per selected row. Writers
+lay the store out so that each split covers long contiguous runs, which are
+read as zero-copy slices of the memory-mapped store.
+"""
+
+import logging
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_DIR = Path("/data/processed")
+FEATURES_DIR = Path("/data/features")
+FORMATS = {"feather": ".feather", "csv": ".csv"}
+# Raw columns carried through the processed splits but never used as features
+METADATA_COLUMNS = ("target_name",)
+FEATURE_STORE = "features"
+SPLITS_DIR = "splits"
+# Average contiguous run length below which select_rows gathers instead
+MIN_RUN_ROWS = 64
+
+
+def write_split(
+    df: pd.DataFrame,
+    name: str,
+    output_dir: Path = PROCESSED_DIR,
+    formats: Iterable[str] = ("feather",),
+) -> List[Path]:
+    """
+    Write a processed split in each requested format
+
+    Args:
+        df: Split to write (features and target)
+        name: Split name (e.g., "train", "test")
+        output_dir: Directory to write to
+        formats: Iterable of format names from FORMATS
+
+    Returns:
+        Paths of the written files
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}', expected {list(FORMATS)}")
+
+        path = output_dir / f"{name}{FORMATS[fmt]}"
+        if fmt == "feather":
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Compression would force a decode on read and defeat memory-mapping
+            feather.write_feather(table, path, compression="uncompressed")
+        else:
+            df.to_csv(path, index=False)
+        paths.append(path)
+
+    return paths
+
+
+class SplitWriter:
+    """
+    Append Arrow tables to a processed split in each requested format
+
+    Used by streaming preprocessing so a split is written chunk by chunk and
+    never has to be held in memory as a whole.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        schema: pa.Schema,
+        output_dir: Path = PROCESSED_DIR,
+        formats: Iterable[str] = ("feather",),
+    ):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        self.schema = schema
+        self.num_rows = 0
+        self.paths: List[Path] = []
+        self._writers = []
+
+        for fmt in formats:
+            if fmt not in FORMATS:
+                raise ValueError(
+                    f"Unknown output format '{fmt}', expected {list(FORMATS)}"
+                )
+
+            path = output_dir / f"{name}{FORMATS[fmt]}"
+            if fmt == "feather":
+                writer = pa.ipc.new_file(path, schema)
+            else:
+                writer = pacsv.CSVWriter(path, schema)
+            self._writers.append(writer)
+            self.paths.append(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, table: pa.Table):
+        """Append a chunk of rows to every output file"""
+        table = table.select(self.schema.names).cast(self.schema)
+        for writer in self._writers:
+            writer.write_table(table)
+        self.num_rows += table.num_rows
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+
+def clear_split(name: str, output_dir: Path = PROCESSED_DIR, keep_dir: bool = False):
+    """
+    Remove stored representations of a split
+
+    Args:
+        name: Split name (e.g., "train", "test")
+        output_dir: Directory holding the processed splits
+        keep_dir: Only remove single-file splits, keep the per-partition directory
+    """
+    output_dir = Path(output_dir)
+    for suffix in FORMATS.values():
+        (output_dir / f"{name}{suffix}").unlink(missing_ok=True)
+    (output_dir / SPLITS_DIR / f"{name}.npy").unlink(missing_ok=True)
+    if not keep_dir and (output_dir / name).is_dir():
+        shutil.rmtree(output_dir / name)
+
+
+def write_index(name: str, indices: np.ndarray, output_dir: Path = PROCESSED_DIR):
+    """Write the row indices of a split into the canonical feature store, sorted"""
+    path = Path(output_dir) / SPLITS_DIR / f"{name}.npy"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, np.sort(np.asarray(indices, dtype=np.int64)))
+    return path
+
+
+class IndexWriter:
+    """
+    Append row indices of a split chunk by chunk into a .npy file
+
+    Chunks are spooled to a raw temporary file and copied into the final
+    .npy (whose header needs the total length) on close, so memory stays
+    bounded by the chunk size. Indices must arrive in ascending order.
+    """
+
+    def __init__(self, name: str, output_dir: Path = PROCESSED_DIR):
+        self.path = Path(output_dir) / SPLITS_DIR / f"{name}.npy"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_rows = 0
+        self._last = -1
+        self._tmp_path = self.path.with_name(f".{name}.npy.tmp")
+        self._tmp = open(self._tmp_path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, indices: np.ndarray):
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        if indices[0] <= self._last or np.any(np.diff(indices) <= 0):
+            raise ValueError(f"Row indices of {self.path.name} are not ascending")
+        self._last = int(indices[-1])
+        self._tmp.write(indices.tobytes())
+        self.num_rows += len(indices)
+
+    def close(self, chunk_rows: int = 1 << 20):
+        if self._tmp.closed:
+            return
+        self._tmp.close()
+
+        spooled = np.memmap(self._tmp_path, dtype=np.int64, mode="r")
+        out = np.lib.format.open_memmap(
+            self.path, mode="w+", dtype=np.int64, shape=(self.num_rows,)
+        )
+        for start in range(0, self.num_rows, chunk_rows):
+            out[start : start + chunk_rows] = spooled[start : start + chunk_rows]
+        out.flush()
+        del out, spooled
+        self._tmp_path.unlink()
+
+
+def split_path(name: str, input_dir: Path = PROCESSED_DIR) -> Path:
+    """
+    Resolve the file or directory backing a split, preferring the columnar format
+
+    Args:
+        name: Split name (e.g., "train", "test")
+        input_dir: Directory holding the processed splits
+
+    Returns:
+        Path to the Feather file if present, otherwise the CSV file, otherwise
+        the per-partition split directory, otherwise the split's index array
+    """
+    for suffix in FORMATS.values():
+        path = Path(input_dir) / f"{name}{suffix}"
+        if path.exists():
+            return path
+
+    path = Path(input_dir) / name
+    if path.is_dir():
+        return path
+
+    path = Path(input_dir) / SPLITS_DIR / f"{name}.npy"
+    if path.exists():
+        return path
+    raise FileNotFoundError(f"No processed '{name}' split found in {input_dir}")
+
+
+def read_split(
+    name: str,
+    input_dir: Path = PROCESSED_DIR,
+    columns: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load a processed split, memory-mapping the columnar file when available
+
+    Numeric columns of a memory-mapped Feather file are exposed to pandas
+    without copying, so the split is never re-tokenized or duplicated in RAM.
+
+    Args:
+        name: Split name (e.g., "train", "test")
+        input_dir: Directory holding the processed splits
+        columns: Optional subset of columns to load
+
+    Returns:
+        DataFrame with the split
+    """
+    table, indices = open_split(name, input_dir, columns)
+    if indices is not None:
+        table = select_rows(table, indices)
+    return table.to_pandas(split_blocks=True)
+
+
+def read_split_rows(
+    name: str,
+    start: int,
+    stop: int,
+    input_dir: Path = PROCESSED_DIR,
+    columns: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load rows [start, stop) of a processed split
+
+    Only the requested rows are materialized, which lets worker processes
+    each read their own chunk of a memory-mapped split.
+    """
+    table, indices = open_split(name, input_dir, columns)
+    if indices is None:
+        table = table.slice(start, max(stop - start, 0))
+    else:
+        table = select_rows(table, indices[start:stop])
+    return table.to_pandas(split_blocks=True)
+
+
+def split_num_rows(name: str, input_dir: Path = PROCESSED_DIR) -> int:
+    """Number of rows in a processed split (metadata only for Feather)"""
+    table, indices = open_split(name, input_dir)
+    return table.num_rows if indices is None else len(indices)
+
+
+def open_split(
+    name: str,
+    input_dir: Path = PROCESSED_DIR,
+    columns: Optional[Iterable[str]] = None,
+) -> Tuple[pa.Table, Optional[np.ndarray]]:
+    """
+    Open a processed split without selecting rows
+
+    Returns:
+        Tuple of (table, indices). For the indexed layout the table is the
+        whole feature store and indices the split's memory-mapped row
+        indices; otherwise indices is None and the table is the split.
+    """
+    path = split_path(name, input_dir)
+    columns = list(columns) if columns is not None else None
+
+    if path.suffix == ".npy":
+        store = split_path(FEATURE_STORE, path.parent.parent)
+        return _open_table(store, columns), np.load(path, mmap_mode="r")
+    return _open_table(path, columns), None
+
+
+def partition_files(path: Path, suffix: str) -> List[Path]:
+    """List partition files in a directory, skipping hidden/temporary files"""
+    return sorted(
+        p for p in Path(path).glob(f"*{suffix}") if not p.name.startswith((".", "_"))
+    )
+
+
+def _open_table(path: Path, columns: Optional[List[str]]) -> pa.Table:
+    if path.is_dir():
+        files = partition_files(path, FORMATS["feather"]) or partition_files(
+            path, FORMATS["csv"]
+        )
+        if not files:
+            raise FileNotFoundError(f"Split directory is empty: {path}")
+        return pa.concat_tables([_open_table(f, columns) for f in files])
+
+    if path.suffix == FORMATS["feather"]:
+        return feather.read_table(path, columns=columns, memory_map=True)
+
+    logger.info(f"Columnar split not found, falling back to CSV: {path}")
+    df = pd.read_csv(path, usecols=columns)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def select_rows(table: pa.Table, indices: np.ndarray) -> pa.Table:
+    """
+    Select rows of a (memory-mapped) table by sorted index
+
+    Every contiguous run of indices becomes a zero-copy slice of the mapped
+    buffers. When the runs are too short for slicing to pay off, only the
+    selected rows are gathered instead.
+    """
+    indices = np.asarray(indices)
+    if len(indices) == 0:
+        return table.slice(0, 0)
+
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    if len(indices) < MIN_RUN_ROWS * (len(breaks) + 1):
+        return table.take(pa.array(indices))
+
+    starts = indices[np.r_[0, breaks]]
+    lengths = np.diff(np.r_[0, breaks, len(indices)])
+    return pa.concat_tables(
+        [table.slice(int(start), int(n)) for start, n in zip(starts, lengths)]
+    )
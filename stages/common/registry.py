@@ -0,0 +1,219 @@
+"""
+Model registry access shared by train, evaluate and the reproduction scripts
+
+Version lookups are filtered on the server (name + run_id) and paginated, so
+resolving a run's version never pages through every version of the model.
+Alias -> version and version -> run params/metrics are cached for a short
+TTL in memory and, optionally, in a JSON file that consecutive stages share.
+Alias writes go through ModelRegistry so the cache never serves an alias
+this process has just moved.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from mlflow.exceptions import MlflowException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0
+PAGE_SIZE = 200
+
+
+class VersionInfo(NamedTuple):
+    name: str
+    version: int
+    run_id: str
+    aliases: Tuple[str, ...]
+    params: Dict[str, str]
+    metrics: Dict[str, float]
+    tags: Dict[str, str]
+
+
+class ModelRegistry:
+    """
+    Cached, round-trip-aware view of the MLflow model registry
+
+    Args:
+        client: MlflowClient (or a proxy such as CountingClient)
+        ttl: Seconds a cached alias or version stays valid (0 disables)
+        cache_path: Optional JSON file that persists the cache across processes
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: float = DEFAULT_TTL,
+        cache_path: Optional[Path] = None,
+        clock=time.time,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict] = self._read_cache()
+
+    def search_versions(
+        self, model_name: str, run_id: Optional[str] = None, page_size=PAGE_SIZE
+    ) -> Iterator:
+        """Yield model versions of model_name (and run_id) page by page"""
+        query = f"name='{model_name}'"
+        if run_id:
+            query += f" and run_id='{run_id}'"
+        token = None
+        while True:
+            page = self.client.search_model_versions(
+                query, max_results=page_size, page_token=token
+            )
+            yield from page
+            token = getattr(page, "token", None)
+            if not token:
+                return
+
+    def version_for_run(self, model_name: str, run_id: str) -> int:
+        """
+        Latest version of model_name registered from run_id
+
+        Raises:
+            RuntimeError: if the run has no registered version
+        """
+        try:
+            versions = list(self.search_versions(model_name, run_id))
+        except MlflowException as e:
+            # Servers without run_id filtering: scan pages, filtering locally
+            logger.warning(f"Server-side run_id filter failed ({e}), scanning versions")
+            versions = [
+                mv for mv in self.search_versions(model_name) if mv.run_id == run_id
+            ]
+        if not versions:
+            raise RuntimeError(
+                f"Could not resolve model version for model={model_name}, "
+                f"run_id={run_id}"
+            )
+        return max(int(mv.version) for mv in versions)
+
+    def get_alias(self, model_name: str, alias: str) -> Optional[VersionInfo]:
+        """Version the alias points to (None if the alias is not set)"""
+        key = f"alias:{model_name}:{alias}"
+        cached = self._get(key)
+        if cached is not None:
+            version = cached["version"]
+            return None if version is None else self.get_version(model_name, version)
+
+        try:
+            mv = self.client.get_model_version_by_alias(model_name, alias)
+        except MlflowException:
+            self._put(key, {"version": None})
+            return None
+        self._put(key, {"version": int(mv.version)})
+        return self._version_info(mv)
+
+    def get_version(self, model_name: str, version) -> Optional[VersionInfo]:
+        """Version with its run params/metrics/tags (None if not registered)"""
+        key = f"version:{model_name}:{int(version)}"
+        cached = self._get(key)
+        if cached is not None:
+            return _info_from_json(cached)
+
+        try:
+            mv = self.client.get_model_version(model_name, str(version))
+        except MlflowException:
+            return None
+        return self._version_info(mv)
+
+    def resolve(self, model_name: str, version_or_alias: str) -> VersionInfo:
+        """Resolve "production", "staging", "5", ... to a version"""
+        if str(version_or_alias).isdigit():
+            info = self.get_version(model_name, version_or_alias)
+        else:
+            info = self.get_alias(model_name, version_or_alias)
+        if info is None:
+            raise LookupError(f"{model_name}@{version_or_alias} not found")
+        return info
+
+    def set_alias(self, model_name: str, alias: str, version):
+        """Point alias at version and update the cache to match"""
+        self.client.set_registered_model_alias(model_name, alias, str(version))
+        for key, entry in self._entries.items():
+            if key.startswith(f"version:{model_name}:"):
+                info = entry["value"]
+                aliases = [a for a in info["aliases"] if a != alias]
+                if info["version"] == int(version):
+                    aliases.append(alias)
+                info["aliases"] = aliases
+        self._put(f"alias:{model_name}:{alias}", {"version": int(version)})
+
+    def invalidate(self, model_name: Optional[str] = None):
+        """Forget cached entries (of one model, or all)"""
+        if model_name is None:
+            self._entries.clear()
+            self._write_cache()
+        else:
+            self._drop(f"alias:{model_name}:")
+            self._drop(f"version:{model_name}:")
+
+    def _version_info(self, mv) -> VersionInfo:
+        run = self.client.get_run(mv.run_id)
+        info = VersionInfo(
+            name=mv.name,
+            version=int(mv.version),
+            run_id=mv.run_id,
+            aliases=tuple(getattr(mv, "aliases", None) or ()),
+            params=dict(run.data.params),
+            metrics=dict(run.data.metrics),
+            tags=dict(run.data.tags),
+        )
+        self._put(f"version:{mv.name}:{info.version}", info._asdict())
+        return info
+
+    def _get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry["expires"] <= self.clock():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["value"]
+
+    def _put(self, key: str, value: Dict):
+        if self.ttl <= 0:
+            return
+        self._entries[key] = {"value": value, "expires": self.clock() + self.ttl}
+        self._write_cache()
+
+    def _drop(self, prefix: str):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+        self._write_cache()
+
+    def _read_cache(self) -> Dict[str, Dict]:
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        try:
+            entries = json.loads(self.cache_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+        now = self.clock()
+        return {k: e for k, e in entries.items() if e.get("expires", 0) > now}
+
+    def _write_cache(self):
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".registry-", dir=self.cache_path.parent)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write registry cache {self.cache_path}: {e}")
+
+
+def _info_from_json(value: Dict) -> VersionInfo:
+    return VersionInfo(**{**value, "aliases": tuple(value["aliases"])})
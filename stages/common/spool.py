@@ -0,0 +1,422 @@
+"""
+Offline tracking spool and bulk sync to the remote MLflow server
+
+With MLFLOW_OFFLINE set, configure() points MLflow at a file store under
+/models/spool, so every tag/param/metric/artifact call of a stage is a local
+disk write instead of a request to the remote tracking server.
+
+`python spool.py sync` replays the spool to MLFLOW_TRACKING_URI later:
+
+1. Every unsynced run is created on the remote, parents before nested runs,
+   tagged with its spool run ID.
+2. Params, tags and the full metric history are sent with batched
+   log_batch calls. Datasets and artifacts follow, and the run gets its
+   final status. Runs are filled in parallel, and run IDs inside tag
+   values are rewritten to their remote IDs.
+3. Registered model versions are recreated from the synced runs.
+   Aliases are copied only when asked for.
+
+A ledger (synced.json) maps spool IDs to remote IDs, so a second sync only
+sends what is new. Runs lost from the ledger are found again by their
+source-run tag, so a sync interrupted midway never duplicates runs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import mlflow
+from mlflow.entities import Param, RunStatus, RunTag
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+from registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_ENV = "MLFLOW_OFFLINE"
+SPOOL_DIR = Path("/models/spool")
+# Caches holding spool run IDs / versions, kept apart from the online ones
+SPOOL_CACHE_DIR = SPOOL_DIR / "cache"
+LEDGER_FILE = "synced.json"
+SOURCE_TAG = "spool_source_run_id"
+PARENT_TAG = "mlflow.parentRunId"
+# Per-request limits of the log_batch REST endpoint
+MAX_BATCH_METRICS = 1000
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_TAGS = 100
+RUN_ID = re.compile(r"\b[0-9a-f]{32}\b")
+
+
+def offline_requested() -> bool:
+    return os.getenv(OFFLINE_ENV, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def tracking_uri(spool_dir: Path = SPOOL_DIR) -> str:
+    return (Path(spool_dir) / "mlruns").resolve().as_uri()
+
+
+def configure(spool_dir: Path = SPOOL_DIR) -> bool:
+    """
+    Switch MLflow to the local spool if MLFLOW_OFFLINE is set
+
+    The URI is also exported so MlflowClient() instances and worker
+    processes started afterwards use the spool.
+
+    Returns:
+        True if tracking now goes to the spool
+    """
+    if not offline_requested():
+        return False
+    uri = tracking_uri(spool_dir)
+    # The file store creates mlruns/ with its default experiment on first use
+    Path(spool_dir).mkdir(parents=True, exist_ok=True)
+    os.environ["MLFLOW_TRACKING_URI"] = uri
+    mlflow.set_tracking_uri(uri)
+    mlflow.set_registry_uri(uri)
+    logger.info(f"Offline mode: tracking to {uri}, sync with `spool.py sync`")
+    return True
+
+
+class SyncLedger:
+    """Spool -> remote ID map of synced runs and model versions (JSON file)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        data = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable sync ledger {self.path}: {e}")
+        self.runs: Dict[str, Dict] = data.get("runs", {})
+        self.versions: Dict[str, int] = data.get("versions", {})
+
+    def run_done(self, run_id: str) -> bool:
+        return self.runs.get(run_id, {}).get("done", False)
+
+    def record_run(self, run_id: str, remote_id: str, done: bool = False):
+        with self._lock:
+            self.runs[run_id] = {"remote": remote_id, "done": done}
+            self._write()
+
+    def record_version(self, name: str, version, remote_version):
+        with self._lock:
+            self.versions[f"{name}/{version}"] = int(remote_version)
+            self._write()
+
+    def remote_run(self, run_id: str) -> Optional[str]:
+        entry = self.runs.get(run_id)
+        return entry["remote"] if entry else None
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".ledger-", dir=self.path.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"runs": self.runs, "versions": self.versions}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class SyncReport:
+    def __init__(self):
+        self.runs_created = 0
+        self.runs_synced = 0
+        self.versions_created = 0
+        self.aliases_set = 0
+        self.skipped: List[str] = []
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def sync(
+    local: MlflowClient,
+    remote: MlflowClient,
+    ledger: SyncLedger,
+    max_workers: int = 4,
+    aliases: bool = False,
+) -> SyncReport:
+    """
+    Replay every finished spool run and model version not yet on the remote
+
+    Args:
+        local: Client of the spool store
+        remote: Client of the remote tracking server
+        ledger: IDs synced by earlier calls
+        max_workers: Runs filled concurrently
+        aliases: Also point remote aliases at the synced versions
+    """
+    report = SyncReport()
+    runs = _finished_runs(local, report)
+
+    # Create runs first (parents before children) so every ID can be remapped
+    experiments: Dict[str, str] = {}
+    created = set()
+    for run in _parents_first(runs):
+        if ledger.remote_run(run.info.run_id) is not None:
+            continue
+        exp_id = run.info.experiment_id
+        if exp_id not in experiments:
+            experiments[exp_id] = _remote_experiment(local, remote, exp_id)
+        existing = _find_remote_run(remote, experiments[exp_id], run.info.run_id)
+        if existing is None:
+            parent = run.data.tags.get(PARENT_TAG)
+            tags = {SOURCE_TAG: run.info.run_id}
+            if parent:
+                tags[PARENT_TAG] = ledger.remote_run(parent) or parent
+            existing = remote.create_run(
+                experiments[exp_id],
+                start_time=run.info.start_time,
+                tags=tags,
+                run_name=run.info.run_name,
+            ).info.run_id
+            created.add(run.info.run_id)
+            report.runs_created += 1
+        ledger.record_run(run.info.run_id, existing)
+
+    id_map = {run_id: entry["remote"] for run_id, entry in ledger.runs.items()}
+    pending = [run for run in runs if not ledger.run_done(run.info.run_id)]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for run_id in pool.map(
+            lambda run: _fill_run(
+                local, remote, run, id_map, resume=run.info.run_id not in created
+            ),
+            pending,
+        ):
+            ledger.record_run(run_id, id_map[run_id], done=True)
+            report.runs_synced += 1
+
+    _sync_versions(local, remote, ledger, report, aliases)
+    return report
+
+
+def _finished_runs(local: MlflowClient, report: SyncReport) -> List:
+    runs = []
+    for experiment in _paged(local.search_experiments):
+        for run in _paged(
+            local.search_runs, [experiment.experiment_id], order_by=["start_time ASC"]
+        ):
+            if run.info.status == RunStatus.to_string(RunStatus.RUNNING):
+                report.skipped.append(run.info.run_id)
+            else:
+                runs.append(run)
+    if report.skipped:
+        logger.warning(f"Skipping {len(report.skipped)} unfinished run(s)")
+    return runs
+
+
+def _parents_first(runs: List) -> List:
+    ids = {run.info.run_id for run in runs}
+    ordered, placed = [], set()
+    remaining = list(runs)
+    while remaining:
+        ready = [
+            run
+            for run in remaining
+            if run.data.tags.get(PARENT_TAG) not in ids - placed
+        ]
+        if not ready:
+            # Parent cycle (should not happen): create the rest as they are
+            ready = remaining
+        ordered.extend(ready)
+        placed.update(run.info.run_id for run in ready)
+        remaining = [run for run in remaining if run.info.run_id not in placed]
+    return ordered
+
+
+def _remote_experiment(local: MlflowClient, remote: MlflowClient, exp_id: str) -> str:
+    name = local.get_experiment(exp_id).name
+    experiment = remote.get_experiment_by_name(name)
+    if experiment is not None:
+        return experiment.experiment_id
+    return remote.create_experiment(name)
+
+
+def _find_remote_run(remote: MlflowClient, exp_id: str, run_id: str) -> Optional[str]:
+    """Remote run an interrupted sync already created for run_id"""
+    found = remote.search_runs(
+        [exp_id], filter_string=f"tags.{SOURCE_TAG} = '{run_id}'", max_results=1
+    )
+    return found[0].info.run_id if found else None
+
+
+def _fill_run(
+    local: MlflowClient, remote: MlflowClient, run, id_map, resume: bool
+) -> str:
+    """Send a created run's data, datasets and artifacts, then terminate it"""
+    run_id = run.info.run_id
+    remote_id = id_map[run_id]
+
+    def remap(value: str) -> str:
+        return RUN_ID.sub(lambda m: id_map.get(m.group(0), m.group(0)), value)
+
+    tags = [
+        RunTag(key, remap(value))
+        for key, value in run.data.tags.items()
+        if key != SOURCE_TAG
+    ]
+    params = list(run.data.to_dictionary()["params"].items())
+    metrics = [
+        entry
+        for key in run.data.metrics
+        for entry in local.get_metric_history(run_id, key)
+    ]
+    if resume:
+        # An interrupted sync may have sent part of the history already
+        sent = set()
+        for key in remote.get_run(remote_id).data.metrics:
+            sent.update(
+                (m.key, m.value, m.timestamp, m.step)
+                for m in remote.get_metric_history(remote_id, key)
+            )
+        metrics = [
+            m for m in metrics if (m.key, m.value, m.timestamp, m.step) not in sent
+        ]
+
+    for start in range(0, len(tags), MAX_BATCH_TAGS):
+        remote.log_batch(remote_id, tags=tags[start : start + MAX_BATCH_TAGS])
+    for start in range(0, len(params), MAX_BATCH_PARAMS):
+        remote.log_batch(
+            remote_id,
+            params=[
+                Param(key, value)
+                for key, value in params[start : start + MAX_BATCH_PARAMS]
+            ],
+        )
+    for start in range(0, len(metrics), MAX_BATCH_METRICS):
+        remote.log_batch(remote_id, metrics=metrics[start : start + MAX_BATCH_METRICS])
+
+    datasets = run.inputs.dataset_inputs if run.inputs else []
+    if datasets:
+        remote.log_inputs(remote_id, datasets)
+
+    artifact_dir = _local_path(run.info.artifact_uri)
+    if artifact_dir is not None and any(artifact_dir.iterdir()):
+        remote.log_artifacts(remote_id, str(artifact_dir))
+
+    remote.set_terminated(remote_id, run.info.status, run.info.end_time)
+    logger.info(f"Synced run {run_id} -> {remote_id}")
+    return run_id
+
+
+def _sync_versions(local, remote, ledger: SyncLedger, report: SyncReport, aliases):
+    local_registry, remote_registry = ModelRegistry(local, 0), ModelRegistry(remote, 0)
+    for model in _paged(local.search_registered_models):
+        name = model.name
+        versions = sorted(
+            local_registry.search_versions(name), key=lambda mv: int(mv.version)
+        )
+        for mv in versions:
+            key = f"{name}/{mv.version}"
+            remote_run = ledger.remote_run(mv.run_id)
+            if key in ledger.versions:
+                continue
+            if remote_run is None or not ledger.run_done(mv.run_id):
+                logger.warning(f"Not syncing {key}: run {mv.run_id} is not synced")
+                continue
+            source = _remote_source(local, remote, mv, remote_run)
+            existing = [
+                v
+                for v in remote_registry.search_versions(name, remote_run)
+                if v.source == source
+            ]
+            if existing:
+                remote_version = existing[0].version
+            else:
+                _ensure_registered_model(remote, name)
+                remote_version = remote.create_model_version(
+                    name, source, run_id=remote_run, tags=dict(mv.tags or {})
+                ).version
+                report.versions_created += 1
+            ledger.record_version(name, mv.version, remote_version)
+
+        if aliases:
+            for alias, version in (model.aliases or {}).items():
+                remote_version = ledger.versions.get(f"{name}/{version}")
+                if remote_version is not None:
+                    remote.set_registered_model_alias(name, alias, str(remote_version))
+                    report.aliases_set += 1
+
+
+def _remote_source(local, remote, mv, remote_run: str) -> str:
+    """The version's source path, moved to the remote run's artifact root"""
+    local_root = local.get_run(mv.run_id).info.artifact_uri.rstrip("/")
+    remote_root = remote.get_run(remote_run).info.artifact_uri.rstrip("/")
+    source = mv.source
+    if source.startswith(f"runs:/{mv.run_id}/"):
+        return f"{remote_root}/{source[len(f'runs:/{mv.run_id}/') :]}"
+    if source.startswith(local_root):
+        return remote_root + source[len(local_root) :]
+    return source
+
+
+def _ensure_registered_model(remote: MlflowClient, name: str):
+    try:
+        remote.get_registered_model(name)
+    except MlflowException:
+        remote.create_registered_model(name)
+
+
+def _local_path(uri: str) -> Optional[Path]:
+    parsed = urlparse(uri)
+    if parsed.scheme not in ("", "file"):
+        return None
+    path = Path(url2pathname(parsed.path))
+    return path if path.is_dir() else None
+
+
+def _paged(search, *args, **kwargs):
+    token = None
+    while True:
+        page = search(*args, page_token=token, **kwargs)
+        yield from page
+        token = getattr(page, "token", None)
+        if not token:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="replay the spool to the remote")
+    sync_parser.add_argument("--spool-dir", type=Path, default=SPOOL_DIR)
+    sync_parser.add_argument(
+        "--remote",
+        default=os.getenv("MLFLOW_TRACKING_URI"),
+        help="remote tracking URI (default: MLFLOW_TRACKING_URI)",
+    )
+    sync_parser.add_argument("--workers", type=int, default=4)
+    sync_parser.add_argument(
+        "--aliases",
+        action="store_true",
+        help="also copy aliases set offline (e.g. production) to the remote",
+    )
+    args = parser.parse_args()
+
+    if not args.remote:
+        parser.error("No remote: set MLFLOW_TRACKING_URI or pass --remote")
+    local_uri = tracking_uri(args.spool_dir)
+    if args.remote == local_uri:
+        parser.error("The remote is the spool itself; unset MLFLOW_OFFLINE")
+    local = MlflowClient(tracking_uri=local_uri, registry_uri=local_uri)
+    remote = MlflowClient(tracking_uri=args.remote, registry_uri=args.remote)
+    ledger = SyncLedger(args.spool_dir / LEDGER_FILE)
+    report = sync(local, remote, ledger, args.workers, args.aliases)
+    logger.info(f"Sync finished: {report.as_dict()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    main()
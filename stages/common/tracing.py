@@ -0,0 +1,205 @@
+"""
+Lightweight phase tracing for the stages
+
+Spans nest per thread and are aggregated by path (e.g. train > fit >
+mlflow.log_batch): call count, total/max wall time and process CPU time.
+Spans opened on helper threads (background uploads) with no enclosing span
+are grouped under "background". TracedClient wraps every MlflowClient call
+in an "mlflow.<method>" span; fluent mlflow calls are wrapped in span() with
+the same prefix, and start_run() traces the run's create and end requests.
+
+The trace of each stage is merged into one JSON file (stage_trace.json), and
+summary_metrics() gives per-phase timings to log as MLflow metrics.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+TRACE_PATH = Path("/metrics/stage_trace.json")
+BACKGROUND = "background"
+MLFLOW_PREFIX = "mlflow."
+
+
+class Tracer:
+    """Collects nested, aggregated timing spans for one stage run"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, ...], Dict] = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block as a child of the current span"""
+        stack = self._stack()
+        if stack:
+            parent = stack[-1]
+        elif threading.current_thread() is threading.main_thread():
+            parent = ()
+        else:
+            parent = (BACKGROUND,)
+        path = parent + (name,)
+        with self._lock:
+            # Registered on entry so the report keeps call order
+            self._stats.setdefault(
+                path, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0}
+            )
+
+        stack.append(path)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            stack.pop()
+            with self._lock:
+                stats = self._stats[path]
+                stats["calls"] += 1
+                stats["wall_s"] += wall
+                stats["cpu_s"] += cpu
+                stats["max_wall_s"] = max(stats["max_wall_s"], wall)
+
+    def to_dict(self) -> Dict:
+        """Span tree with totals, ready for JSON"""
+        with self._lock:
+            stats = {path: dict(values) for path, values in self._stats.items()}
+
+        nodes: Dict[Tuple[str, ...], Dict] = {}
+        roots: List[Dict] = []
+        for path, values in stats.items():
+            node = {"name": path[-1], **_rounded(values), "children": []}
+            nodes[path] = node
+            parent = nodes.get(path[:-1])
+            if parent is None and len(path) > 1:
+                # Group node for spans of helper threads ("background")
+                parent = {"name": path[-2], "children": []}
+                nodes[path[:-1]] = parent
+                roots.append(parent)
+            (roots if parent is None else parent["children"]).append(node)
+
+        mlflow_calls = [v for p, v in stats.items() if p[-1].startswith(MLFLOW_PREFIX)]
+        return {
+            "stage": self.stage,
+            "wall_s": round(time.perf_counter() - self._wall_start, 6),
+            "cpu_s": round(time.process_time() - self._cpu_start, 6),
+            "mlflow_calls": sum(v["calls"] for v in mlflow_calls),
+            "mlflow_wall_s": round(sum(v["wall_s"] for v in mlflow_calls), 6),
+            "spans": roots,
+        }
+
+    def summary_metrics(self) -> Dict[str, float]:
+        """Wall time of each top-level phase plus MLflow call totals"""
+        trace = self.to_dict()
+        metrics = {
+            f"trace_{_metric_name(span['name'])}_s": span["wall_s"]
+            for span in trace["spans"]
+            if "wall_s" in span
+        }
+        metrics["trace_total_s"] = trace["wall_s"]
+        metrics["trace_mlflow_calls"] = trace["mlflow_calls"]
+        metrics["trace_mlflow_s"] = trace["mlflow_wall_s"]
+        return metrics
+
+    def write(self, path: Path = TRACE_PATH) -> Path:
+        """Merge this stage's trace into the shared JSON file (atomically)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        traces = {}
+        if path.exists():
+            try:
+                traces = json.loads(path.read_text())
+            except (OSError, json.JSONDecodeError):
+                traces = {}
+        traces[self.stage] = self.to_dict()
+
+        fd, tmp = tempfile.mkstemp(prefix=".trace-", dir=path.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump(traces, f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    def _stack(self) -> List[Tuple[str, ...]]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+
+class TracedClient:
+    """MlflowClient proxy that records a span for every method call"""
+
+    def __init__(self, client, tracer: Optional[Tracer] = None):
+        self._client = client
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with (self._tracer or current()).span(f"{MLFLOW_PREFIX}{name}"):
+                return attr(*args, **kwargs)
+
+        return call
+
+
+_current = Tracer("default")
+
+
+def start(stage: str) -> Tracer:
+    """Begin a new trace for stage; module-level span() records into it"""
+    global _current
+    _current = Tracer(stage)
+    return _current
+
+
+def current() -> Tracer:
+    return _current
+
+
+def span(name: str):
+    """Span on the current stage's tracer"""
+    return _current.span(name)
+
+
+@contextmanager
+def start_run(**kwargs):
+    """
+    mlflow.start_run as a with block, recording its create and end requests
+
+    Like ActiveRun, the run ends FINISHED, or FAILED if the block raises.
+    """
+    import mlflow
+
+    with span(f"{MLFLOW_PREFIX}start_run"):
+        run = mlflow.start_run(**kwargs)
+    status = "FINISHED"
+    try:
+        yield run
+    except BaseException:
+        status = "FAILED"
+        raise
+    finally:
+        with span(f"{MLFLOW_PREFIX}end_run"):
+            mlflow.end_run(status)
+
+
+def _rounded(values: Dict) -> Dict:
+    return {
+        key: round(value, 6) if isinstance(value, float) else value
+        for key, value in values.items()
+    }
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "_-." else "_" for c in name)
@@ -0,0 +1,172 @@
+"""
+Side-by-side evaluation of registered models on the same test rows
+
+The evaluated run (the candidate) is compared with a list of aliases or
+versions ("production", "staging", "3"). Refs are resolved through the
+registry cache and deduplicated by run, so each model is fetched and
+predicted at most once. Runs without saved predictions for this test split
+are loaded from the local model cache and predicted concurrently on a
+thread pool. Each predicts on the processed test rows transformed with the
+feature state logged with its model, since the current features may come
+from a different fit; runs without a logged state are skipped.
+
+The report holds every model's metrics and the pairwise disagreement rate,
+the fraction of test rows on which two models predict different classes.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from compiled_forest import load_run_predictor
+from confusion import ConfusionAccumulator
+from feature_transforms import load_run_state, transform
+from model_cache import ModelCache
+from prediction_cache import PredictionCache
+from processed_data import FEATURES_DIR, METADATA_COLUMNS, PROCESSED_DIR, read_split
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE = "candidate"
+DEFAULT_MAX_WORKERS = 4
+# Run metric names of the evaluate stage
+EVAL_METRICS = {
+    "accuracy": "eval_accuracy",
+    "precision": "eval_precision",
+    "recall": "eval_recall",
+    "f1_score": "eval_f1",
+}
+
+
+def disagreement_rates(y_preds: Sequence) -> np.ndarray:
+    """(m, m) fraction of rows on which each pair of prediction arrays differs"""
+    stacked = np.stack([np.asarray(y_pred) for y_pred in y_preds])
+    return (stacked[:, None, :] != stacked[None, :, :]).mean(axis=2)
+
+
+def resolve_refs(registry, model_name: str, refs: Sequence) -> List[Tuple[str, object]]:
+    """(ref, VersionInfo) of every ref that resolves; unset aliases are skipped"""
+    resolved = []
+    for ref in refs:
+        try:
+            resolved.append((str(ref), registry.resolve(model_name, str(ref))))
+        except LookupError as e:
+            logger.warning(f"Not comparing {ref}: {e}")
+    return resolved
+
+
+def compare_models(
+    registry,
+    model_name: str,
+    candidate_run_id: str,
+    candidate_pred,
+    refs: Sequence,
+    test_md5: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    candidate_version: Optional[int] = None,
+    predictions: Optional[PredictionCache] = None,
+    models: Optional[ModelCache] = None,
+):
+    """
+    Score the candidate and every resolvable ref on the test split
+
+    Args:
+        candidate_pred: The candidate's test predictions (already computed)
+        refs: Aliases or versions to compare with
+        test_md5: split_md5 of the test split, keying saved predictions
+
+    Returns:
+        (report dict, {run_id: metrics to log to that run}); runs that could
+        not be scored on these rows are in neither
+    """
+    predictions = predictions or PredictionCache()
+    models = models or ModelCache()
+
+    # One entry per distinct run, named by the refs that resolve to it
+    names: Dict[str, List[str]] = {candidate_run_id: [CANDIDATE]}
+    versions: Dict[str, object] = {}
+    for ref, info in resolve_refs(registry, model_name, refs):
+        names.setdefault(info.run_id, []).append(ref)
+        versions[info.run_id] = info
+
+    y_test = read_split("test", FEATURES_DIR, columns=["target"])["target"].to_numpy()
+    processed = {}
+    processed_lock = threading.Lock()
+
+    def processed_test():
+        # Read once, by the first thread that needs to re-predict
+        with processed_lock:
+            if "test" not in processed:
+                processed["test"] = read_split("test", PROCESSED_DIR)
+            return processed["test"]
+
+    def predict(run_id):
+        y_pred = predictions.fetch(run_id, test_md5)
+        if y_pred is not None:
+            return y_pred, "predictions"
+        logger.info(f"No saved predictions for run {run_id}, loading its model")
+        state = load_run_state(models, run_id)
+        if state is None:
+            logger.warning(f"Not comparing run {run_id}, it logged no feature state")
+            return None
+        try:
+            model = load_run_predictor(models, run_id)
+        except Exception as e:
+            logger.warning(f"Not comparing run {run_id}, could not load its model: {e}")
+            return None
+        X_test = transform(state, processed_test()).drop(
+            columns=["target", *METADATA_COLUMNS], errors="ignore"
+        )
+        y_pred = model.predict(X_test)
+        predictions.save(run_id, test_md5, y_pred=y_pred)
+        return y_pred, "model"
+
+    results = {candidate_run_id: (np.asarray(candidate_pred), "evaluated")}
+    others = [run_id for run_id in names if run_id != candidate_run_id]
+    if others:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            for run_id, result in zip(others, pool.map(predict, others)):
+                if result is not None:
+                    results[run_id] = result
+
+    run_ids = list(results)
+    labels = [names[run_id][0] for run_id in run_ids]
+    rates = disagreement_rates([results[run_id][0] for run_id in run_ids])
+
+    entries, run_metrics = [], {}
+    for i, run_id in enumerate(run_ids):
+        y_pred, source = results[run_id]
+        metrics = ConfusionAccumulator().update(y_test, y_pred).metrics()
+        entries.append(
+            {
+                "name": labels[i],
+                "refs": names[run_id],
+                "run_id": run_id,
+                "version": (
+                    versions[run_id].version
+                    if run_id in versions
+                    else candidate_version
+                ),
+                "source": source,
+                **metrics,
+            }
+        )
+        run_metrics[run_id] = {
+            **{EVAL_METRICS[k]: v for k, v in metrics.items()},
+            **{
+                f"eval_disagreement_{labels[j]}": float(rates[i, j])
+                for j in range(len(run_ids))
+                if j != i
+            },
+        }
+
+    report = {
+        "model_name": model_name,
+        "test_md5": test_md5,
+        "n_rows": len(y_test),
+        "models": entries,
+        "disagreement": {"models": labels, "data": rates.tolist()},
+    }
+    return report, run_metrics
@@ -0,0 +1,120 @@
+"""
+Mergeable confusion-matrix accumulator for chunked evaluation
+
+Each chunk of (y_true, y_pred) is mapped to label indices and counted with
+one np.bincount over true * k + pred. Partial accumulators from worker
+processes merge by adding their matrices (after aligning label sets), so
+only k x k counts ever leave a worker.
+
+metrics_from_counts() derives accuracy and weighted precision/recall/F1 from
+confusion counts with the same arithmetic as sklearn's accuracy_score and
+precision_recall_fscore_support(average="weighted", zero_division=0), so a
+streamed evaluation reproduces the in-memory metrics bit for bit. It works
+on a stack of matrices too, which scores every slice of slices.py at once.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class ConfusionAccumulator:
+    """Confusion counts over a growing, sorted label set"""
+
+    def __init__(self, labels: Optional[Iterable] = None):
+        self.labels = np.unique(list(labels)) if labels is not None else np.array([])
+        k = len(self.labels)
+        self.counts = np.zeros((k, k), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        """Add a chunk of true and predicted labels"""
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        if y_true.shape != y_pred.shape:
+            raise ValueError(
+                f"y_true and y_pred differ in shape: {y_true.shape} vs {y_pred.shape}"
+            )
+        if y_true.size == 0:
+            return self
+        self._add_labels(np.concatenate([np.unique(y_true), np.unique(y_pred)]))
+        k = len(self.labels)
+        true_idx = np.searchsorted(self.labels, y_true)
+        pred_idx = np.searchsorted(self.labels, y_pred)
+        self.counts += np.bincount(true_idx * k + pred_idx, minlength=k * k).reshape(
+            k, k
+        )
+        return self
+
+    def merge(self, other: "ConfusionAccumulator"):
+        """Add another accumulator's counts (e.g. from a worker)"""
+        self._add_labels(other.labels)
+        idx = np.searchsorted(self.labels, other.labels)
+        self.counts[np.ix_(idx, idx)] += other.counts
+        return self
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.counts.sum())
+
+    def matrix(self):
+        """
+        (labels, counts) restricted to labels seen in y_true or y_pred,
+        as sklearn.metrics.confusion_matrix reports them
+        """
+        seen = (self.counts.sum(axis=0) + self.counts.sum(axis=1)) > 0
+        return self.labels[seen], self.counts[np.ix_(seen, seen)]
+
+    def metrics(self) -> Dict[str, float]:
+        """accuracy and weighted precision/recall/F1 of the accumulated rows"""
+        if self.n_rows == 0:
+            raise ValueError("No rows accumulated")
+        _, counts = self.matrix()
+        return {
+            name: float(value) for name, value in metrics_from_counts(counts).items()
+        }
+
+    def _add_labels(self, labels):
+        if self.labels.size == 0:
+            labels = np.unique(labels)
+        else:
+            labels = np.union1d(self.labels, labels)
+        if len(labels) == len(self.labels):
+            return
+        idx = np.searchsorted(labels, self.labels)
+        counts = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        counts[np.ix_(idx, idx)] = self.counts
+        self.labels, self.counts = labels, counts
+
+
+def metrics_from_counts(counts) -> Dict[str, np.ndarray]:
+    """
+    accuracy and weighted precision/recall/F1 of (..., k, k) confusion counts
+
+    Leading axes are independent matrices (e.g. one per slice), all scored
+    with array ops. Labels with no rows in a matrix get zero weight, so
+    including them does not change its metrics.
+    """
+    counts = np.asarray(counts)
+    tp_sum = np.diagonal(counts, axis1=-2, axis2=-1)
+    pred_sum = counts.sum(axis=-2)
+    true_sum = counts.sum(axis=-1)
+
+    precision = _divide(tp_sum, pred_sum)
+    recall = _divide(tp_sum, true_sum)
+    # sklearn's F-beta with beta=1: (1 + b^2) tp / (b^2 true + pred)
+    f1 = _divide(2.0 * tp_sum.astype(np.float64), 1.0 * true_sum + pred_sum)
+    return {
+        "accuracy": tp_sum.sum(axis=-1) / true_sum.sum(axis=-1).astype(np.float64),
+        "precision": np.average(precision, axis=-1, weights=true_sum),
+        "recall": np.average(recall, axis=-1, weights=true_sum),
+        "f1_score": np.average(f1, axis=-1, weights=true_sum),
+    }
+
+
+def _divide(numerator, denominator) -> np.ndarray:
+    """numerator / denominator, 0.0 where the denominator is 0 (sklearn)"""
+    denominator = np.asarray(denominator, dtype=np.float64).copy()
+    mask = denominator == 0.0
+    denominator[mask] = 1
+    result = np.asarray(numerator, dtype=np.float64) / denominator
+    result[mask] = 0.0
+    return result
@@ -1,54 +1,118 @@
 """
 Evaluate stage: Load model from DagsHub and evaluate
+
+Test predictions saved by the train stage are scored directly when they were
+made on this exact test split (same file md5); the model is only loaded and
+run when they are missing or stale.
+
+With evaluate.streaming the test split is read in chunks of
+evaluate.chunk_rows rows, predicted on evaluate.n_jobs worker processes and
+reduced to a confusion matrix, so the holdout never has to fit in memory.
+
+With evaluate.slices the same predictions are also scored per slice of the
+test rows into metrics/slices.json. Slices come from the processed test split
+(raw feature values and metadata columns such as the class name), which is
+row-aligned with the featurized one.
+
+evaluate.compare lists aliases or versions to score on the same test rows
+(see comparison.py). metrics/model_comparison.json gets every model's
+metrics and their pairwise disagreement, and each run one batch of metrics.
 """
 
 import json
 import logging
+import time
 from pathlib import Path
 
-import mlflow
-import mlflow.sklearn
-import pandas as pd
+import numpy as np
+import spool
+import tracing
+import yaml
+from comparison import DEFAULT_MAX_WORKERS, compare_models
+from compiled_forest import load_run_predictor
+from confusion import ConfusionAccumulator
+from mlflow.entities import Metric, RunTag
+from mlflow.tracking import MlflowClient
+from model_cache import MODEL_CACHE_DIR, ModelCache
+from parallel import available_cpus, ordered_map
+from prediction_cache import PREDICTIONS_DIR, PredictionCache, split_md5
+from processed_data import (
+    FEATURES_DIR,
+    PROCESSED_DIR,
+    open_split,
+    read_split,
+    read_split_rows,
+    split_num_rows,
+)
+from registry import ModelRegistry
 from sklearn.metrics import (
     accuracy_score,
     confusion_matrix,
     precision_recall_fscore_support,
 )
+from sklearn.utils.multiclass import unique_labels
+from slices import DEFAULT_BINS, DEFAULT_MIN_SUPPORT, slice_metrics
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+PARAMS_PATH = Path("/workspace/params.yaml")
+# Written by the train stage
+METADATA_PATH = Path("/models/model_metadata.json")
+METRICS_DIR = Path("/metrics")
+# Alias/version lookups cached by the train stage (short TTL)
+REGISTRY_CACHE = Path("/models/cache/registry.json")
+DEFAULT_CHUNK_ROWS = 65536
 
-def main():
-    logger.info("Starting model evaluation")
+# Models loaded by this (worker) process, by run ID
+_models = {}
 
-    # Load metadata to get run_id
-    metadata_path = Path("/models/model_metadata.json")
-    with open(metadata_path) as f:
-        metadata = json.load(f)
 
-    run_id = metadata["run_id"]
-    logger.info(f"Loading model from run: {run_id}")
+def load_params():
+    """Load the evaluate parameters from params.yaml"""
+    if not PARAMS_PATH.exists():
+        return {}
+    with open(PARAMS_PATH) as f:
+        params = yaml.safe_load(f) or {}
+    return params.get("evaluate") or {}
 
-    # Load model from MLflow/DagsHub
-    model_uri = f"runs:/{run_id}/model"
-    model = mlflow.sklearn.load_model(model_uri)
 
-    # Load test data
-    test_df = pd.read_csv("/data/processed/test.csv")
-    X_test = test_df.drop("target", axis=1)
-    y_test = test_df["target"]
+def predict_in_memory(model):
+    """Predict the whole test split at once"""
+    with tracing.span("load_features"):
+        X_test = read_split("test", FEATURES_DIR).drop("target", axis=1)
 
-    # Predictions
-    y_pred = model.predict(X_test)
+    with tracing.span("predict"):
+        return model.predict(X_test)
 
-    # Metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    precision, recall, f1, _ = precision_recall_fscore_support(
-        y_test, y_pred, average="weighted"
-    )
+
+def evaluate_predictions(y_pred):
+    """Score test predictions with sklearn, reading only the target column"""
+    with tracing.span("load_features"):
+        y_test = read_split("test", FEATURES_DIR, columns=["target"])["target"]
+    if len(y_test) != len(y_pred):
+        raise ValueError(
+            f"{len(y_pred)} saved predictions for a test split of {len(y_test)} rows"
+        )
+    return score(y_test, y_pred)
+
+
+def score(y_test, y_pred):
+    """
+    accuracy, weighted precision/recall/F1 and the confusion matrix
+
+    Returns:
+        (metrics, labels seen in y_test or y_pred, confusion matrix)
+    """
+    with tracing.span("metrics"):
+        accuracy = accuracy_score(y_test, y_pred)
+        precision, recall, f1, _ = precision_recall_fscore_support(
+            y_test, y_pred, average="weighted"
+        )
+        labels = unique_labels(y_test, y_pred)
+        cm = confusion_matrix(y_test, y_pred, labels=labels)
 
     metrics = {
         "accuracy": float(accuracy),
@@ -56,18 +120,187 @@ def main():
         "recall": float(recall),
         "f1_score": float(f1),
     }
+    return metrics, labels, cm
+
+
+def evaluate_streaming(
+    run_id, chunk_rows=DEFAULT_CHUNK_ROWS, n_jobs=1, keep_predictions=False
+):
+    """
+    Score the test split chunk by chunk on a process pool
+
+    Each worker loads the model once (from the local model cache) and returns
+    only the confusion counts of its chunk, plus its predictions when
+    keep_predictions is set (e.g. for slice metrics).
+
+    Returns:
+        (metrics identical to evaluate_predictions', labels, confusion matrix,
+        predictions or None)
+    """
+    n_rows = split_num_rows("test", FEATURES_DIR)
+    tasks = [
+        (run_id, start, min(start + chunk_rows, n_rows), keep_predictions)
+        for start in range(0, n_rows, chunk_rows)
+    ]
+    logger.info(
+        f"Streaming evaluation: {n_rows} rows in {len(tasks)} chunk(s) "
+        f"on {n_jobs} worker(s)"
+    )
+    total = ConfusionAccumulator()
+    chunks = []
+    with tracing.span("predict"):
+        for partial, y_pred in ordered_map(_evaluate_chunk, tasks, n_jobs):
+            total.merge(partial)
+            chunks.append(y_pred)
+    with tracing.span("metrics"):
+        metrics = total.metrics()
+        labels, cm = total.matrix()
+    y_pred = np.concatenate(chunks) if keep_predictions and chunks else None
+    return metrics, labels, cm, y_pred
+
+
+def class_names(labels):
+    """
+    Class name of each label, from the target_name column of the processed splits
+
+    Labels without a known name keep their value, as a string.
+    """
+    names = {}
+    for split in ("train", "test"):
+        try:
+            table, _ = open_split(split, PROCESSED_DIR)
+        except FileNotFoundError:
+            continue
+        if "target_name" not in table.column_names:
+            continue
+        pairs = read_split(split, PROCESSED_DIR, columns=["target", "target_name"])
+        pairs = pairs.drop_duplicates()
+        names.update(zip(pairs["target"].tolist(), pairs["target_name"].tolist()))
+    return [str(names.get(label, label)) for label in np.asarray(labels).tolist()]
+
+
+def evaluate_slices(y_pred, labels, params):
+    """
+    Per-slice metrics of the test predictions (see slices.py)
+
+    Rows are sliced by their processed values, so buckets are in the raw
+    units of each feature and metadata columns can be sliced too.
+    """
+    columns = params.get("columns")
+    with tracing.span("load_features"):
+        test_df = read_split(
+            "test", PROCESSED_DIR, None if columns is None else [*columns, "target"]
+        )
+    with tracing.span("metrics"):
+        report = slice_metrics(
+            test_df.drop("target", axis=1),
+            test_df["target"],
+            y_pred,
+            bins=int(params.get("bins", DEFAULT_BINS)),
+            crosses=bool(params.get("crosses", False)),
+            min_support=int(params.get("min_support", DEFAULT_MIN_SUPPORT)),
+            labels=labels,
+        )
+    report["labels"] = class_names(report["labels"])
+    return report
+
+
+def _load_model(run_id):
+    if run_id not in _models:
+        _models[run_id] = load_run_predictor(ModelCache(MODEL_CACHE_DIR), run_id)
+    return _models[run_id]
+
+
+def _evaluate_chunk(task):
+    run_id, start, stop, keep_predictions = task
+    model = _load_model(run_id)
+    df = read_split_rows("test", start, stop, FEATURES_DIR)
+    y_pred = model.predict(df.drop("target", axis=1))
+    partial = ConfusionAccumulator(model.classes_).update(df["target"], y_pred)
+    return partial, y_pred if keep_predictions else None
+
+
+def main():
+    logger.info("Starting model evaluation")
+    tracer = tracing.start("evaluate")
+    params = load_params()
+    offline = spool.configure()
+    registry_cache = (
+        spool.SPOOL_CACHE_DIR / REGISTRY_CACHE.name if offline else REGISTRY_CACHE
+    )
+
+    # Load metadata to get run_id
+    with open(METADATA_PATH) as f:
+        metadata = json.load(f)
+
+    run_id = metadata["run_id"]
+    logger.info(f"Loading model from run: {run_id}")
+
+    # Which aliases the evaluated version holds, and the production baseline
+    client = tracing.TracedClient(MlflowClient(), tracer)
+    registry = ModelRegistry(client, cache_path=registry_cache)
+    model_name = metadata.get("model_name", "iris-classifier")
+    with tracing.span("registry_lookup"):
+        evaluated = registry.get_version(model_name, metadata["version"])
+        production = registry.get_alias(model_name, "production")
+    if evaluated is not None:
+        aliases = ", ".join(evaluated.aliases) or "none"
+        logger.info(
+            f"Evaluating {model_name} v{evaluated.version} (aliases: {aliases})"
+        )
+
+    # Predictions train made on this exact test split, locally or from the run
+    with tracing.span("load_predictions"):
+        test_md5 = split_md5("test", FEATURES_DIR)
+        y_pred = PredictionCache(PREDICTIONS_DIR).fetch(run_id, test_md5)
+
+    # Else load the run's compiled forest (or its sklearn model) from the local
+    # model cache (filled by train), else MLflow/DagsHub
+    # Test data is already transformed with the state fitted on train
+    models = ModelCache(MODEL_CACHE_DIR)
+    slices = params.get("slices") or {}
+    compare = params.get("compare") or {}
+    refs = compare.get("models") or []
+    streaming = params.get("streaming", False)
+    if y_pred is not None:
+        logger.info(f"Scoring the run's saved predictions (test md5 {test_md5})")
+    elif not streaming:
+        with tracing.span("load_model"):
+            model = load_run_predictor(models, run_id)
+        y_pred = predict_in_memory(model)
+    if y_pred is not None:
+        metrics, labels, cm = evaluate_predictions(y_pred)
+    else:
+        n_jobs = params.get("n_jobs") or available_cpus()
+        if n_jobs <= 1:
+            with tracing.span("load_model"):
+                _models[run_id] = load_run_predictor(models, run_id)
+        metrics, labels, cm, y_pred = evaluate_streaming(
+            run_id,
+            int(params.get("chunk_rows") or DEFAULT_CHUNK_ROWS),
+            n_jobs,
+            keep_predictions=bool(slices.get("enabled", False) or refs),
+        )
+    logger.info(f"Model cache: {models.stats()}")
+    accuracy, precision = metrics["accuracy"], metrics["precision"]
+    recall, f1 = metrics["recall"], metrics["f1_score"]
 
     logger.info(f"Accuracy: {accuracy:.4f}")
     logger.info(f"Precision: {precision:.4f}")
     logger.info(f"Recall: {recall:.4f}")
     logger.info(f"F1 Score: {f1:.4f}")
+    if production is not None and production.run_id != run_id:
+        prod_accuracy = production.metrics.get("eval_accuracy")
+        if prod_accuracy is not None:
+            logger.info(
+                f"Production v{production.version} eval accuracy: {prod_accuracy:.4f}"
+            )
 
-    # Confusion matrix
-    cm = confusion_matrix(y_test, y_pred)
-    cm_dict = {"data": cm.tolist(), "labels": ["setosa", "versicolor", "virginica"]}
+    # Confusion matrix, labelled with the names of the classes found in the data
+    cm_dict = {"data": cm.tolist(), "labels": class_names(labels)}
 
     # Save metrics
-    output_dir = Path("/metrics")
+    output_dir = METRICS_DIR
     output_dir.mkdir(parents=True, exist_ok=True)
 
     metrics_path = output_dir / "metrics.json"
@@ -79,20 +312,75 @@ def main():
     with open(cm_path, "w") as f:
         json.dump(cm_dict, f, indent=2)
 
-    # Log to MLflow
-    with mlflow.start_run(run_id=run_id):
-        mlflow.log_metrics(
-            {
-                "eval_accuracy": accuracy,
-                "eval_precision": precision,
-                "eval_recall": recall,
-                "eval_f1": f1,
-            }
+    # Declared as a DVC metric, so written even when slicing is disabled
+    slices_path = output_dir / "slices.json"
+    if slices.get("enabled", False):
+        with tracing.span("slices"):
+            report = evaluate_slices(y_pred, labels, slices)
+        logger.info(
+            f"Slice metrics saved: {slices_path} ({len(report['slices'])} of "
+            f"{report['n_slices']} slices with >= {report['min_support']} rows)"
+        )
+    else:
+        report = {"enabled": False, "n_slices": 0, "slices": []}
+        logger.info(f"Slice metrics disabled, empty report saved: {slices_path}")
+    with open(slices_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    # Candidate vs the compared aliases/versions on the same test rows
+    run_metrics = {}
+    if refs:
+        with tracing.span("compare"):
+            comparison, run_metrics = compare_models(
+                registry,
+                model_name,
+                run_id,
+                y_pred,
+                refs,
+                test_md5,
+                int(compare.get("max_workers") or DEFAULT_MAX_WORKERS),
+                candidate_version=metadata.get("version"),
+                models=models,
+            )
+        comparison_path = output_dir / "model_comparison.json"
+        with open(comparison_path, "w") as f:
+            json.dump(comparison, f, indent=2)
+        for entry in comparison["models"]:
+            logger.info(
+                f"{entry['name']} (v{entry['version']}, {entry['source']}): "
+                f"accuracy {entry['accuracy']:.4f}"
+            )
+        logger.info(f"Model comparison saved: {comparison_path}")
+
+    # Log to MLflow, one batch per run. Other runs are only in run_metrics if
+    # they were scored on these rows with their own feature state
+    eval_metrics = {
+        "eval_accuracy": accuracy,
+        "eval_precision": precision,
+        "eval_recall": recall,
+        "eval_f1": f1,
+    }
+    eval_metrics.update(run_metrics.pop(run_id, {}))
+    if params.get("trace_metrics", False):
+        eval_metrics.update(
+            {f"eval_{k}": v for k, v in tracer.summary_metrics().items()}
+        )
+    timestamp = int(time.time() * 1000)
+    tags = [RunTag("eval_test_md5", test_md5)]
+    for target, batch in [(run_id, eval_metrics), *run_metrics.items()]:
+        client.log_batch(
+            target,
+            metrics=[
+                Metric(key, float(value), timestamp, 0) for key, value in batch.items()
+            ],
+            tags=tags,
         )
 
     logger.info(f"Metrics saved: {metrics_path}")
     logger.info(f"Confusion matrix saved: {cm_path}")
     logger.info(f"Logged to MLflow run: {run_id}")
+    trace_path = tracer.write(tracing.TRACE_PATH)
+    logger.info(f"Stage trace saved: {trace_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""
+Vectorized per-slice evaluation metrics
+
+A slice is the set of test rows sharing the value of one column, or of a
+pair of columns when crosses are enabled. Numeric columns with more than
+`bins` distinct values are cut into quantile buckets of their finite values;
+other columns (bins, categories, flags, metadata) are sliced by value. Missing
+values are their own "null" slice, and columns without any present value are
+skipped.
+
+Every slicing is encoded as an integer code per row. Codes of all slicings
+are offset into one id space, and a single np.bincount over
+(slice_id * k + true) * k + pred yields an (n_slices, k, k) confusion tensor.
+metrics_from_counts then scores all slices with array ops, with the same
+arithmetic as the stage's global metrics.
+"""
+
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from confusion import metrics_from_counts
+
+DEFAULT_BINS = 4
+DEFAULT_MIN_SUPPORT = 5
+NULL = "null"
+
+
+def encode_column(values: pd.Series, bins: int = DEFAULT_BINS):
+    """
+    Slice code of every row of a column
+
+    Returns:
+        (int64 codes in [0, n), list of n slice names)
+    """
+    if (
+        pd.api.types.is_numeric_dtype(values)
+        and not pd.api.types.is_bool_dtype(values)
+        and values.nunique() > bins
+    ):
+        return _quantile_buckets(values.to_numpy(dtype=np.float64), bins)
+
+    codes, uniques = pd.factorize(values, sort=True)
+    names = [str(u) for u in uniques]
+    missing = codes < 0
+    if missing.any():
+        codes = np.where(missing, len(names), codes)
+        names.append(NULL)
+    return codes.astype(np.int64), names
+
+
+def slice_metrics(
+    df: pd.DataFrame,
+    y_true,
+    y_pred,
+    columns: Optional[Sequence[str]] = None,
+    bins: int = DEFAULT_BINS,
+    crosses: bool = False,
+    min_support: int = DEFAULT_MIN_SUPPORT,
+    labels=None,
+) -> Dict:
+    """
+    Metrics of every slice of the rows of df with at least min_support rows
+
+    Args:
+        df: Slicing columns, row-aligned with y_true and y_pred
+        columns: Columns to slice by (default: all of df)
+        bins: Quantile buckets per numeric column
+        crosses: Also slice by every pair of columns
+        min_support: Slices with fewer rows are left out
+        labels: Known class labels (e.g. model.classes_); labels found in
+            y_true or y_pred are added
+
+    Returns:
+        Report with the labels and one entry per slice, worst accuracy first
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    if not len(df) == len(y_true) == len(y_pred):
+        raise ValueError(
+            f"Row counts differ: df {len(df)}, y_true {len(y_true)}, "
+            f"y_pred {len(y_pred)}"
+        )
+    columns = list(df.columns if columns is None else columns)
+    unknown = [c for c in columns if c not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown slice columns {unknown}")
+
+    encoded = {c: encode_column(df[c], bins) for c in columns}
+    # Nothing to compare when every row falls in the null slice
+    skipped = [c for c, (_, names) in encoded.items() if names == [NULL]]
+    columns = [c for c in columns if c not in skipped]
+    encoded = {c: encoded[c] for c in columns}
+    slicings = [
+        ((c,), codes, [(name,) for name in names])
+        for c, (codes, names) in encoded.items()
+    ]
+    if crosses:
+        slicings += [
+            _cross(a, b, encoded[a], encoded[b]) for a, b in combinations(columns, 2)
+        ]
+
+    label_values = [np.unique(y_true), np.unique(y_pred)]
+    if labels is not None:
+        label_values.append(np.asarray(labels))
+    all_labels = np.unique(np.concatenate(label_values))
+    k = len(all_labels)
+    cells = np.searchsorted(all_labels, y_true) * k + np.searchsorted(
+        all_labels, y_pred
+    )
+
+    # One id space for the slices of all slicings, counted in a single pass
+    n = len(cells)
+    ids = np.empty(n * len(slicings), dtype=np.int64)
+    offset = 0
+    for i, (_, codes, names) in enumerate(slicings):
+        ids[i * n : (i + 1) * n] = codes + offset
+        offset += len(names)
+    counts = np.bincount(
+        ids * (k * k) + np.tile(cells, len(slicings)), minlength=offset * k * k
+    ).reshape(offset, k, k)
+
+    support = counts.sum(axis=(1, 2))
+    keep = np.nonzero(support >= max(min_support, 1))[0]
+    scores = metrics_from_counts(counts[keep])
+
+    keys = [
+        dict(zip(slice_columns, values))
+        for slice_columns, _, names in slicings
+        for values in names
+    ]
+    entries = [
+        {
+            "slice": keys[idx],
+            "support": int(support[idx]),
+            **{name: float(values[i]) for name, values in scores.items()},
+        }
+        for i, idx in enumerate(keep)
+    ]
+    entries.sort(key=lambda entry: (entry["accuracy"], -entry["support"]))
+    return {
+        "labels": all_labels.tolist(),
+        "columns": columns,
+        "skipped_columns": skipped,
+        "bins": bins,
+        "crosses": crosses,
+        "min_support": min_support,
+        "n_rows": n,
+        "n_slices": int((support > 0).sum()),
+        "slices": entries,
+    }
+
+
+def _quantile_buckets(values: np.ndarray, bins: int) -> Tuple[np.ndarray, List]:
+    missing = np.isnan(values)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values), dtype=np.int64), [NULL]
+
+    # Edges over finite values; infinities fall into the outer buckets
+    edges = np.unique(np.quantile(values[finite], np.linspace(0, 1, bins + 1)))
+    if len(edges) == 1:
+        edges = np.repeat(edges, 2)
+    # Bucket i is [edges[i], edges[i + 1]); the last one includes the maximum
+    codes = np.searchsorted(edges[1:-1], values, side="right").astype(np.int64)
+    names = [f"[{lo:.4g}, {hi:.4g})" for lo, hi in zip(edges[:-1], edges[1:])]
+    names[-1] = names[-1][:-1] + "]"
+    if missing.any():
+        codes[missing] = len(names)
+        names.append(NULL)
+    return codes, names
+
+
+def _cross(a: str, b: str, encoded_a, encoded_b):
+    """Pair slicing of two encoded columns, keeping only observed pairs"""
+    (codes_a, names_a), (codes_b, names_b) = encoded_a, encoded_b
+    pairs, codes = np.unique(codes_a * len(names_b) + codes_b, return_inverse=True)
+    names = [
+        (names_a[pair // len(names_b)], names_b[pair % len(names_b)]) for pair in pairs
+    ]
+    return (a, b), codes.reshape(-1).astype(np.int64), names
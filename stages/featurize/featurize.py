@@ -0,0 +1,164 @@
+"""
+Featurize stage: Fit declarative feature transforms on train and apply them
+"""
+
+import logging
+import shutil
+from pathlib import Path
+
+import pyarrow as pa
+import yaml
+from feature_transforms import (
+    STATE_FILE,
+    build_state,
+    collect_stats,
+    fit_step,
+    merge_stats,
+    normalize_spec,
+    plan_pass,
+    save_state,
+    transform,
+)
+from parallel import ordered_map
+from processed_data import (
+    FEATURE_STORE,
+    FEATURES_DIR,
+    METADATA_COLUMNS,
+    PROCESSED_DIR,
+    SplitWriter,
+    clear_split,
+    open_split,
+    read_split_rows,
+    split_num_rows,
+    split_path,
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = Path("/workspace/params.yaml")
+    if not params_path.exists():
+        return {
+            "transforms": [{"type": "standardize"}],
+            "n_jobs": 1,
+            "chunk_rows": 65536,
+        }
+
+    with open(params_path) as f:
+        params = yaml.safe_load(f)
+    return params.get("featurize", {})
+
+
+def chunk_ranges(num_rows, chunk_rows):
+    """Split [0, num_rows) into consecutive (start, stop) ranges"""
+    return [
+        (start, min(start + chunk_rows, num_rows))
+        for start in range(0, num_rows, chunk_rows)
+    ]
+
+
+def _stats_task(args):
+    name, input_dir, start, stop, columns, steps, fitted, collect = args
+    df = read_split_rows(name, start, stop, input_dir, columns)
+    return collect_stats(df, steps, fitted, collect)
+
+
+def _transform_task(args):
+    name, input_dir, start, stop, columns, state = args
+    df = read_split_rows(name, start, stop, input_dir, columns)
+    return pa.Table.from_pandas(transform(state, df), preserve_index=False)
+
+
+def fit_transforms(steps, input_dir, n_jobs, chunk_rows, columns=None):
+    """Fit every stateful step on the train split, one chunked pass per level"""
+    fitted = [None] * len(steps)
+    ranges = chunk_ranges(split_num_rows("train", input_dir), chunk_rows)
+    if not ranges:
+        raise ValueError(f"Train split in {input_dir} is empty")
+
+    while collect := plan_pass(steps, fitted):
+        tasks = [
+            ("train", input_dir, start, stop, columns, steps, fitted, collect)
+            for start, stop in ranges
+        ]
+        stats = {}
+        for partial in ordered_map(_stats_task, tasks, n_jobs):
+            stats = merge_stats(stats, partial)
+
+        for i in collect:
+            fitted[i] = fit_step(steps[i], stats[i])
+            logger.info(f"Fitted step {i} ({steps[i]['type']}): {steps[i]['columns']}")
+
+    return build_state(steps, fitted)
+
+
+def transform_split(
+    name, state, input_dir, output_dir, n_jobs, chunk_rows, columns=None
+):
+    """Apply fitted state to a split chunk by chunk and write it as Feather"""
+    schema = _transform_task((name, input_dir, 0, 0, columns, state)).schema
+    ranges = chunk_ranges(split_num_rows(name, input_dir), chunk_rows)
+    tasks = [(name, input_dir, start, stop, columns, state) for start, stop in ranges]
+
+    with SplitWriter(name, schema.remove_metadata(), output_dir) as writer:
+        for table in ordered_map(_transform_task, tasks, n_jobs):
+            writer.write(table)
+
+    return writer.paths[0], writer.num_rows
+
+
+def main():
+    logger.info("Starting feature engineering")
+
+    # Load parameters
+    params = load_params()
+    n_jobs = params.get("n_jobs", 1)
+    chunk_rows = params.get("chunk_rows", 65536)
+
+    table, indices = open_split("train", PROCESSED_DIR)
+    # Metadata columns stay in data/processed for the evaluation reports
+    columns = [c for c in table.column_names if c not in METADATA_COLUMNS]
+    feature_columns = [c for c in columns if c != "target"]
+    steps = normalize_spec(params.get("transforms", []), feature_columns)
+    logger.info(f"Transforms: {[step['type'] for step in steps]}, n_jobs={n_jobs}")
+
+    # Fit on train only, so test never leaks into the fitted state
+    state = fit_transforms(steps, PROCESSED_DIR, n_jobs, chunk_rows, columns)
+
+    FEATURES_DIR.mkdir(parents=True, exist_ok=True)
+    state_path = FEATURES_DIR / STATE_FILE
+    save_state(state, state_path)
+    logger.info(f"Fitted state saved: {state_path}")
+
+    for name in ("train", "test", FEATURE_STORE):
+        clear_split(name, FEATURES_DIR)
+
+    if indices is None:
+        for name in ("train", "test"):
+            path, num_rows = transform_split(
+                name, state, PROCESSED_DIR, FEATURES_DIR, n_jobs, chunk_rows, columns
+            )
+            logger.info(f"{name.capitalize()} features saved: {path} ({num_rows} rows)")
+        return
+
+    # Indexed layout: transform the feature store once and reuse the split
+    # indices, so train and evaluate select their rows from it
+    path, num_rows = transform_split(
+        FEATURE_STORE, state, PROCESSED_DIR, FEATURES_DIR, n_jobs, chunk_rows, columns
+    )
+    logger.info(f"Feature store saved: {path} ({num_rows} rows)")
+    for name in ("train", "test"):
+        index_path = split_path(name, PROCESSED_DIR)
+        target = FEATURES_DIR / index_path.relative_to(PROCESSED_DIR)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(index_path, target)
+        logger.info(f"{name.capitalize()} indices saved: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,112 @@
 """
-Ingest stage: Download raw data
+Ingest stage: Stream raw data into a partitioned Parquet dataset
+
+Partitions are content-addressed (part-<sha256>.parquet). In append mode
+existing partitions are never rewritten, so only new data changes downstream.
+Overwrite mode writes the new dataset to a staging directory and swaps it in
+once it is complete.
 """
 
 import logging
+import shutil
 from pathlib import Path
 
-import pandas as pd
-from sklearn.datasets import load_iris
+import pyarrow.compute as pc
+import yaml
+from partition_writer import PartitionedParquetWriter, replace_partitions
+from sources import RAW_SCHEMA, get_source
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# Dot-prefixed, so dataset readers ignore it
+STAGING_DIR = ".tmp-overwrite"
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = Path("/workspace/params.yaml")
+    if not params_path.exists():
+        return {
+            "source": "iris",
+            "mode": "overwrite",
+            "batch_size": 65536,
+            "row_group_size": 131072,
+            "max_rows_per_file": 1048576,
+        }
+
+    with open(params_path) as f:
+        params = yaml.safe_load(f)
+    return params.get("ingest", {})
+
 
 def main():
     logger.info("Starting data ingestion")
 
-    # Load iris dataset
-    iris = load_iris()
-    df = pd.DataFrame(data=iris.data, columns=iris.feature_names)
-    df["target"] = iris.target
-    df["target_name"] = df["target"].map(
-        {i: name for i, name in enumerate(iris.target_names)}
+    # Load parameters
+    params = load_params()
+    source_name = params.get("source", "iris")
+    mode = params.get("mode", "overwrite")
+    batch_size = params.get("batch_size", 65536)
+    row_group_size = params.get("row_group_size", 131072)
+    max_rows_per_file = params.get("max_rows_per_file", 1048576)
+
+    source = get_source(source_name)
+    logger.info(
+        f"Source: {source_name}, "
+        f"mode={mode}, "
+        f"batch_size={batch_size}, "
+        f"row_group_size={row_group_size}, "
+        f"max_rows_per_file={max_rows_per_file}"
     )
 
-    # Save to data/raw
-    output_dir = Path("/data/raw")
+    if mode not in ("overwrite", "append"):
+        raise ValueError(f"Unknown ingest mode '{mode}', expected overwrite/append")
+
+    output_dir = Path("/data/raw/iris")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    output_path = output_dir / "iris.csv"
-    df.to_csv(output_path, index=False)
+    # Leftovers from an interrupted run are never valid partitions
+    for stale in output_dir.glob(".tmp-part-*.parquet"):
+        stale.unlink()
+    staging_dir = output_dir / STAGING_DIR
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # Overwrite stages the new dataset and replaces the old one only once it
+    # is complete; append keeps every existing partition
+    write_dir = staging_dir if mode == "overwrite" else output_dir
+
+    classes = set()
+    with PartitionedParquetWriter(
+        write_dir,
+        RAW_SCHEMA,
+        row_group_size,
+        max_rows_per_file,
+        content_addressed=True,
+    ) as writer:
+        batches = source(
+            batch_size=batch_size,
+            path=params.get("source_path"),
+            **(params.get("synthetic") or {}),
+        )
+        for batch in batches:
+            writer.write_batch(batch)
+            classes.update(pc.unique(batch.column("target_name")).to_pylist())
 
-    logger.info(f"Data saved: {output_path}")
-    logger.info(f"Shape: {df.shape}")
-    logger.info(f"Classes: {df['target_name'].unique().tolist()}")
+    new, unchanged, removed = writer.files, writer.existing, []
+    if mode == "overwrite":
+        new, unchanged, removed = replace_partitions(staging_dir, output_dir)
+
+    total = len(list(output_dir.glob("part-*.parquet")))
+    logger.info(
+        f"Data saved: {output_dir} "
+        f"({len(new)} new, {len(unchanged)} unchanged, {len(removed)} removed, "
+        f"{total} total partitions)"
+    )
+    logger.info(f"Rows: {writer.num_rows}")
+    logger.info(f"Classes: {sorted(classes)}")
 
 
 if __name__ == "__main__":
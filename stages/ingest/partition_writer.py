@@ -0,0 +1,195 @@
+"""
+Partitioned Parquet writer with bounded-size row groups
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionedParquetWriter:
+    """
+    Write a stream of record batches as a directory of Parquet part files
+
+    At most one row group (plus the incoming batch) is buffered in memory, so
+    peak memory depends on row_group_size and not on the size of the input.
+
+    With content_addressed=True every part file is named after the SHA-256 of
+    its bytes. Partitions are then immutable: re-ingesting identical data
+    produces the same name and the existing file is left untouched.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        schema: pa.Schema,
+        row_group_size: int,
+        max_rows_per_file: int,
+        content_addressed: bool = False,
+    ):
+        if row_group_size <= 0 or max_rows_per_file <= 0:
+            raise ValueError("row_group_size and max_rows_per_file must be positive")
+
+        self.output_dir = Path(output_dir)
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.max_rows_per_file = max_rows_per_file
+        self.content_addressed = content_addressed
+
+        # files: partitions written by this writer; existing: identical
+        # partitions that were already present (content-addressed mode only)
+        self.files: List[Path] = []
+        self.existing: List[Path] = []
+        self.num_rows = 0
+
+        self._buffer: List[pa.RecordBatch] = []
+        self._buffered_rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._path: Optional[Path] = None
+        self._file_rows = 0
+        self._file_count = 0
+
+    def __enter__(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_batch(self, batch: pa.RecordBatch):
+        """Buffer a batch and flush every full row group"""
+        if batch.num_rows == 0:
+            return
+
+        if batch.schema != self.schema:
+            batch = pa.Table.from_batches([batch]).cast(self.schema).to_batches()[0]
+
+        self._buffer.append(batch)
+        self._buffered_rows += batch.num_rows
+
+        while self._buffered_rows >= self._next_group_rows():
+            self._flush(self._next_group_rows())
+
+    def close(self) -> List[Path]:
+        """Flush remaining rows and close the current part file"""
+        while self._buffered_rows > 0:
+            self._flush(min(self._buffered_rows, self._next_group_rows()))
+
+        self._close_file()
+        return self.files
+
+    def abort(self):
+        """Discard buffered rows and the part file in progress"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._path.unlink(missing_ok=True)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _next_group_rows(self) -> int:
+        return min(self.row_group_size, self.max_rows_per_file - self._file_rows)
+
+    def _flush(self, num_rows: int):
+        table = pa.Table.from_batches(self._buffer, schema=self.schema)
+        head, tail = table.slice(0, num_rows), table.slice(num_rows)
+
+        if self._writer is None:
+            self._open_file()
+
+        self._writer.write_table(head, row_group_size=num_rows)
+        self._file_rows += num_rows
+        self.num_rows += num_rows
+
+        self._buffer = tail.to_batches()
+        self._buffered_rows = tail.num_rows
+
+        if self._file_rows >= self.max_rows_per_file:
+            self._close_file()
+
+    def _open_file(self):
+        if self.content_addressed:
+            # Dot-prefixed so dataset readers ignore it until it is renamed
+            name = f".tmp-part-{self._file_count:05d}.parquet"
+        else:
+            name = f"part-{self._file_count:05d}.parquet"
+
+        self._path = self.output_dir / name
+        self._writer = pq.ParquetWriter(self._path, self.schema)
+        self._file_rows = 0
+        self._file_count += 1
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+
+        self._writer.close()
+        self._writer = None
+        path = self._path
+
+        if self.content_addressed:
+            final = self.output_dir / f"part-{file_digest(path)[:16]}.parquet"
+            if final.exists():
+                path.unlink()
+                self.existing.append(final)
+                logger.info(f"Partition already present: {final}")
+                self._file_rows = 0
+                return
+            path.rename(final)
+            path = final
+
+        self.files.append(path)
+        logger.info(f"Wrote partition: {path} ({self._file_rows} rows)")
+        self._file_rows = 0
+
+
+def replace_partitions(
+    staging_dir: Path, output_dir: Path
+) -> Tuple[List[Path], List[Path], List[Path]]:
+    """
+    Replace the partitions of output_dir with the complete set in staging_dir
+
+    Partitions already present under the same content-addressed name are kept,
+    new ones are renamed in, and only then are the partitions missing from
+    staging_dir deleted, so an interrupted run never leaves a partial dataset.
+
+    Returns:
+        (added, unchanged, removed) partition paths in output_dir
+    """
+    staging_dir, output_dir = Path(staging_dir), Path(output_dir)
+    added, unchanged = [], []
+    for path in sorted(staging_dir.glob("part-*.parquet")):
+        final = output_dir / path.name
+        if final.exists():
+            path.unlink()
+            unchanged.append(final)
+        else:
+            path.rename(final)
+            added.append(final)
+
+    keep = {path.name for path in added + unchanged}
+    removed = [
+        p for p in sorted(output_dir.glob("part-*.parquet")) if p.name not in keep
+    ]
+    for path in removed:
+        path.unlink()
+    staging_dir.rmdir()
+    return added, unchanged, removed
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -5,9 +5,18 @@ Preprocess stage: Split and prepare data
 import logging
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import yaml
+from processed_data import (
+    FEATURE_STORE,
+    PROCESSED_DIR,
+    clear_split,
+    write_index,
+    write_split,
+)
 from sklearn.model_selection import train_test_split
+from streaming_split import SPLIT_STAMP, incremental_split, streaming_split
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -19,31 +28,60 @@ def load_params():
     """Load parameters from params.yaml"""
     params_path = Path("/workspace/params.yaml")
     if not params_path.exists():
-        return {"test_size": 0.2, "random_state": 42}
+        return {
+            "test_size": 0.2,
+            "random_state": 42,
+            "formats": ["feather"],
+            "split_mode": "sklearn",
+            "layout": "materialized",
+            "n_jobs": 1,
+        }
 
     with open(params_path) as f:
         params = yaml.safe_load(f)
     return params.get("preprocess", {})
 
 
-def main():
-    logger.info("Starting data preprocessing")
+def load_raw_data(input_path):
+    """Load raw data from a partitioned Parquet directory or a single CSV file"""
+    if input_path.is_dir():
+        return pd.read_parquet(input_path)
+    return pd.read_csv(input_path)
 
-    # Load parameters
-    params = load_params()
-    test_size = params.get("test_size", 0.2)
-    random_state = params.get("random_state", 42)
 
-    # Load raw data
-    input_path = Path("/data/raw/iris.csv")
-    df = pd.read_csv(input_path)
+def sklearn_split(input_path, test_size, random_state, formats, layout):
+    """Load the full raw dataset and split it with train_test_split"""
+    df = load_raw_data(input_path)
 
     logger.info(f"Loaded data: {df.shape}")
 
-    # Split features and target
-    X = df.drop(["target", "target_name"], axis=1)
+    # Split features (with the metadata columns) and target
+    X = df.drop("target", axis=1)
     y = df["target"]
 
+    if layout == "indexed":
+        # Split row positions only; the rows are stored once in the feature store
+        train_idx, test_idx = train_test_split(
+            np.arange(len(df)),
+            test_size=test_size,
+            random_state=random_state,
+            stratify=y,
+        )
+
+        # Store train rows, then test rows, so each split is one contiguous run
+        order = np.concatenate([np.sort(train_idx), np.sort(test_idx)])
+        store_df = X.iloc[order].reset_index(drop=True)
+        store_df["target"] = y.values[order]
+        store_paths = write_split(store_df, FEATURE_STORE, PROCESSED_DIR, formats)
+        n_train = len(train_idx)
+        train_path = write_index("train", np.arange(n_train), PROCESSED_DIR)
+        test_path = write_index("test", np.arange(n_train, len(order)), PROCESSED_DIR)
+
+        logger.info(f"Feature store saved: {[str(p) for p in store_paths]}")
+        logger.info(f"Train indices saved: {train_path} ({len(train_idx)} rows)")
+        logger.info(f"Test indices saved: {test_path} ({len(test_idx)} rows)")
+        return
+
     # Train/test split
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y
@@ -56,18 +94,70 @@ def main():
     test_df = X_test.copy()
     test_df["target"] = y_test.values
 
-    # Save processed data
-    output_dir = Path("/data/processed")
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Save processed data (Feather by default, CSV only when requested)
+    train_paths = write_split(train_df, "train", PROCESSED_DIR, formats)
+    test_paths = write_split(test_df, "test", PROCESSED_DIR, formats)
 
-    train_path = output_dir / "train.csv"
-    test_path = output_dir / "test.csv"
+    logger.info(f"Train data saved: {[str(p) for p in train_paths]} {train_df.shape}")
+    logger.info(f"Test data saved: {[str(p) for p in test_paths]} {test_df.shape}")
 
-    train_df.to_csv(train_path, index=False)
-    test_df.to_csv(test_path, index=False)
 
-    logger.info(f"Train data saved: {train_path} {train_df.shape}")
-    logger.info(f"Test data saved: {test_path} {test_df.shape}")
+def main():
+    logger.info("Starting data preprocessing")
+
+    # Load parameters
+    params = load_params()
+    test_size = params.get("test_size", 0.2)
+    random_state = params.get("random_state", 42)
+    formats = params.get("formats", ["feather"])
+    split_mode = params.get("split_mode", "sklearn")
+    n_jobs = params.get("n_jobs", 1)
+    layout = params.get("layout", "materialized")
+
+    input_path = Path("/data/raw/iris")
+
+    if split_mode not in ("sklearn", "streaming", "incremental"):
+        raise ValueError(
+            f"Unknown split_mode '{split_mode}', "
+            "expected 'sklearn', 'streaming' or 'incremental'"
+        )
+
+    if layout not in ("materialized", "indexed"):
+        raise ValueError(
+            f"Unknown layout '{layout}', expected 'materialized' or 'indexed'"
+        )
+    if layout == "indexed" and split_mode == "incremental":
+        raise ValueError("layout 'indexed' is not supported with incremental split")
+
+    # data/processed is persisted between runs for the incremental cache; the
+    # other modes rebuild it from scratch
+    if split_mode != "incremental":
+        clear_split("train")
+        clear_split("test")
+        clear_split(FEATURE_STORE)
+        (PROCESSED_DIR / SPLIT_STAMP).unlink(missing_ok=True)
+
+    if split_mode == "sklearn":
+        sklearn_split(input_path, test_size, random_state, formats, layout)
+    elif split_mode == "streaming":
+        # Out-of-core: one pass over row groups, memory independent of data size
+        train_rows, test_rows = streaming_split(
+            input_path,
+            PROCESSED_DIR,
+            test_size,
+            random_state,
+            formats,
+            n_jobs,
+            layout,
+        )
+        logger.info(f"Train rows saved: {train_rows}")
+        logger.info(f"Test rows saved: {test_rows}")
+    else:
+        # Only partitions added since the last run are split
+        summary = incremental_split(
+            input_path, PROCESSED_DIR, test_size, random_state, formats, n_jobs
+        )
+        logger.info(f"Incremental split summary: {summary}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,428 @@
+"""
+Out-of-core stratified train/test split over a partitioned Parquet dataset
+
+Every row gets a deterministic 64-bit hash from (random_state, partition name,
+row position in partition). Within each Parquet row group, the rows of every
+class with the smallest hashes fill that class's test quota. Quotas are carried
+across the row groups of a partition: after n_c rows of class c, exactly
+round(test_size * n_c) are in test, so rounding never accumulates, however
+small the row groups. Row groups are read and ranked in parallel; only the
+quota bookkeeping runs in order, so the output stays reproducible.
+
+Because a partition's split depends only on its own rows and name, the
+incremental mode keeps one output file per raw partition and only splits
+partitions it has not seen before.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from parallel import ordered_map
+from processed_data import (
+    FEATURE_STORE,
+    FORMATS,
+    IndexWriter,
+    SplitWriter,
+    clear_split,
+    partition_files,
+)
+
+logger = logging.getLogger(__name__)
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+SPLIT_STAMP = "_split_params.json"
+# Bumped when the per-partition outputs change (2: metadata columns are kept,
+# 3: class quotas are carried across row groups)
+SPLIT_STAMP_VERSION = 3
+
+
+class RowGroupTask(NamedTuple):
+    path: Path
+    row_group: int
+    row_offset: int
+    test_size: float
+    seed: int
+    target_column: str
+    drop_columns: Tuple[str, ...]
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """Vectorized SplitMix64 finalizer over a uint64 array"""
+    z = values.astype(np.uint64) + _GOLDEN_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+def partition_seed(random_state: int, partition_name: str) -> int:
+    """Derive a stable per-partition seed (independent of PYTHONHASHSEED)"""
+    digest = hashlib.sha256(f"{random_state}:{partition_name}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def row_hashes(seed: int, row_offset: int, num_rows: int) -> np.ndarray:
+    """Hash the row positions [row_offset, row_offset + num_rows) under seed"""
+    positions = np.arange(row_offset, row_offset + num_rows, dtype=np.uint64)
+    return splitmix64(positions ^ np.uint64(seed))
+
+
+class ClassQuotas:
+    """
+    Per-class test quotas carried across consecutive chunks of a partition
+
+    After n_c rows of class c, round(test_size * n_c) of them are in test.
+    """
+
+    def __init__(self, test_size: float):
+        self.test_size = test_size
+        self.seen: Dict = {}
+
+    def take(self, classes: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Test rows owed by the next chunk, for each of its classes"""
+        before = np.array([self.seen.get(c, 0) for c in classes.tolist()])
+        after = before + counts
+        self.seen.update(zip(classes.tolist(), after.tolist()))
+        return _round_half_up(self.test_size * after) - _round_half_up(
+            self.test_size * before
+        )
+
+
+class RankedRowGroup(NamedTuple):
+    table: pa.Table
+    classes: np.ndarray
+    codes: np.ndarray
+    counts: np.ndarray
+    ranks: np.ndarray
+
+    def test_mask(self, quotas: ClassQuotas) -> np.ndarray:
+        """Boolean mask, True for the rows filling this chunk's test quotas"""
+        return self.ranks < quotas.take(self.classes, self.counts)[self.codes]
+
+
+def class_ranks(y: np.ndarray, hashes: np.ndarray):
+    """
+    Rank every row within its class by hash
+
+    Returns:
+        (classes, class code of every row, rows per class, rank of every row)
+    """
+    order = np.lexsort((hashes, y))
+    classes, starts, counts = np.unique(y[order], return_index=True, return_counts=True)
+    codes = np.empty(len(y), dtype=np.int64)
+    codes[order] = np.repeat(np.arange(len(classes)), counts)
+    ranks = np.empty(len(y), dtype=np.int64)
+    ranks[order] = np.arange(len(y)) - np.repeat(starts, counts)
+    return classes, codes, counts, ranks
+
+
+def stratified_test_mask(
+    y: np.ndarray,
+    hashes: np.ndarray,
+    test_size: float,
+    quotas: Optional[ClassQuotas] = None,
+) -> np.ndarray:
+    """
+    Select the test rows of a chunk, filling every class's quota by hash order
+
+    Args:
+        y: Class labels of the chunk
+        hashes: Per-row hashes deciding the order within each class
+        test_size: Fraction of each class assigned to test
+        quotas: Quotas carried over from the previous chunks (default: none,
+            i.e. round(test_size * n_c) rows of every class c)
+
+    Returns:
+        Boolean mask, True for test rows
+    """
+    if len(y) == 0:
+        return np.zeros(0, dtype=bool)
+    classes, codes, counts, ranks = class_ranks(y, hashes)
+    quotas = quotas if quotas is not None else ClassQuotas(test_size)
+    return ranks < quotas.take(classes, counts)[codes]
+
+
+def _round_half_up(values: np.ndarray) -> np.ndarray:
+    return np.floor(values + 0.5).astype(np.int64)
+
+
+def plan_partition(
+    path: Path,
+    test_size: float,
+    random_state: int,
+    target_column: str = "target",
+    drop_columns: Iterable[str] = (),
+) -> List[RowGroupTask]:
+    """Build one task per row group of a Parquet partition from its metadata"""
+    metadata = pq.ParquetFile(path).metadata
+    seed = partition_seed(random_state, Path(path).stem)
+
+    tasks = []
+    row_offset = 0
+    for i in range(metadata.num_row_groups):
+        tasks.append(
+            RowGroupTask(
+                Path(path),
+                i,
+                row_offset,
+                test_size,
+                seed,
+                target_column,
+                tuple(drop_columns),
+            )
+        )
+        row_offset += metadata.row_group(i).num_rows
+    return tasks
+
+
+def plan_row_groups(
+    input_dir: Path, test_size: float, random_state: int
+) -> List[RowGroupTask]:
+    """Build row-group tasks for every partition in a dataset directory"""
+    tasks = []
+    for path in partition_files(input_dir, ".parquet"):
+        tasks.extend(plan_partition(path, test_size, random_state))
+    return tasks
+
+
+def _output_schema(task: RowGroupTask) -> pa.Schema:
+    schema = pq.read_schema(task.path)
+    return pa.schema([f for f in schema if f.name not in task.drop_columns])
+
+
+def rank_row_group(task: RowGroupTask) -> RankedRowGroup:
+    """Read one row group and rank its rows within their class"""
+    table = pq.ParquetFile(task.path).read_row_group(task.row_group)
+    keep = [c for c in table.column_names if c not in task.drop_columns]
+    table = table.select(keep)
+
+    y = table.column(task.target_column).to_numpy()
+    hashes = row_hashes(task.seed, task.row_offset, table.num_rows)
+    return RankedRowGroup(table, *class_ranks(y, hashes))
+
+
+def split_row_groups(
+    tasks: List[RowGroupTask], n_jobs: int = 1
+) -> Iterator[Tuple[pa.Table, np.ndarray]]:
+    """
+    (table, test mask) of every row group, in task order
+
+    Row groups are read and ranked on n_jobs processes; the quotas are then
+    carried in order across the row groups of each partition.
+    """
+    quotas = None
+    for task, ranked in zip(tasks, ordered_map(rank_row_group, tasks, n_jobs)):
+        if task.row_group == 0:
+            quotas = ClassQuotas(task.test_size)
+        yield ranked.table, ranked.test_mask(quotas)
+
+
+def streaming_split(
+    input_dir: Path,
+    output_dir: Path,
+    test_size: float,
+    random_state: int,
+    formats: Iterable[str] = ("feather",),
+    n_jobs: int = 1,
+    layout: str = "materialized",
+) -> Tuple[int, int]:
+    """
+    Split a partitioned dataset into train/test splits in one streaming pass
+
+    Args:
+        input_dir: Directory with Parquet partitions
+        output_dir: Directory to write the processed splits to
+        test_size: Fraction of each class assigned to test
+        random_state: Seed for the per-row hashes
+        formats: Output formats for the processed splits
+        n_jobs: Number of worker processes
+        layout: "materialized" (train/test copies) or "indexed" (feature
+            store plus split index arrays)
+
+    Returns:
+        Tuple of (train_rows, test_rows)
+    """
+    tasks = plan_row_groups(input_dir, test_size, random_state)
+    if not tasks:
+        raise FileNotFoundError(f"No Parquet partitions found in {input_dir}")
+
+    schema = _output_schema(tasks[0])
+
+    logger.info(f"Streaming split over {len(tasks)} row groups with n_jobs={n_jobs}")
+
+    formats = list(formats)
+    if layout == "indexed":
+        return _streaming_indexed_split(tasks, schema, output_dir, formats, n_jobs)
+
+    with (
+        SplitWriter("train", schema, output_dir, formats) as train_writer,
+        SplitWriter("test", schema, output_dir, formats) as test_writer,
+    ):
+        for table, test_mask in split_row_groups(tasks, n_jobs):
+            train_writer.write(table.filter(pa.array(~test_mask)))
+            test_writer.write(table.filter(pa.array(test_mask)))
+
+    return train_writer.num_rows, test_writer.num_rows
+
+
+def _streaming_indexed_split(
+    tasks: List[RowGroupTask],
+    schema: pa.Schema,
+    output_dir: Path,
+    formats: List[str],
+    n_jobs: int,
+) -> Tuple[int, int]:
+    """
+    Write every row once to the feature store and the split indices aside
+
+    Each row group is stored as its train rows followed by its test rows, so
+    both splits are one contiguous index run per row group.
+    """
+    offset = 0
+    with (
+        SplitWriter(FEATURE_STORE, schema, output_dir, formats) as store,
+        IndexWriter("train", output_dir) as train_index,
+        IndexWriter("test", output_dir) as test_index,
+    ):
+        for table, test_mask in split_row_groups(tasks, n_jobs):
+            n_train = int(np.count_nonzero(~test_mask))
+            store.write(table.filter(pa.array(~test_mask)))
+            store.write(table.filter(pa.array(test_mask)))
+            train_index.write(np.arange(offset, offset + n_train))
+            test_index.write(np.arange(offset + n_train, offset + table.num_rows))
+            offset += table.num_rows
+
+    return train_index.num_rows, test_index.num_rows
+
+
+def split_partition(
+    path: Path,
+    output_dir: Path,
+    test_size: float,
+    random_state: int,
+    formats: Iterable[str] = ("feather",),
+) -> Tuple[int, int]:
+    """
+    Split one raw partition into train/<partition> and test/<partition> files
+
+    Files are written under a temporary name and renamed once complete, so an
+    interrupted run never leaves a partial partition that looks cached.
+    """
+    path = Path(path)
+    tasks = plan_partition(path, test_size, random_state)
+    schema = _output_schema(tasks[0]) if tasks else pq.read_schema(path)
+
+    tmp_name = f".tmp-{path.stem}"
+    with (
+        SplitWriter(tmp_name, schema, Path(output_dir) / "train", formats) as train,
+        SplitWriter(tmp_name, schema, Path(output_dir) / "test", formats) as test,
+    ):
+        for table, test_mask in split_row_groups(tasks):
+            train.write(table.filter(pa.array(~test_mask)))
+            test.write(table.filter(pa.array(test_mask)))
+
+    for tmp_path in train.paths + test.paths:
+        tmp_path.rename(tmp_path.with_name(tmp_path.name[len(".tmp-") :]))
+
+    return train.num_rows, test.num_rows
+
+
+def _split_partition_task(args) -> Tuple[int, int]:
+    return split_partition(*args)
+
+
+def incremental_split(
+    input_dir: Path,
+    output_dir: Path,
+    test_size: float,
+    random_state: int,
+    formats: Iterable[str] = ("feather",),
+    n_jobs: int = 1,
+) -> dict:
+    """
+    Split only partitions without cached per-partition results
+
+    Cached results are reused when the split parameters are unchanged (tracked
+    in SPLIT_STAMP); outputs of partitions no longer in the raw dataset are
+    removed. Cost is proportional to the new partitions, not the full history.
+
+    Args:
+        input_dir: Directory with content-addressed Parquet partitions
+        output_dir: Directory holding the processed splits
+        test_size: Fraction of each class assigned to test
+        random_state: Seed for the per-row hashes
+        formats: Output formats for the processed splits
+        n_jobs: Number of worker processes (one partition per task)
+
+    Returns:
+        Summary with new/cached/removed partition counts and new row counts
+    """
+    output_dir = Path(output_dir)
+    formats = sorted(formats)
+    stamp = {
+        "version": SPLIT_STAMP_VERSION,
+        "test_size": test_size,
+        "random_state": random_state,
+        "formats": formats,
+    }
+    stamp_path = output_dir / SPLIT_STAMP
+
+    cached_stamp = json.loads(stamp_path.read_text()) if stamp_path.exists() else None
+    for name in ("train", "test"):
+        # Single-file splits would shadow the per-partition directories
+        clear_split(name, output_dir, keep_dir=cached_stamp == stamp)
+    stamp_path.unlink(missing_ok=True)
+
+    partitions = partition_files(input_dir, ".parquet")
+    if not partitions:
+        raise FileNotFoundError(f"No Parquet partitions found in {input_dir}")
+    stems = {p.stem for p in partitions}
+
+    def outputs(stem):
+        return [
+            output_dir / split / f"{stem}{FORMATS[fmt]}"
+            for split in ("train", "test")
+            for fmt in formats
+        ]
+
+    # Drop outputs (and leftovers) of partitions that are no longer ingested
+    removed = set()
+    for split in ("train", "test"):
+        (output_dir / split).mkdir(parents=True, exist_ok=True)
+        for out in (output_dir / split).iterdir():
+            if out.name.startswith("."):
+                out.unlink()
+            elif out.stem not in stems:
+                out.unlink()
+                removed.add(out.stem)
+
+    todo = [p for p in partitions if not all(o.exists() for o in outputs(p.stem))]
+    logger.info(
+        f"Incremental split: {len(todo)} new, "
+        f"{len(partitions) - len(todo)} cached, "
+        f"{len(removed)} removed partitions"
+    )
+
+    tasks = [(p, output_dir, test_size, random_state, formats) for p in todo]
+    train_rows = test_rows = 0
+    for new_train, new_test in ordered_map(_split_partition_task, tasks, n_jobs):
+        train_rows += new_train
+        test_rows += new_test
+
+    stamp_path.write_text(json.dumps(stamp, indent=2))
+
+    return {
+        "new_partitions": len(todo),
+        "cached_partitions": len(partitions) - len(todo),
+        "removed_partitions": len(removed),
+        "new_train_rows": train_rows,
+        "new_test_rows": test_rows,
+    }
@@ -0,0 +1,209 @@
+"""
+Ensemble compaction: keep the smallest forest prefix that matches full accuracy
+
+A random forest predicts with the mean of its trees' class probabilities, so
+the first k trees form a valid k-tree forest. Per-tree probabilities are
+stacked once and cumulatively summed, which scores every prefix in a single
+vectorized pass instead of refitting or re-predicting k forests.
+
+The cut is chosen on out-of-bag predictions of the training rows (each row is
+scored only by the trees that did not sample it), so the test split stays a
+clean holdout for reporting and promotion.
+"""
+
+import copy
+import logging
+import pickle
+import time
+from numbers import Integral
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from sklearn.utils import check_random_state
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per step; bounds the (trees, rows, classes) probability stack
+CHUNK_ROWS = 4096
+
+
+class CompactionReport(NamedTuple):
+    trees: int
+    original_trees: int
+    accuracy: float
+    original_accuracy: float
+    size_bytes: int
+    original_size_bytes: int
+    latency_ms: float
+    original_latency_ms: float
+
+    @property
+    def size_reduction(self) -> float:
+        return 1.0 - self.size_bytes / self.original_size_bytes
+
+    @property
+    def latency_speedup(self) -> float:
+        return self.original_latency_ms / max(self.latency_ms, 1e-9)
+
+    def as_dict(self) -> dict:
+        return {
+            **self._asdict(),
+            "size_reduction": self.size_reduction,
+            "latency_speedup": self.latency_speedup,
+        }
+
+
+def tree_probabilities(model, X) -> np.ndarray:
+    """Class probabilities of every tree, shape (trees, rows, classes)"""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    return np.stack(
+        [tree.predict_proba(X, check_input=False) for tree in model.estimators_]
+    )
+
+
+def prefix_accuracies(model, X, y, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    """
+    Accuracy of the forest made of the first k trees, for every k
+
+    Returns:
+        Array of length n_trees; element k-1 is the k-tree accuracy
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    correct = np.zeros(len(model.estimators_), dtype=np.int64)
+    for start in range(0, len(X), chunk_rows):
+        stack = tree_probabilities(model, X[start : start + chunk_rows])
+        # argmax of the running sum is the argmax of the running mean
+        votes = np.cumsum(stack, axis=0).argmax(axis=2)
+        labels = model.classes_[votes]
+        correct += (labels == y[start : start + chunk_rows]).sum(axis=1)
+    return correct / max(len(y), 1)
+
+
+def oob_prefix_accuracies(model, X, y, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    """
+    Out-of-bag accuracy of the forest made of the first k trees, for every k
+
+    X, y must be the rows the forest was fitted on. Prefix k is scored on the
+    rows that at least one of its trees left out of its bootstrap sample.
+
+    Returns:
+        Array of length n_trees; element k-1 is the k-tree OOB accuracy
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    oob = out_of_bag_mask(model, len(X))
+    correct = np.zeros(len(model.estimators_), dtype=np.int64)
+    scored = np.zeros(len(model.estimators_), dtype=np.int64)
+    for start in range(0, len(X), chunk_rows):
+        mask = oob[:, start : start + chunk_rows]
+        stack = tree_probabilities(model, X[start : start + chunk_rows])
+        votes = np.cumsum(stack * mask[:, :, None], axis=0).argmax(axis=2)
+        covered = np.cumsum(mask, axis=0) > 0
+        labels = model.classes_[votes]
+        correct += ((labels == y[start : start + chunk_rows]) & covered).sum(axis=1)
+        scored += covered.sum(axis=1)
+    return correct / np.maximum(scored, 1)
+
+
+def out_of_bag_mask(model, n_samples: int) -> np.ndarray:
+    """
+    (trees, rows) mask of the training rows each tree did not sample
+
+    Redraws every tree's bootstrap sample from its random_state with the
+    public check_random_state(...).randint, exactly as the forest drew it
+    when fitting without sample weights. tests/test_compaction.py checks this
+    against sklearn's private helpers and its oob_score_.
+    """
+    if not getattr(model, "bootstrap", False):
+        raise ValueError("Out-of-bag scoring needs a forest fitted with bootstrap")
+    n_bootstrap = bootstrap_size(n_samples, model.max_samples)
+    mask = np.zeros((len(model.estimators_), n_samples), dtype=bool)
+    for i, tree in enumerate(model.estimators_):
+        sampled = check_random_state(tree.random_state).randint(
+            0, n_samples, n_bootstrap
+        )
+        mask[i] = np.bincount(sampled, minlength=n_samples) == 0
+    return mask
+
+
+def bootstrap_size(n_samples: int, max_samples) -> int:
+    """
+    Rows drawn for each tree's bootstrap sample
+
+    Fractional max_samples is rejected: sklearn versions round it differently.
+    """
+    if max_samples is None:
+        return n_samples
+    if isinstance(max_samples, Integral):
+        return int(max_samples)
+    raise ValueError(
+        f"Compaction needs max_samples to be None or an int, got {max_samples!r}"
+    )
+
+
+def smallest_prefix(accuracies: np.ndarray, tolerance: float, min_trees: int = 1):
+    """Smallest tree count whose accuracy is within tolerance of the full forest"""
+    target = accuracies[-1] - tolerance
+    lowest = min(max(1, min_trees), len(accuracies))
+    within = np.nonzero(accuracies[lowest - 1 :] >= target)[0]
+    return lowest + int(within[0])
+
+
+def truncate_forest(model, n_trees: int):
+    """Shallow copy of model that keeps only its first n_trees trees"""
+    compact = copy.copy(model)
+    compact.estimators_ = list(model.estimators_[:n_trees])
+    compact.n_estimators = n_trees
+    return compact
+
+
+def predict_latency_ms(model, X, repeats: int = 5) -> float:
+    """Best-of-repeats wall time of model.predict(X) in milliseconds"""
+    best = float("inf")
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        model.predict(X)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def compact_forest(
+    model, X, y, tolerance: float = 0.0, min_trees: int = 1, repeats: int = 5
+) -> Tuple[object, CompactionReport]:
+    """
+    Shrink a fitted forest to the smallest prefix within tolerance of its
+    out-of-bag accuracy
+
+    Args:
+        model: Fitted RandomForestClassifier (bootstrap=True)
+        X, y: The training rows the forest was fitted on
+        tolerance: OOB accuracy the compact forest may lose against the full one
+        min_trees: Lower bound on the number of trees kept
+        repeats: Timing repeats for the latency comparison
+
+    Returns:
+        (compact model, report with OOB accuracies); the model is the
+        original if nothing was cut
+    """
+    accuracies = oob_prefix_accuracies(model, X, y)
+    n_trees = smallest_prefix(accuracies, tolerance, min_trees)
+    compact = model if n_trees == len(accuracies) else truncate_forest(model, n_trees)
+
+    report = CompactionReport(
+        trees=n_trees,
+        original_trees=len(accuracies),
+        accuracy=float(accuracies[n_trees - 1]),
+        original_accuracy=float(accuracies[-1]),
+        size_bytes=len(pickle.dumps(compact, protocol=pickle.HIGHEST_PROTOCOL)),
+        original_size_bytes=len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        latency_ms=predict_latency_ms(compact, X[:CHUNK_ROWS], repeats),
+        original_latency_ms=predict_latency_ms(model, X[:CHUNK_ROWS], repeats),
+    )
+    logger.info(
+        f"Compaction: {report.original_trees} -> {report.trees} trees, "
+        f"OOB accuracy {report.original_accuracy:.4f} -> {report.accuracy:.4f}, "
+        f"size -{report.size_reduction:.0%}, "
+        f"predict {report.latency_speedup:.1f}x faster"
+    )
+    return compact, report
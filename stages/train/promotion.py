@@ -0,0 +1,78 @@
+"""
+Promotion policy: paired bootstrap test of candidate vs production accuracy
+
+Both models are scored on the same test rows, so each row contributes a
+paired difference d = correct(candidate) - correct(production) in {-1, 0, 1}.
+Resampling rows with replacement only changes how many rows of each kind
+are drawn, so every bootstrap replicate is one multinomial draw of those
+three counts: thousands of resamples are a single (n_resamples, 3) array
+instead of an (n_resamples, n_rows) index matrix.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class BootstrapResult(NamedTuple):
+    diff: float
+    ci_low: float
+    ci_high: float
+    p_value: float
+    n_resamples: int
+    n_rows: int
+
+    def significant(self, alpha: float) -> bool:
+        """Candidate is better than production at level alpha"""
+        return self.diff > 0 and self.p_value < alpha
+
+
+def paired_bootstrap(
+    candidate_correct,
+    baseline_correct,
+    n_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> BootstrapResult:
+    """
+    Bootstrap the accuracy difference between two models on the same rows
+
+    Args:
+        candidate_correct: Per-row 0/1 (or bool) correctness of the candidate
+        baseline_correct: Same rows, correctness of the current model
+        n_resamples: Bootstrap replicates
+        confidence: Width of the reported percentile interval
+        seed: RNG seed, so a rerun reaches the same decision
+
+    Returns:
+        BootstrapResult with the observed difference, its percentile
+        interval and the one-sided p-value of "candidate is not better"
+    """
+    candidate = np.asarray(candidate_correct, dtype=np.int8)
+    baseline = np.asarray(baseline_correct, dtype=np.int8)
+    if candidate.shape != baseline.shape or candidate.ndim != 1:
+        raise ValueError(
+            f"Need paired 1-D correctness arrays, got {candidate.shape} "
+            f"and {baseline.shape}"
+        )
+    n_rows = len(candidate)
+    if n_rows == 0:
+        raise ValueError("Cannot bootstrap an empty test split")
+
+    diff = candidate - baseline
+    counts = np.array([(diff == -1).sum(), (diff == 0).sum(), (diff == 1).sum()])
+    rng = np.random.default_rng(seed)
+    draws = rng.multinomial(n_rows, counts / n_rows, size=n_resamples)
+    replicates = (draws[:, 2] - draws[:, 0]) / n_rows
+
+    tail = (1 - confidence) / 2
+    ci_low, ci_high = np.quantile(replicates, [tail, 1 - tail])
+    p_value = (1 + np.count_nonzero(replicates <= 0)) / (n_resamples + 1)
+    return BootstrapResult(
+        diff=float(diff.mean()),
+        ci_low=float(ci_low),
+        ci_high=float(ci_high),
+        p_value=float(p_value),
+        n_resamples=n_resamples,
+        n_rows=n_rows,
+    )
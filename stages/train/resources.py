@@ -0,0 +1,109 @@
+"""
+CPU planning and scaling benchmark for the train stage
+
+The CPU budget is the container's cgroup quota capped by the process
+affinity. Sweep candidates are spread over processes first; the remaining
+CPUs build each forest's trees in parallel through joblib. Tree seeds are
+drawn before fitting, so the worker count never changes the fitted model.
+"""
+
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import joblib
+from parallel import affinity_cpus, available_cpus, cgroup_cpu_limit
+from sklearn.ensemble import RandomForestClassifier
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {"threading", "loky"}
+# Tree building releases the GIL, so threads avoid copying the data
+DEFAULT_BACKEND = "threading"
+
+
+class ResourcePlan(NamedTuple):
+    cpus: int
+    cpu_limit: Optional[float]
+    affinity: int
+    sweep_workers: int
+    fit_jobs: int
+    backend: str
+
+
+def plan_resources(
+    config: Optional[Dict], n_candidates: int, sweep_jobs: Optional[int] = None
+) -> ResourcePlan:
+    """
+    Split the available CPUs between sweep processes and per-fit workers
+
+    Args:
+        config: train.resources block of params.yaml ({n_jobs, backend});
+            n_jobs overrides the detected CPU count
+        n_candidates: Number of models to fit
+        sweep_jobs: train.sweep.n_jobs (processes fitting candidates)
+
+    Returns:
+        ResourcePlan for run_sweep
+    """
+    config = config or {}
+    backend = config.get("backend") or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected {sorted(BACKENDS)}")
+
+    cpus = int(config.get("n_jobs") or available_cpus())
+    sweep_workers = max(1, min(sweep_jobs or cpus, n_candidates))
+    return ResourcePlan(
+        cpus=cpus,
+        cpu_limit=cgroup_cpu_limit(),
+        affinity=affinity_cpus(),
+        sweep_workers=sweep_workers,
+        fit_jobs=max(1, cpus // sweep_workers),
+        backend=backend,
+    )
+
+
+def fit_seconds(params: Dict, X, y, n_jobs: int, backend: str, repeats: int = 3):
+    """Best-of-repeats wall time of fitting a forest on n_jobs workers"""
+    best = float("inf")
+    for _ in range(max(1, repeats)):
+        model = RandomForestClassifier(**params)
+        started = time.perf_counter()
+        with joblib.parallel_backend(backend, n_jobs=n_jobs):
+            model.fit(X, y)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def scaling_curve(
+    params: Dict,
+    X,
+    y,
+    max_workers: int,
+    backend: str = "threading",
+    repeats: int = 3,
+) -> List[Dict]:
+    """
+    Fit the same forest on 1..max_workers workers
+
+    Returns:
+        Rows of {workers, seconds, speedup, efficiency} relative to 1 worker
+    """
+    rows = []
+    for workers in range(1, max(1, max_workers) + 1):
+        seconds = fit_seconds(params, X, y, workers, backend, repeats)
+        baseline = rows[0]["seconds"] if rows else seconds
+        speedup = baseline / seconds if seconds > 0 else 0.0
+        rows.append(
+            {
+                "workers": workers,
+                "seconds": round(seconds, 4),
+                "speedup": round(speedup, 3),
+                "efficiency": round(speedup / workers, 3),
+            }
+        )
+        logger.info(
+            f"{workers} worker(s): {seconds:.3f}s, speedup {speedup:.2f}x, "
+            f"efficiency {speedup / workers:.0%}"
+        )
+    return rows
@@ -0,0 +1,178 @@
+"""
+Local content-addressed cache of training results
+
+An entry is keyed by the data version, the resolved hyperparameters (all
+sweep candidates) and the hash of the training code. It stores the fitted
+model plus the metrics and the MLflow run/model version that produced it,
+so rerunning an unchanged configuration reuses that run instead of
+retraining, re-uploading and registering a duplicate version.
+
+Entries are directories written atomically (temp dir + rename). Reading an
+entry refreshes its mtime; when the cache exceeds its size cap the least
+recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FILE = "entry.json"
+MODEL_FILE = "model.joblib"
+
+
+def code_hash(code_paths: Iterable[Path]) -> str:
+    """Hash the source files that determine how a model is fitted"""
+    digest = hashlib.sha256()
+    for path in code_paths:
+        digest.update(f"code:{Path(path).name}\n".encode())
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(
+    data_version: str,
+    candidates: List[Dict],
+    code: str,
+    options: Optional[Dict] = None,
+) -> str:
+    """
+    Hash everything that determines a training result
+
+    code is a code_hash(); options holds any other settings that change the
+    registered model (e.g. compaction).
+    """
+    digest = hashlib.sha256()
+    digest.update(f"data:{data_version}\ncode:{code}\n".encode())
+    digest.update(json.dumps(candidates, sort_keys=True, default=str).encode())
+    if options:
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU directory cache of {key: fitted model + result metadata}"""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key (and mark it recently used)"""
+        entry_dir = self.root / key
+        entry_path = entry_dir / ENTRY_FILE
+        if not entry_path.exists():
+            return None
+        try:
+            result = json.loads(entry_path.read_text())
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key[:12]}: {e}")
+            self.discard(key)
+            return None
+        os.utime(entry_dir)
+        return result
+
+    def find_warm_start(
+        self, data_version: str, code: str, params: Dict
+    ) -> Optional[Tuple[str, Dict]]:
+        """
+        Find the largest cached forest that params can grow from
+
+        A candidate entry was trained on the same data with the same code and
+        identical hyperparameters except for a smaller n_estimators.
+
+        Returns:
+            (key, result) of the best match, or None
+        """
+        wanted = {k: v for k, v in params.items() if k != "n_estimators"}
+        best = None
+        for entry_dir in self.entries():
+            try:
+                result = json.loads((entry_dir / ENTRY_FILE).read_text())
+            except (OSError, json.JSONDecodeError):
+                continue
+            cached = dict(fitted_params(result))
+            n_estimators = cached.pop("n_estimators", None)
+            if (
+                result.get("data_version") == data_version
+                and result.get("code_hash") == code
+                and "sweep" not in result
+                and cached == wanted
+                and n_estimators is not None
+                and n_estimators < params["n_estimators"]
+                and (
+                    best is None
+                    or n_estimators > fitted_params(best[1])["n_estimators"]
+                )
+            ):
+                best = (entry_dir.name, result)
+        if best is not None:
+            os.utime(self.root / best[0])
+        return best
+
+    def model_path(self, key: str) -> Path:
+        return self.root / key / MODEL_FILE
+
+    def load_model(self, key: str):
+        """Load the fitted model stored with key"""
+        return joblib.load(self.root / key / MODEL_FILE)
+
+    def put(self, key: str, model, result: Dict):
+        """Store a model and its result, then evict down to the size cap"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            joblib.dump(model, tmp_dir / MODEL_FILE)
+            (tmp_dir / ENTRY_FILE).write_text(json.dumps(result, indent=2))
+            self.discard(key)
+            os.rename(tmp_dir, self.root / key)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.evict()
+
+    def discard(self, key: str):
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def entries(self) -> List[Path]:
+        """Entry directories, least recently used first"""
+        if not self.root.exists():
+            return []
+        dirs = [p for p in self.root.iterdir() if p.is_dir() and p.name[0] != "."]
+        return sorted(dirs, key=lambda p: p.stat().st_mtime)
+
+    def size(self) -> int:
+        return sum(_dir_size(p) for p in self.entries())
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = [(p, _dir_size(p)) for p in self.entries()]
+        total = sum(size for _, size in entries)
+        for path, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted cached result {path.name[:12]} ({size} bytes)")
+
+
+def fitted_params(result: Dict) -> Dict:
+    """
+    Hyperparameters of the cached (full) forest
+
+    result["params"] describes the registered model, which compaction may
+    have cut to fewer trees than were fitted and cached.
+    """
+    return result.get("fitted_params") or result.get("params") or {}
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
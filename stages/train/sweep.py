@@ -0,0 +1,367 @@
+"""
+Hyperparameter sweep: expand a grid/random search spec and fit candidates in parallel
+
+The train/test arrays are written once as .npy files and opened read-only with
+mmap_mode="r" in every worker, so candidates share one copy of the data
+through the page cache instead of each worker receiving a pickled copy.
+With more than one candidate, each is fitted on the training rows minus a
+validation split and ranked on it, so the test split stays a clean holdout
+for reporting and promotion. Only the winner is refitted on every training
+row and scored on test. Candidates are logged as nested MLflow runs under the
+stage's parent run, from the parent process through the stage's client.
+
+A candidate can start from a smaller fitted forest and grow only the extra
+trees with warm_start. Forest trees draw their seeds from one RNG stream and
+warm_start skips the seeds of existing trees, so with an integer
+random_state the grown forest equals a fresh fit; grow_forest checks this.
+"""
+
+import itertools
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import joblib
+import numpy as np
+from mlflow.entities import Metric, Param, RunTag
+from parallel import available_cpus, ordered_map
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.utils import check_random_state
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = {"none", "grid", "random"}
+ARRAYS = ("X_train", "y_train", "X_test", "y_test", "validation")
+DEFAULT_VALIDATION_FRACTION = 0.2
+
+# Memory-mapped arrays opened by this process, keyed by data directory
+_arrays: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+class CandidateTask(NamedTuple):
+    index: int
+    params: Dict
+    data_dir: str
+    feature_names: Tuple[str, ...]
+    output_dir: str
+    init_model: Optional[str] = None
+    fit_jobs: int = 1
+    backend: str = "threading"
+    # Fit without the validation rows and score on them instead of test
+    validate: bool = False
+
+
+class CandidateResult(NamedTuple):
+    index: int
+    params: Dict
+    train_accuracy: float
+    test_accuracy: Optional[float]
+    model_path: str
+    run_id: Optional[str]
+    warm_started: bool = False
+    validation_accuracy: Optional[float] = None
+
+
+def expand_candidates(base: Dict, sweep: Optional[Dict]) -> List[Dict]:
+    """
+    Expand a sweep spec into the list of hyperparameter sets to fit
+
+    Args:
+        base: Default hyperparameters (train block of params.yaml)
+        sweep: {strategy: none|grid|random, search: {param: values}, n_trials,
+            seed}. Grid search takes every combination of the value lists.
+            Random search draws n_trials candidates, picking from value lists
+            or uniformly from {low, high} ranges (integers if both bounds are).
+
+    Returns:
+        Candidate hyperparameter dicts (base values overridden by the sweep)
+    """
+    sweep = sweep or {}
+    strategy = sweep.get("strategy", "none")
+    if strategy not in STRATEGIES:
+        raise ValueError(
+            f"Unknown sweep strategy '{strategy}', expected {sorted(STRATEGIES)}"
+        )
+
+    search = sweep.get("search") or {}
+    if strategy == "none" or not search:
+        return [dict(base)]
+
+    names = sorted(search)
+    if strategy == "grid":
+        for name in names:
+            if not isinstance(search[name], list):
+                raise ValueError(f"Grid search needs a list of values for '{name}'")
+        combos = itertools.product(*(search[name] for name in names))
+        return [{**base, **dict(zip(names, combo))} for combo in combos]
+
+    rng = np.random.default_rng(sweep.get("seed", 0))
+    candidates = []
+    for _ in range(int(sweep.get("n_trials", 10))):
+        candidate = dict(base)
+        for name in names:
+            candidate[name] = _sample(rng, search[name])
+        candidates.append(candidate)
+    return candidates
+
+
+def write_arrays(data_dir: Path, **arrays: np.ndarray):
+    """Save arrays as .npy files that workers memory-map"""
+    for name, values in arrays.items():
+        np.save(data_dir / f"{name}.npy", np.ascontiguousarray(values))
+
+
+def load_arrays(data_dir: str) -> Dict[str, np.ndarray]:
+    """Open the shared arrays read-only (once per process)"""
+    if data_dir not in _arrays:
+        _arrays[data_dir] = {
+            name: np.load(Path(data_dir) / f"{name}.npy", mmap_mode="r")
+            for name in ARRAYS
+        }
+    return _arrays[data_dir]
+
+
+def expected_tree_seeds(random_state: int, n_estimators: int) -> List[int]:
+    """Seeds a fresh RandomForest fit assigns to its trees"""
+    rng = check_random_state(random_state)
+    return rng.randint(np.iinfo(np.int32).max, size=n_estimators).tolist()
+
+
+def grow_forest(model, params: Dict, X, y):
+    """
+    Grow a fitted forest to params["n_estimators"] trees with warm_start
+
+    Raises:
+        ValueError: if the grown forest would differ from a fresh fit
+    """
+    if not isinstance(params.get("random_state"), int):
+        raise ValueError("warm start needs an integer random_state")
+    other = {k: v for k, v in params.items() if k != "n_estimators"}
+    current = {k: v for k, v in model.get_params().items() if k in other}
+    if current != other:
+        raise ValueError(f"warm start model params {current} differ from {other}")
+
+    model.set_params(n_estimators=params["n_estimators"], warm_start=True)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+
+    seeds = [tree.random_state for tree in model.estimators_]
+    if seeds != expected_tree_seeds(params["random_state"], params["n_estimators"]):
+        raise ValueError("warm-started trees do not match a fresh fit")
+    return model
+
+
+def fit_candidate(task: CandidateTask) -> CandidateResult:
+    """Fit one candidate on the shared arrays and dump the model"""
+    import pandas as pd
+
+    data = load_arrays(task.data_dir)
+    columns = list(task.feature_names)
+    X_train = pd.DataFrame(data["X_train"], columns=columns, copy=False)
+    y_train = data["y_train"]
+    if task.validate:
+        held_out = data["validation"]
+        X_val, y_val = X_train[held_out], y_train[held_out]
+        X_train, y_train = X_train[~held_out], y_train[~held_out]
+
+    # Trees are built on fit_jobs workers; n_jobs stays None in the saved model
+    model = None
+    with joblib.parallel_backend(task.backend, n_jobs=task.fit_jobs):
+        if task.init_model:
+            base = joblib.load(task.init_model)
+            n_trees = len(base.estimators_)
+            try:
+                model = grow_forest(base, task.params, X_train, y_train)
+                logger.info(
+                    f"Warm start: grew {n_trees} -> {len(model.estimators_)} trees"
+                )
+            except ValueError as e:
+                logger.warning(f"Warm start skipped ({e}), fitting from scratch")
+                model = None
+        warm_started = model is not None
+        if model is None:
+            model = RandomForestClassifier(**task.params)
+            model.fit(X_train, y_train)
+    train_accuracy = float(model.score(X_train, y_train))
+    if task.validate:
+        test_accuracy = None
+        validation_accuracy = float(model.score(X_val, y_val))
+    else:
+        X_test = pd.DataFrame(data["X_test"], columns=columns, copy=False)
+        test_accuracy = float(model.score(X_test, data["y_test"]))
+        validation_accuracy = None
+
+    model_path = Path(task.output_dir) / f"candidate-{task.index:04d}.joblib"
+    joblib.dump(model, model_path)
+
+    return CandidateResult(
+        task.index,
+        task.params,
+        train_accuracy,
+        test_accuracy,
+        str(model_path),
+        None,
+        warm_started,
+        validation_accuracy,
+    )
+
+
+def run_sweep(
+    candidates: List[Dict],
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    n_jobs: Optional[int] = None,
+    experiment_id: Optional[str] = None,
+    parent_run_id: Optional[str] = None,
+    init_model: Optional[str] = None,
+    fit_jobs: int = 1,
+    backend: str = "threading",
+    client=None,
+    validation_fraction: float = DEFAULT_VALIDATION_FRACTION,
+    seed: int = 0,
+    refit_jobs: Optional[int] = None,
+) -> Tuple[CandidateResult, object, List[CandidateResult]]:
+    """
+    Fit every candidate and return the best one by validation accuracy
+
+    A single candidate is fitted on all training rows. Several are fitted
+    without a stratified validation_fraction of the training rows (split with
+    seed) and ranked on it; ties go to the earlier candidate. The best
+    parameters are then refitted on all training rows, so only that model is
+    scored on test. With client, candidates are logged as nested runs of
+    parent_run_id. init_model (a joblib path) warm-starts a single candidate
+    from a smaller forest. n_jobs processes fit candidates, each building its
+    trees on fit_jobs joblib workers. The final fit runs alone, on refit_jobs
+    workers (default: every available CPU).
+
+    Returns:
+        (best result, best fitted model, all results in candidate order)
+    """
+    n_jobs = min(n_jobs or available_cpus(), len(candidates))
+    select = len(candidates) > 1
+    logger.info(
+        f"Fitting {len(candidates)} candidate(s) on {n_jobs} process(es), "
+        f"{fit_jobs} {backend} worker(s) each"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="sweep-") as workdir:
+        data_dir = Path(workdir) / "data"
+        output_dir = Path(workdir) / "models"
+        data_dir.mkdir()
+        output_dir.mkdir()
+        y_train = np.asarray(y_train)
+        validation = np.zeros(len(y_train), dtype=bool)
+        if select:
+            # Stratify unless a class is too rare to appear on both sides
+            _, counts = np.unique(y_train, return_counts=True)
+            _, held_out = train_test_split(
+                np.arange(len(y_train)),
+                test_size=validation_fraction,
+                random_state=seed,
+                stratify=y_train if counts.min() >= 2 else None,
+            )
+            validation[held_out] = True
+        write_arrays(
+            data_dir,
+            X_train=np.asarray(X_train),
+            y_train=y_train,
+            X_test=np.asarray(X_test),
+            y_test=np.asarray(y_test),
+            validation=validation,
+        )
+
+        def task(i, params, validate, jobs=fit_jobs):
+            return CandidateTask(
+                i,
+                params,
+                str(data_dir),
+                tuple(X_train.columns),
+                str(output_dir),
+                None if select else init_model,
+                jobs,
+                backend,
+                validate,
+            )
+
+        results = []
+        index, params, best = 0, candidates[0], None
+        if select:
+            tasks = [task(i, c, True) for i, c in enumerate(candidates)]
+            for result in ordered_map(fit_candidate, tasks, n_jobs):
+                os.remove(result.model_path)
+                logger.info(
+                    f"Candidate {result.index}: {result.params} "
+                    f"train={result.train_accuracy:.4f} "
+                    f"validation={result.validation_accuracy:.4f}"
+                )
+                if client is not None and parent_run_id:
+                    run_id = _log_candidate(
+                        client, experiment_id, parent_run_id, result
+                    )
+                    result = result._replace(run_id=run_id)
+                results.append(result)
+                if (
+                    best is None
+                    or result.validation_accuracy > best.validation_accuracy
+                ):
+                    best = result
+            index, params = best.index, best.params
+
+        # The winner (or the only candidate) is fitted on every training row,
+        # alone, so it gets every CPU rather than one sweep worker's share
+        final = fit_candidate(
+            task(index, params, False, refit_jobs or available_cpus())
+        )
+        if best is None:
+            results = [final]
+        else:
+            final = final._replace(
+                run_id=best.run_id, validation_accuracy=best.validation_accuracy
+            )
+            logger.info(
+                f"Best candidate {index}: {params} "
+                f"validation={best.validation_accuracy:.4f}, "
+                f"test after refit={final.test_accuracy:.4f}"
+            )
+        model = joblib.load(final.model_path)
+        _arrays.pop(str(data_dir), None)
+
+    return final, model, results
+
+
+def _sample(rng: np.random.Generator, space):
+    if isinstance(space, list):
+        return space[int(rng.integers(len(space)))]
+    low, high = space["low"], space["high"]
+    if isinstance(low, int) and isinstance(high, int):
+        return int(rng.integers(low, high + 1))
+    return float(rng.uniform(low, high))
+
+
+def _log_candidate(
+    client, experiment_id: Optional[str], parent_run_id: str, result: CandidateResult
+) -> str:
+    run = client.create_run(
+        experiment_id,
+        run_name=f"candidate-{result.index:04d}",
+        tags={"mlflow.parentRunId": parent_run_id},
+    )
+    run_id = run.info.run_id
+    timestamp = int(time.time() * 1000)
+    client.log_batch(
+        run_id,
+        metrics=[
+            Metric("train_accuracy", result.train_accuracy, timestamp, 0),
+            Metric("validation_accuracy", result.validation_accuracy, timestamp, 0),
+        ],
+        params=[Param(k, str(v)) for k, v in sorted(result.params.items())],
+        tags=[RunTag("sweep_candidate", str(result.index))],
+    )
+    client.set_terminated(run_id)
+    return run_id
@@ -0,0 +1,297 @@
+"""
+Round-trip-aware MLflow helpers for the train stage
+
+Against a remote tracking server every fluent mlflow.set_tag/log_param call
+is one HTTP request. BatchLogger buffers params, tags and metrics for a run
+and sends them through MlflowClient.log_batch; registry tags are sent
+concurrently; CountingClient counts the requests the stage makes.
+BackgroundUploader moves artifact and model uploads off the critical path.
+"""
+
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import mlflow
+import mlflow.sklearn
+import tracing
+from mlflow.entities import Metric, Param, RunTag
+
+logger = logging.getLogger(__name__)
+
+# Per-request limits of the log_batch REST endpoint
+MAX_BATCH_ENTITIES = 1000
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_TAGS = 100
+
+
+class CountingClient:
+    """MlflowClient proxy that counts the tracking requests made through it"""
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self.round_trips = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.record(name)
+            return attr(*args, **kwargs)
+
+        return call
+
+    def record(self, name: str, count: int = 1):
+        """Count requests made outside the client (e.g. fluent mlflow calls)"""
+        with self._lock:
+            self.round_trips[name] += count
+
+    @property
+    def total_round_trips(self) -> int:
+        return sum(self.round_trips.values())
+
+
+class BatchLogger:
+    """
+    Buffer run params/tags/metrics and flush them with log_batch
+
+    Mirrors the fluent set_tag/log_param/log_metric API, so it can be passed
+    wherever an mlflow-like object is expected. The buffer is flushed when it
+    holds flush_size items and on exit of the with block.
+    """
+
+    def __init__(self, client, run_id: str, flush_size: int = MAX_BATCH_ENTITIES):
+        self.client = client
+        self.run_id = run_id
+        self.flush_size = max(1, min(flush_size, MAX_BATCH_ENTITIES))
+        self.batches = 0
+        self._params: List[Param] = []
+        self._tags: List[RunTag] = []
+        self._metrics: List[Metric] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def set_tag(self, key: str, value):
+        self._tags.append(RunTag(key, str(value)))
+        self._maybe_flush()
+
+    def set_tags(self, tags: Dict):
+        for key, value in tags.items():
+            self.set_tag(key, value)
+
+    def log_param(self, key: str, value):
+        self._params.append(Param(key, str(value)))
+        self._maybe_flush()
+
+    def log_params(self, params: Dict):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key: str, value: float, step: int = 0):
+        timestamp = int(time.time() * 1000)
+        self._metrics.append(Metric(key, float(value), timestamp, step))
+        self._maybe_flush()
+
+    def log_metrics(self, metrics: Dict, step: int = 0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+
+    @property
+    def pending(self) -> int:
+        return len(self._params) + len(self._tags) + len(self._metrics)
+
+    def flush(self):
+        """Send everything buffered, split to respect the log_batch limits"""
+        while self.pending:
+            params = self._params[:MAX_BATCH_PARAMS]
+            tags = self._tags[:MAX_BATCH_TAGS]
+            room = MAX_BATCH_ENTITIES - len(params) - len(tags)
+            metrics = self._metrics[:room]
+            del self._params[: len(params)]
+            del self._tags[: len(tags)]
+            del self._metrics[: len(metrics)]
+
+            self.client.log_batch(
+                self.run_id, metrics=metrics, params=params, tags=tags
+            )
+            self.batches += 1
+
+    def _maybe_flush(self):
+        if self.pending >= self.flush_size:
+            self.flush()
+
+
+def set_model_version_tags(
+    client, model_name: str, version, tags: Dict, max_workers: int = 8
+):
+    """
+    Set registry tags on a model version concurrently
+
+    The registry has no batch endpoint, so each tag is still one request,
+    but the requests overlap instead of running back to back.
+    """
+    if not tags:
+        return
+
+    workers = max(1, min(max_workers, len(tags)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                client.set_model_version_tag, model_name, str(version), key, value
+            )
+            for key, value in tags.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+class UploadError(RuntimeError):
+    """One or more background uploads failed or did not finish in time"""
+
+
+class BackgroundUploader:
+    """
+    Upload run artifacts and models on a bounded thread pool
+
+    Uploads start as soon as they are submitted and overlap with the rest of
+    the stage. flush() (called on exit of the with block) waits for all of
+    them up to timeout seconds and raises UploadError listing every failure,
+    so a stage never finishes with silently missing artifacts. Uploaded
+    models are also put in model_cache (a ModelCache), if given.
+    """
+
+    def __init__(
+        self, client, max_workers: int = 4, timeout: float = 600, model_cache=None
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.model_cache = model_cache
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="upload"
+        )
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="upload-")
+        self._pending: List[Tuple[str, Future]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                # Do not mask the original error, but still wait for uploads
+                self._wait(self.timeout)
+        finally:
+            self.close()
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future:
+        """Run fn in the background; name identifies it in error reports"""
+        future = self._pool.submit(fn, *args, **kwargs)
+        self._pending.append((name, future))
+        return future
+
+    def log_artifact(
+        self, run_id: str, local_path, artifact_path: Optional[str] = None
+    ) -> Future:
+        """Upload a local file to a run"""
+        return self.submit(
+            f"artifact {local_path}",
+            self.client.log_artifact,
+            run_id,
+            str(local_path),
+            artifact_path,
+        )
+
+    def log_artifacts(
+        self, run_id: str, local_dir, artifact_path: Optional[str] = None
+    ) -> Future:
+        """Upload the contents of a local directory to a run"""
+        return self.submit(
+            f"artifacts {local_dir}",
+            self.client.log_artifacts,
+            run_id,
+            str(local_dir),
+            artifact_path,
+        )
+
+    def log_model(
+        self,
+        run_id: str,
+        model,
+        artifact_path: str,
+        registered_model_name: Optional[str] = None,
+    ) -> Future:
+        """
+        Serialize an sklearn model once, upload it and optionally register it
+
+        Returns:
+            Future resolving to the registered ModelVersion (or None)
+        """
+        return self.submit(
+            f"model {artifact_path}",
+            self._log_model,
+            run_id,
+            model,
+            artifact_path,
+            registered_model_name,
+        )
+
+    def flush(self, timeout=None):
+        """Wait for every submitted upload; raise UploadError on any failure"""
+        errors = self._wait(self.timeout if timeout is None else timeout)
+        if errors:
+            raise UploadError("Background uploads failed: " + "; ".join(errors))
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._tmpdir.cleanup()
+
+    def _wait(self, timeout) -> List[str]:
+        pending, self._pending = self._pending, []
+        started = time.monotonic()
+        _, not_done = wait([future for _, future in pending], timeout=timeout)
+
+        errors = []
+        for name, future in pending:
+            if future in not_done:
+                errors.append(f"{name}: not finished after {timeout}s")
+            elif future.exception() is not None:
+                errors.append(f"{name}: {future.exception()}")
+        logger.info(
+            f"Flushed {len(pending)} upload(s) in {time.monotonic() - started:.1f}s "
+            f"({len(errors)} failed)"
+        )
+        return errors
+
+    def _log_model(self, run_id, model, artifact_path, registered_model_name):
+        local_dir = Path(self._tmpdir.name) / run_id / artifact_path
+        mlflow.sklearn.save_model(model, str(local_dir))
+        self.client.log_artifacts(run_id, str(local_dir), artifact_path)
+        if self.model_cache is not None:
+            # Loads of this run's model on this host then skip the download
+            try:
+                self.model_cache.put(run_id, artifact_path, local_dir)
+            except OSError as e:
+                logger.warning(f"Could not cache model of run {run_id}: {e}")
+        if not registered_model_name:
+            return None
+
+        model_uri = f"runs:/{run_id}/{artifact_path}"
+        with tracing.span("mlflow.register_model"):
+            version = mlflow.register_model(model_uri, registered_model_name)
+        if hasattr(self.client, "record"):
+            self.client.record("register_model")
+        return version
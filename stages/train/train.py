@@ -2,26 +2,70 @@
 Train stage: Train model and log to MLflow/DagsHub with promotion logic
 """
 
+import argparse
 import json
 import logging
 import os
 import subprocess
+import time
 from pathlib import Path
 
 import mlflow
 import mlflow.sklearn
-import pandas as pd
+import numpy as np
+import spool
+import tracing
 import yaml
+from compaction import compact_forest
+from compiled_forest import ARTIFACT as COMPILED_ARTIFACT
+from compiled_forest import CompiledForest, load_run_predictor
 from dvc_lineage import format_lineage_info, log_dagshub_lineage_tags
+from feature_transforms import RUN_ARTIFACT as FEATURES_ARTIFACT
+from feature_transforms import STATE_FILE, load_run_state, transform
 from mlflow.data.pandas_dataset import from_pandas
+from mlflow.entities import Metric
 from mlflow.tracking import MlflowClient
-from sklearn.ensemble import RandomForestClassifier
+from model_cache import MODEL_CACHE_DIR, ModelCache
+from prediction_cache import ARTIFACT_PATH as PREDICTIONS_ARTIFACT
+from prediction_cache import PREDICTIONS_DIR, PredictionCache, split_md5
+from processed_data import (
+    FEATURES_DIR,
+    METADATA_COLUMNS,
+    PROCESSED_DIR,
+    read_split,
+    split_path,
+)
+from promotion import paired_bootstrap
+from registry import ModelRegistry
+from resources import plan_resources, scaling_curve
+from result_cache import ResultCache, cache_key, code_hash, fitted_params
+from sweep import DEFAULT_VALIDATION_FRACTION, expand_candidates, run_sweep
+from tracking import (
+    BackgroundUploader,
+    BatchLogger,
+    CountingClient,
+    set_model_version_tags,
+)
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+PARAMS_PATH = Path("/workspace/params.yaml")
+DVC_LOCK_PATH = Path("/workspace/dvc.lock")
+OUTPUT_DIR = Path("/models")
+CACHE_DIR = Path("/models/cache")
+# Alias/version lookups shared with the evaluate stage (short TTL)
+REGISTRY_CACHE = Path("/models/cache/registry.json")
+SCALING_PATH = Path("/metrics/train_scaling.json")
+# Code that determines a training result; part of the result cache key
+CODE_PATHS = [
+    Path(__file__),
+    Path(__file__).with_name("sweep.py"),
+    Path(__file__).with_name("compaction.py"),
+]
+
 
 def get_git_commit():
     """Get current git commit hash from workspace"""
@@ -47,56 +91,51 @@ def get_git_commit():
 
 def load_params():
     """Load parameters from params.yaml"""
-    params_path = Path("/workspace/params.yaml")
-    if not params_path.exists():
+    if not PARAMS_PATH.exists():
         return {"n_estimators": 100, "max_depth": 5, "random_state": 42}
 
-    with open(params_path) as f:
+    with open(PARAMS_PATH) as f:
         params = yaml.safe_load(f)
     return params.get("train", {})
 
 
-def get_production_model_version(client, model_name):
-    """Get current production model using aliases"""
-    try:
-        # Try to get model with 'production' alias
-        mv = client.get_model_version_by_alias(model_name, "production")
-        run = client.get_run(mv.run_id)
-        prod_accuracy = run.data.metrics.get("test_accuracy")
-        if prod_accuracy is None:
-            logger.info(f"Production model (v{mv.version}) has no test_accuracy metric")
-        else:
-            logger.info(
-                f"Production model (v{mv.version}): test_accuracy={prod_accuracy:.4f}"
-            )
-        return mv.version, prod_accuracy
-    except mlflow.exceptions.RestException:
+def get_production_model_version(registry, model_name):
+    """Get current production model (version, test accuracy, run ID) by alias"""
+    mv = registry.get_alias(model_name, "production")
+    if mv is None:
         logger.info("No production model found")
-        return None, None
+        return None, None, None
+
+    prod_accuracy = mv.metrics.get("test_accuracy")
+    if prod_accuracy is None:
+        logger.info(f"Production model (v{mv.version}) has no test_accuracy metric")
+    else:
+        logger.info(
+            f"Production model (v{mv.version}): test_accuracy={prod_accuracy:.4f}"
+        )
+    return mv.version, prod_accuracy, mv.run_id
 
 
-def set_model_alias(client, model_name, version, alias):
+def set_model_alias(registry, model_name, version, alias):
     """Set alias for model version"""
-    client.set_registered_model_alias(model_name, alias, str(version))
+    registry.set_alias(model_name, alias, version)
     logger.info(f"Set alias '{alias}' for model v{version}")
 
 
-def tag_model(client, model_name, version, tags):
-    """Add tags to model version"""
-    for key, value in tags.items():
-        client.set_model_version_tag(model_name, str(version), key, value)
+def tag_model(client, model_name, version, tags, max_workers=8):
+    """Add tags to model version (requests are sent concurrently)"""
+    set_model_version_tags(client, model_name, version, tags, max_workers)
 
 
 def get_data_version():
     """Get DVC data version from dvc.lock with detailed metadata"""
     import hashlib
 
-    dvc_lock_path = Path("/workspace/dvc.lock")
-    if not dvc_lock_path.exists():
+    if not DVC_LOCK_PATH.exists():
         return None, {}
 
     try:
-        with open(dvc_lock_path) as f:
+        with open(DVC_LOCK_PATH) as f:
             dvc_lock = yaml.safe_load(f)
 
         # Get hashes for data outputs
@@ -104,7 +143,7 @@ def get_data_version():
         data_metadata = {}
 
         for stage_name, stage_data in dvc_lock.get("stages", {}).items():
-            if stage_name in ["ingest", "preprocess"]:
+            if stage_name in ["ingest", "preprocess", "featurize"]:
                 for out in stage_data.get("outs", []):
                     if "md5" in out:
                         path = out.get("path", "unknown")
@@ -129,226 +168,816 @@ def get_data_version():
 
 
 def promote_model(
-    client, model_name, version, current_accuracy, prod_version, prod_accuracy
+    registry,
+    model_name,
+    version,
+    current_accuracy,
+    prod_version,
+    prod_accuracy,
+    max_workers=8,
+    significance=None,
+    alpha=0.05,
 ):
-    """Decide if model should be promoted to production"""
+    """
+    Decide if model should be promoted to production
+
+    With a paired bootstrap result (significance) the model is promoted only
+    if it beats production at level alpha; otherwise raw accuracy decides.
+    """
     tags = {"test_accuracy": str(current_accuracy), "promoted": "false"}
 
     if prod_accuracy is None:
         # No production model exists, promote this one
         logger.info("No existing production model, promoting new model")
-        set_model_alias(client, model_name, version, "production")
+        set_model_alias(registry, model_name, version, "production")
         tags["promoted"] = "true"
         tags["promotion_reason"] = "first_model"
-        tag_model(client, model_name, version, tags)
+        tag_model(registry.client, model_name, version, tags, max_workers)
         return True
 
-    if current_accuracy > prod_accuracy:
-        # New model is better, promote it
-        logger.info(
-            "New model better "
-            f"({current_accuracy:.4f} > {prod_accuracy:.4f}), "
-            "promoting to production"
+    comparison = f"{current_accuracy:.4f} vs {prod_accuracy:.4f}"
+    if significance is not None:
+        better = significance.significant(alpha)
+        comparison += (
+            f", diff {significance.diff:+.4f} "
+            f"[{significance.ci_low:+.4f}, {significance.ci_high:+.4f}], "
+            f"p={significance.p_value:.4f}, alpha={alpha}"
         )
+        tags["bootstrap_diff"] = str(significance.diff)
+        tags["bootstrap_p_value"] = str(significance.p_value)
+        reasons = ("significant_improvement", "not_significant")
+    else:
+        better = current_accuracy > prod_accuracy
+        reasons = ("better_accuracy", "insufficient_accuracy")
+
+    if better:
+        # New model is better, promote it
+        logger.info(f"New model better ({comparison}), promoting to production")
 
         # Archive old production
         if prod_version:
-            set_model_alias(client, model_name, prod_version, "archived")
-            tag_model(client, model_name, prod_version, {"status": "archived"})
+            set_model_alias(registry, model_name, prod_version, "archived")
+            tag_model(
+                registry.client,
+                model_name,
+                prod_version,
+                {"status": "archived"},
+                max_workers,
+            )
 
         # Promote new model
-        set_model_alias(client, model_name, version, "production")
+        set_model_alias(registry, model_name, version, "production")
         tags["promoted"] = "true"
-        tags["promotion_reason"] = "better_accuracy"
-        tag_model(client, model_name, version, tags)
+        tags["promotion_reason"] = reasons[0]
+        tag_model(registry.client, model_name, version, tags, max_workers)
         return True
     else:
         # Keep in staging
-        logger.info(
-            "New model not better "
-            f"({current_accuracy:.4f} <= {prod_accuracy:.4f}), "
-            "keeping in staging"
-        )
-        set_model_alias(client, model_name, version, "staging")
-        tags["promotion_reason"] = "insufficient_accuracy"
-        tag_model(client, model_name, version, tags)
+        logger.info(f"New model not better ({comparison}), keeping in staging")
+        set_model_alias(registry, model_name, version, "staging")
+        tags["promotion_reason"] = reasons[1]
+        tag_model(registry.client, model_name, version, tags, max_workers)
         return False
 
 
-def resolve_registered_model_version(client, model_name, run_id):
+def resolve_registered_model_version(registry, model_name, run_id):
     """Resolve the model version created by the current run."""
-    query = f"name='{model_name}' and run_id='{run_id}'"
-    versions = []
-
-    try:
-        versions = client.search_model_versions(query)
-    except Exception as e:
-        logger.warning(f"Primary model-version lookup failed ({query}): {e}")
-
-    if not versions:
-        fallback = client.search_model_versions(f"name='{model_name}'")
-        versions = [mv for mv in fallback if mv.run_id == run_id]
-
-    if not versions:
-        raise RuntimeError(
-            f"Could not resolve model version for model={model_name}, run_id={run_id}"
-        )
-
-    return max(int(mv.version) for mv in versions)
-
-
-def main():
-    logger.info("Starting model training")
-
-    # Get data version and metadata
-    data_version, data_metadata = get_data_version()
-    if data_version:
-        logger.info(f"Data version: {data_version}")
-        logger.info(f"Data metadata: {data_metadata}")
-
-    # Load parameters
-    params = load_params()
-    n_estimators = params.get("n_estimators", 100)
-    max_depth = params.get("max_depth", 5)
-    random_state = params.get("random_state", 42)
-
-    logger.info(
-        "Hyperparameters: "
-        f"n_estimators={n_estimators}, "
-        f"max_depth={max_depth}, "
-        f"random_state={random_state}"
-    )
-
-    # Load data
-    train_df = pd.read_csv("/data/processed/train.csv")
-    test_df = pd.read_csv("/data/processed/test.csv")
+    return registry.version_for_run(model_name, run_id)
+
+
+def train_and_log(
+    client,
+    uploader,
+    model_name,
+    candidates,
+    sweep,
+    flush_size,
+    data_version,
+    data_metadata,
+    warm_start=None,
+    compaction=None,
+    resources=None,
+    predictions=None,
+):
+    """
+    Train the candidates in a new MLflow run and log the best one
+
+    The model upload and registration are submitted to uploader and still run
+    when this returns; wait on the returned future for the ModelVersion.
+    warm_start is an optional (model path, cached result) to grow from.
+    With compaction enabled the registered model keeps only the smallest
+    prefix of trees within compaction["tolerance"] of the full forest's
+    out-of-bag accuracy; the test split only reports the result.
+    resources is the ResourcePlan that sets sweep processes and fit workers.
+    Test-split predictions and probabilities of the logged model are saved to
+    predictions and logged as the test_predictions/<test split md5> artifact.
+
+    Returns:
+        (result dict, fitted full model, model upload future)
+    """
+    # Load featurized data (memory-mapped Feather)
+    with tracing.span("load_features"):
+        train_df = read_split("train", FEATURES_DIR)
+        test_df = read_split("test", FEATURES_DIR)
 
     X_train = train_df.drop("target", axis=1)
     y_train = train_df["target"]
     X_test = test_df.drop("target", axis=1)
     y_test = test_df["target"]
 
-    model_name = "iris-classifier"
-    client = MlflowClient()
-
-    # Get current production model
-    prod_version, prod_accuracy = get_production_model_version(client, model_name)
-
     # Start MLflow run
-    with mlflow.start_run(run_name="iris-rf-train") as run:
+    with tracing.start_run(run_name="iris-rf-train") as run:
+        # Params/tags/metrics are buffered and sent with log_batch
+        tracker = BatchLogger(client, run.info.run_id, flush_size)
+        client.record("create_run")
+
         # Log git commit for reproducibility
         git_commit = get_git_commit()
         if git_commit:
-            mlflow.set_tag("git_commit", git_commit)
+            tracker.set_tag("git_commit", git_commit)
             logger.info(f"Git commit: {git_commit}")
 
-        # Log parameters
-        mlflow.log_params(
-            {
-                "n_estimators": n_estimators,
-                "max_depth": max_depth,
-                "random_state": random_state,
-                "model_type": "RandomForest",
-            }
-        )
-
         # Log data version for lineage
         if data_version:
-            mlflow.log_param("data_version", data_version)
-            mlflow.set_tag("dvc_data_version", data_version)
+            tracker.log_param("data_version", data_version)
+            tracker.set_tag("dvc_data_version", data_version)
 
             # Log detailed DVC metadata for each dataset
             for path, metadata in data_metadata.items():
-                mlflow.set_tag(f"dvc_{path.replace('/', '_')}_md5", metadata["md5"])
-                mlflow.log_param(f"dvc_{path.replace('/', '_')}_size", metadata["size"])
+                tracker.set_tag(f"dvc_{path.replace('/', '_')}_md5", metadata["md5"])
+                tracker.log_param(
+                    f"dvc_{path.replace('/', '_')}_size", metadata["size"]
+                )
 
         # Create MLflow datasets with DVC metadata for data lineage
         # Use local paths as source since MLflow doesn't recognize dvc:// protocol
         train_dataset = from_pandas(
             train_df,
-            source="/data/processed/train.csv",
+            source=str(split_path("train", FEATURES_DIR)),
             name="train_data",
             targets="target",
         )
 
         test_dataset = from_pandas(
             test_df,
-            source="/data/processed/test.csv",
+            source=str(split_path("test", FEATURES_DIR)),
             name="test_data",
             targets="target",
         )
 
         # Log datasets to MLflow for lineage tracking
         # DVC metadata is tracked via tags and params above
-        mlflow.log_input(train_dataset, context="training")
-        mlflow.log_input(test_dataset, context="testing")
+        with tracing.span("mlflow.log_input"):
+            mlflow.log_input(train_dataset, context="training")
+            mlflow.log_input(test_dataset, context="testing")
+        client.record("log_inputs", 2)
 
         logger.info("Logged datasets to MLflow for lineage tracking")
 
         # Log DagHub URLs for data lineage
-        log_dagshub_lineage_tags(mlflow, data_metadata)
+        log_dagshub_lineage_tags(tracker, data_metadata)
 
         # Create and log lineage info as artifact
         lineage_info = format_lineage_info(data_version, data_metadata)
         lineage_path = Path("/tmp/data_lineage.md")
         lineage_path.write_text(lineage_info)
-        mlflow.log_artifact(str(lineage_path), "lineage")
+        uploader.log_artifact(run.info.run_id, lineage_path, "lineage")
         logger.info("Logged DagHub lineage information")
 
-        # Train model
-        model = RandomForestClassifier(
-            n_estimators=n_estimators, max_depth=max_depth, random_state=random_state
+        # Ship the fitted feature state with the model so inference reuses it
+        feature_state_path = FEATURES_DIR / STATE_FILE
+        if feature_state_path.exists():
+            uploader.log_artifact(
+                run.info.run_id, feature_state_path, FEATURES_ARTIFACT
+            )
+            logger.info(f"Logged feature state: {feature_state_path}")
+
+        # Train every candidate (one for a plain run) and keep the best
+        resources = resources or plan_resources(
+            None, len(candidates), sweep.get("n_jobs")
+        )
+        tracker.set_tags(
+            {
+                "train_cpus": resources.cpus,
+                "train_fit_jobs": resources.fit_jobs,
+                "train_backend": resources.backend,
+            }
         )
-        model.fit(X_train, y_train)
+        with tracing.span("fit"):
+            best, model, results = run_sweep(
+                candidates,
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                n_jobs=resources.sweep_workers,
+                experiment_id=run.info.experiment_id,
+                parent_run_id=run.info.run_id,
+                init_model=str(warm_start[0]) if warm_start else None,
+                fit_jobs=resources.fit_jobs,
+                refit_jobs=resources.cpus,
+                backend=resources.backend,
+                client=client,
+                validation_fraction=float(
+                    sweep.get("validation_fraction", DEFAULT_VALIDATION_FRACTION)
+                ),
+                seed=int(sweep.get("seed", 0)),
+            )
+        model_params = best.params
+        if best.warm_started:
+            tracker.set_tag("warm_start_from_run", warm_start[1]["run_id"])
+            tracker.log_param(
+                "warm_start_trees", fitted_params(warm_start[1])["n_estimators"]
+            )
+        train_score = best.train_accuracy
+        test_score = best.test_accuracy
+
+        # Register the smallest forest prefix that keeps the out-of-bag accuracy
+        compaction = compaction or {}
+        registered_model, report = model, None
+        full_params = model_params
+        if compaction.get("enabled", False):
+            with tracing.span("compaction"):
+                registered_model, report = compact_forest(
+                    model,
+                    X_train,
+                    y_train,
+                    tolerance=float(compaction.get("tolerance", 0.0)),
+                    min_trees=int(compaction.get("min_trees", 1)),
+                )
+                if registered_model is not model:
+                    train_score = float(registered_model.score(X_train, y_train))
+                    test_score = float(registered_model.score(X_test, y_test))
+                    model_params = {**model_params, "n_estimators": report.trees}
+            tracker.log_params(
+                {
+                    "compaction_tolerance": compaction.get("tolerance", 0.0),
+                    "compaction_trees": report.trees,
+                    "fitted_n_estimators": report.original_trees,
+                }
+            )
+            tracker.log_metrics(
+                {
+                    "full_test_accuracy": best.test_accuracy,
+                    "compaction_oob_accuracy": report.accuracy,
+                    "full_oob_accuracy": report.original_accuracy,
+                    "compaction_size_reduction": report.size_reduction,
+                    "compaction_latency_speedup": report.latency_speedup,
+                }
+            )
 
-        # Log metrics
-        train_score = model.score(X_train, y_train)
-        test_score = model.score(X_test, y_test)
+        # Log parameters of the registered model
+        tracker.log_params({**model_params, "model_type": "RandomForest"})
+        if len(results) > 1:
+            tracker.log_params(
+                {
+                    "sweep_strategy": sweep.get("strategy"),
+                    "sweep_candidates": len(results),
+                    "sweep_validation_fraction": sweep.get(
+                        "validation_fraction", DEFAULT_VALIDATION_FRACTION
+                    ),
+                }
+            )
+            tracker.log_metrics({"validation_accuracy": best.validation_accuracy})
+            tracker.set_tag("sweep_best_run_id", best.run_id)
 
-        mlflow.log_metrics({"train_accuracy": train_score, "test_accuracy": test_score})
+        # Log metrics
+        tracker.log_metrics(
+            {"train_accuracy": train_score, "test_accuracy": test_score}
+        )
+        tracker.flush()
 
         logger.info(f"Train accuracy: {train_score:.4f}")
         logger.info(f"Test accuracy: {test_score:.4f}")
 
-        # Log model to MLflow
-        mlflow.sklearn.log_model(model, "model", registered_model_name=model_name)
-
+        # Log model to MLflow (serialized once, uploaded and registered in background)
         run_id = run.info.run_id
+        if predictions is not None:
+            with tracing.span("save_predictions"):
+                test_md5 = split_md5("test", FEATURES_DIR)
+                proba = registered_model.predict_proba(X_test)
+                # Same as the forest's predict, without a second pass over the trees
+                y_pred = registered_model.classes_.take(np.argmax(proba, axis=1))
+                predictions.save(
+                    run_id,
+                    test_md5,
+                    y_pred=y_pred,
+                    proba=proba,
+                    classes=registered_model.classes_,
+                )
+            uploader.log_artifacts(
+                run_id,
+                predictions.path(run_id, test_md5),
+                f"{PREDICTIONS_ARTIFACT}/{test_md5}",
+            )
+        model_upload = uploader.log_model(
+            run_id, registered_model, "model", registered_model_name=model_name
+        )
 
-    # Resolve the model version created by this exact run to avoid race conditions.
-    latest_version = resolve_registered_model_version(client, model_name, run_id)
-
-    # Promote model based on comparison
-    promoted = promote_model(
-        client, model_name, latest_version, test_score, prod_version, prod_accuracy
-    )
+        # Memory-mappable arrays of the same forest for fast-loading inference
+        compiled_dir = Path("/tmp/compiled_model") / run_id
+        with tracing.span("compile_forest"):
+            compiled = export_compiled_forest(registered_model, X_test, compiled_dir)
+        uploader.log_artifacts(run_id, compiled_dir, COMPILED_ARTIFACT)
+    client.record("set_terminated")
 
-    # Save metadata locally
-    metadata = {
+    result = {
         "run_id": run_id,
-        "model_name": model_name,
-        "version": latest_version,
         "train_accuracy": train_score,
         "test_accuracy": test_score,
-        "promoted_to_production": promoted,
-        "model_type": "RandomForest",
-        "params": {"n_estimators": n_estimators, "max_depth": max_depth},
+        "params": model_params,
         "data_version": data_version,
     }
+    if len(results) > 1:
+        result["sweep"] = {
+            "strategy": sweep.get("strategy"),
+            "candidates": len(results),
+            "best_index": best.index,
+            "best_run_id": best.run_id,
+        }
+    if report is not None:
+        result["compaction"] = report.as_dict()
+    if full_params is not model_params:
+        # The cached full forest, e.g. for warm starts
+        result["fitted_params"] = full_params
+    result["compiled_model"] = {
+        "artifact_path": COMPILED_ARTIFACT,
+        "nodes": compiled.meta["n_nodes"],
+        "bytes": compiled.nbytes,
+    }
+    if best.warm_started:
+        result["warm_start"] = {
+            "run_id": warm_start[1]["run_id"],
+            "trees": fitted_params(warm_start[1])["n_estimators"],
+        }
+    return result, model, model_upload
+
+
+def export_compiled_forest(model, X, output_dir):
+    """
+    Save the array-backed form of model, which evaluate predicts with
+
+    Raises:
+        ValueError: if its probabilities on X are not bit-identical to sklearn's
+    """
+    compiled = CompiledForest.from_sklearn(model)
+    compiled.verify(model, X)
+    compiled.save(output_dir)
+    logger.info(
+        f"Compiled forest: {compiled.meta['n_trees']} trees, "
+        f"{compiled.meta['n_nodes']} nodes, {compiled.nbytes / 1024:.0f} KiB"
+    )
+    return compiled
+
+
+def predictions_for_run(predictions, models, run_id, digest):
+    """
+    Cached (or logged) predictions of a run's model on the test split, else
+    predict and cache
+
+    A model is only re-run on the processed test rows transformed with the
+    feature state it logged, not on the current features, which may come from
+    a different fit.
+
+    Returns:
+        Predictions, or None if the run's model or feature state is unavailable
+    """
+    y_pred = predictions.fetch(run_id, digest)
+    if y_pred is not None:
+        return y_pred
+    logger.info(f"No cached predictions for run {run_id}, loading its model")
+    state = load_run_state(models, run_id)
+    if state is None:
+        logger.warning(f"Could not load the feature state of run {run_id}")
+        return None
+    try:
+        model = load_run_predictor(models, run_id)
+    except Exception as e:
+        logger.warning(f"Could not load model of run {run_id}: {e}")
+        return None
+    X = transform(state, read_split("test", PROCESSED_DIR)).drop(
+        columns=["target", *METADATA_COLUMNS], errors="ignore"
+    )
+    y_pred = model.predict(X)
+    predictions.save(run_id, digest, y_pred=y_pred)
+    return y_pred
 
-    output_dir = Path("/models")
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    metadata_path = output_dir / "model_metadata.json"
+def compare_with_production(predictions, models, run_id, prod_run_id, promotion):
+    """
+    Paired bootstrap of this run's test accuracy against production's
+
+    Returns:
+        BootstrapResult, or None if either model's predictions are unavailable
+    """
+    digest = split_md5("test", FEATURES_DIR)
+    y_test = read_split("test", FEATURES_DIR, columns=["target"])["target"].to_numpy()
+
+    candidate = predictions_for_run(predictions, models, run_id, digest)
+    baseline = predictions_for_run(predictions, models, prod_run_id, digest)
+    if candidate is None or baseline is None:
+        return None
+    return paired_bootstrap(
+        candidate == y_test,
+        baseline == y_test,
+        n_resamples=int(promotion.get("n_resamples", 10000)),
+        confidence=1 - float(promotion.get("alpha", 0.05)),
+        seed=int(promotion.get("seed", 0)),
+    )
+
+
+def load_cached_result(cache, key, registry, model_name):
+    """Return a cached result whose model version still exists in the registry"""
+    result = cache.get(key)
+    if result is None:
+        return None
+    if registry.get_version(model_name, result["version"]) is None:
+        logger.info(f"Cached model v{result['version']} no longer registered")
+        cache.discard(key)
+        return None
+    return result
+
+
+def log_trace_metrics(client, run_id, tracer):
+    """Log the tracer's per-phase wall times to run_id in one request"""
+    timestamp = int(time.time() * 1000)
+    metrics = [
+        Metric(name, float(value), timestamp, 0)
+        for name, value in tracer.summary_metrics().items()
+    ]
+    client.log_batch(run_id, metrics=metrics)
+
+
+def lookup_cached_result(
+    cache, registry, model_name, data_version, candidates, sweep, compaction
+):
+    """
+    Result of an identical earlier training, if its model is still registered
+
+    Returns:
+        (cache key, code hash, cached result or None)
+    """
+    code = code_hash(CODE_PATHS)
+    extra = {"compaction": compaction}
+    if len(candidates) > 1:
+        # The validation split decides which candidate is kept
+        extra["selection"] = {
+            "validation_fraction": sweep.get(
+                "validation_fraction", DEFAULT_VALIDATION_FRACTION
+            ),
+            "seed": sweep.get("seed", 0),
+        }
+    key = cache_key(data_version, candidates, code, extra)
+    return key, code, load_cached_result(cache, key, registry, model_name)
+
+
+def find_warm_start(cache, data_version, code, candidates):
+    """
+    Cached smaller forest to grow instead of fitting every tree again
+
+    Only plain runs (one candidate) warm start.
+
+    Returns:
+        (model path, cached result), or None
+    """
+    if cache is None or len(candidates) != 1:
+        return None
+    match = cache.find_warm_start(data_version, code, candidates[0])
+    if match is None:
+        return None
+    logger.info(
+        f"Growing cached {fitted_params(match[1])['n_estimators']}-tree "
+        f"forest from run {match[1]['run_id']}"
+    )
+    return cache.model_path(match[0]), match[1]
+
+
+def train_and_register(
+    client,
+    registry,
+    models,
+    model_name,
+    candidates,
+    params,
+    data_version,
+    data_metadata,
+    warm_start,
+    resources,
+    predictions,
+):
+    """
+    Train in a new run and wait until its model version is registered
+
+    The production model is looked up while the model uploads.
+
+    Returns:
+        (result dict with the registered version, fitted full model,
+        production (version, test accuracy, run ID))
+    """
+    tracking = params.get("tracking") or {}
+    # Artifacts and the model upload in the background while the stage continues
+    uploader = BackgroundUploader(
+        client,
+        tracking.get("upload_workers", 4),
+        tracking.get("upload_timeout", 600),
+        model_cache=models,
+    )
+    with tracing.span("train"):
+        result, model, model_upload = train_and_log(
+            client,
+            uploader,
+            model_name,
+            candidates,
+            params.get("sweep") or {},
+            tracking.get("flush_size", 100),
+            data_version,
+            data_metadata,
+            warm_start,
+            params.get("compaction") or {},
+            resources,
+            predictions,
+        )
+
+    # Get current production model while the model uploads
+    with tracing.span("production_lookup"):
+        production = get_production_model_version(registry, model_name)
+
+    # Every upload must land before promotion; fails the stage on error/timeout
+    try:
+        with tracing.span("upload_wait"):
+            uploader.flush()
+    finally:
+        uploader.close()
+
+    # register_model returns the version created from this exact run
+    registered = model_upload.result()
+    if registered is not None:
+        result["version"] = int(registered.version)
+    else:
+        result["version"] = resolve_registered_model_version(
+            registry, model_name, result["run_id"]
+        )
+    return result, model, production
+
+
+def decide_promotion(
+    registry, predictions, models, model_name, result, production, params
+):
+    """
+    Promote result's model version, or keep it in staging
+
+    Returns:
+        (promoted, BootstrapResult or None)
+    """
+    prod_version, prod_accuracy, prod_run_id = production
+    promotion = params.get("promotion") or {}
+    version = result["version"]
+    if prod_version is not None and int(prod_version) == version:
+        logger.info(f"Model v{version} is already in production")
+        return True, None
+
+    # Paired bootstrap on the same test rows, from cached predictions
+    significance = None
+    if promotion.get("method", "bootstrap") == "bootstrap" and prod_run_id:
+        with tracing.span("promotion_test"):
+            significance = compare_with_production(
+                predictions, models, result["run_id"], prod_run_id, promotion
+            )
+        if significance is None:
+            logger.warning("Bootstrap test unavailable, comparing raw accuracy")
+    with tracing.span("promotion"):
+        promoted = promote_model(
+            registry,
+            model_name,
+            version,
+            result["test_accuracy"],
+            prod_version,
+            prod_accuracy,
+            max_workers=(params.get("tracking") or {}).get("registry_workers", 8),
+            significance=significance,
+            alpha=float(promotion.get("alpha", 0.05)),
+        )
+    return promoted, significance
+
+
+def save_metadata(result, model_name, promoted, significance, **extra):
+    """
+    Write models/model_metadata.json, which evaluate reads
+
+    extra (data version, resource plan, counters) is stored as is.
+
+    Returns:
+        Path of the metadata file
+    """
+    metadata = {
+        "run_id": result["run_id"],
+        "model_name": model_name,
+        "version": result["version"],
+        "train_accuracy": result["train_accuracy"],
+        "test_accuracy": result["test_accuracy"],
+        "promoted_to_production": promoted,
+        "model_type": "RandomForest",
+        "params": result["params"],
+        **extra,
+    }
+    for field in ("sweep", "warm_start", "compaction", "compiled_model"):
+        if field in result:
+            metadata[field] = result[field]
+    if significance is not None:
+        metadata["promotion_test"] = significance._asdict()
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    metadata_path = OUTPUT_DIR / "model_metadata.json"
     with open(metadata_path, "w") as f:
         json.dump(metadata, f, indent=2)
+    return metadata_path
+
+
+def main():
+    logger.info("Starting model training")
+    tracer = tracing.start("train")
+    # Offline runs keep their IDs out of the caches of the remote's runs
+    offline = spool.configure()
+    cache_dir = spool.SPOOL_CACHE_DIR if offline else CACHE_DIR
+
+    # Get data version and metadata
+    with tracing.span("data_version"):
+        data_version, data_metadata = get_data_version()
+    if data_version:
+        logger.info(f"Data version: {data_version}")
+        logger.info(f"Data metadata: {data_metadata}")
+
+    # Load parameters
+    params = load_params()
+    base_params = {
+        "n_estimators": params.get("n_estimators", 100),
+        "max_depth": params.get("max_depth", 5),
+        "random_state": params.get("random_state", 42),
+    }
+    sweep = params.get("sweep") or {}
+    candidates = expand_candidates(base_params, sweep)
+    tracking = params.get("tracking") or {}
+    cache_params = params.get("cache") or {}
+    predictions = PredictionCache(PREDICTIONS_DIR)
+    models = ModelCache(
+        MODEL_CACHE_DIR,
+        int(cache_params.get("model_max_size_mb", 1024)) << 20,
+    )
+    resources = plan_resources(
+        params.get("resources"), len(candidates), sweep.get("n_jobs")
+    )
+
+    logger.info(
+        "Hyperparameters: "
+        f"n_estimators={base_params['n_estimators']}, "
+        f"max_depth={base_params['max_depth']}, "
+        f"random_state={base_params['random_state']}"
+    )
+    if len(candidates) > 1:
+        logger.info(f"Sweep: {sweep.get('strategy')}, {len(candidates)} candidates")
+    logger.info(
+        f"CPUs: {resources.cpus} (quota={resources.cpu_limit}, "
+        f"affinity={resources.affinity}), {resources.sweep_workers} sweep "
+        f"process(es) x {resources.fit_jobs} {resources.backend} worker(s)"
+    )
+
+    model_name = "iris-classifier"
+    client = CountingClient(tracing.TracedClient(MlflowClient(), tracer))
+    registry = ModelRegistry(
+        client,
+        tracking.get("registry_ttl", 60),
+        cache_path=cache_dir / REGISTRY_CACHE.name,
+    )
+
+    # Reuse the run and model version of an identical earlier training
+    cache, key, code, result = None, None, None, None
+    with tracing.span("cache_lookup"):
+        if cache_params.get("enabled", True) and data_version:
+            cache = ResultCache(
+                cache_dir, int(cache_params.get("max_size_mb", 512)) << 20
+            )
+            key, code, result = lookup_cached_result(
+                cache,
+                registry,
+                model_name,
+                data_version,
+                candidates,
+                sweep,
+                params.get("compaction") or {},
+            )
+
+    trained = result is None
+    if not trained:
+        logger.info(f"Cache hit ({key[:12]}): reusing run {result['run_id']}")
+        with tracing.span("production_lookup"):
+            production = get_production_model_version(registry, model_name)
+    else:
+        # Only extra trees are fitted when a smaller cached forest matches
+        warm_start = find_warm_start(cache, data_version, code, candidates)
+        result, model, production = train_and_register(
+            client,
+            registry,
+            models,
+            model_name,
+            candidates,
+            params,
+            data_version,
+            data_metadata,
+            warm_start,
+            resources,
+            predictions,
+        )
+        if cache is not None:
+            cache.put(
+                key, model, {**result, "model_name": model_name, "code_hash": code}
+            )
+
+    # Promote model based on comparison
+    promoted, significance = decide_promotion(
+        registry, predictions, models, model_name, result, production, params
+    )
+
+    # Save metadata locally
+    metadata_path = save_metadata(
+        result,
+        model_name,
+        promoted,
+        significance,
+        data_version=data_version,
+        tracking_round_trips=client.total_round_trips,
+        resources=resources._asdict(),
+        model_cache=models.stats(),
+    )
 
+    run_id = result["run_id"]
     alias = "production" if promoted else "staging"
     logger.info(f"Model logged to MLflow/DagsHub, run_id: {run_id}")
-    logger.info(f"Model registered as: {model_name} v{latest_version}")
+    logger.info(f"Model registered as: {model_name} v{result['version']}")
     logger.info(f"Alias: {alias}")
     logger.info(f"Metadata saved: {metadata_path}")
+    logger.info(
+        f"Tracking round trips: {client.total_round_trips} ({dict(client.round_trips)})"
+    )
+    logger.info(f"Model cache: {models.stats()}")
+
+    # Summary timings go to the run this invocation trained (not a cached one)
+    if trained and tracking.get("trace_metrics", False):
+        log_trace_metrics(client, run_id, tracer)
+    trace_path = tracer.write(tracing.TRACE_PATH)
+    logger.info(f"Stage trace saved: {trace_path}")
+
+
+def benchmark():
+    """Fit the configured forest on 1..N workers and write the scaling table"""
+    params = load_params()
+    model_params = {
+        "n_estimators": params.get("n_estimators", 100),
+        "max_depth": params.get("max_depth", 5),
+        "random_state": params.get("random_state", 42),
+    }
+    config = params.get("resources") or {}
+    settings = config.get("benchmark") or {}
+    plan = plan_resources(config, 1)
+    max_workers = int(settings.get("max_workers") or plan.cpus)
+
+    train_df = read_split("train", FEATURES_DIR)
+    X_train = train_df.drop("target", axis=1)
+    y_train = train_df["target"]
+    logger.info(
+        f"Benchmarking {model_params} on {len(X_train)} rows, "
+        f"1..{max_workers} {plan.backend} worker(s)"
+    )
+    rows = scaling_curve(
+        model_params,
+        X_train,
+        y_train,
+        max_workers,
+        backend=plan.backend,
+        repeats=int(settings.get("repeats", 3)),
+    )
+
+    report = {
+        "params": model_params,
+        "rows": len(X_train),
+        "backend": plan.backend,
+        "cpus": plan.cpus,
+        "cpu_limit": plan.cpu_limit,
+        "affinity": plan.affinity,
+        "scaling": rows,
+    }
+    SCALING_PATH.parent.mkdir(parents=True, exist_ok=True)
+    SCALING_PATH.write_text(json.dumps(report, indent=2))
+    logger.info(f"Scaling table saved: {SCALING_PATH}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="time training on 1..N workers instead of training a model",
+    )
+    if parser.parse_args().benchmark:
+        benchmark()
+    else:
+        main()
@@ -0,0 +1,258 @@
+"""
+Mergeable data-profile accumulators for the validate stage
+
+A profile is a plain dict (JSON-serializable, picklable) built from one chunk
+of rows and combined with merge_profiles. Moments use the pairwise update
+formulas of Chan et al. / Pébay, histograms use fixed bin edges, so profiles
+of partitions computed in any order or in parallel merge to the same result
+as a single pass over all rows.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def histogram_edges(column: str, config: Dict) -> np.ndarray:
+    """Fixed histogram edges for a column (per-column range overrides global)"""
+    low, high = config.get("histogram_ranges", {}).get(
+        column, config.get("histogram_range", [0.0, 10.0])
+    )
+    return np.linspace(float(low), float(high), int(config.get("bins", 20)) + 1)
+
+
+def profile_table(table: pa.Table, config: Dict, target: str = "target") -> Dict:
+    """
+    Profile one chunk of rows
+
+    Args:
+        table: Chunk to profile
+        config: Histogram settings ("bins", "histogram_range", "histogram_ranges")
+        target: Column holding class labels
+
+    Returns:
+        Mergeable profile dict
+    """
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        nulls = column.null_count
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            values = column.drop_null().to_numpy().astype(np.float64)
+            nan = np.isnan(values)
+            nulls += int(nan.sum())
+            edges = histogram_edges(name, config)
+            columns[name] = _numeric_profile(values[~nan], edges)
+        else:
+            columns[name] = {"count": len(column) - nulls}
+        columns[name]["nulls"] = nulls
+        columns[name]["type"] = str(column.type)
+
+    classes = {}
+    if target in table.column_names:
+        counts = pc.value_counts(table.column(target).drop_null())
+        for item in counts.to_pylist():
+            classes[str(item["values"])] = item["counts"]
+
+    return {"rows": table.num_rows, "columns": columns, "classes": classes}
+
+
+def merge_profiles(a: Optional[Dict], b: Dict) -> Dict:
+    """Combine two profiles; a may be None (empty accumulator)"""
+    if a is None:
+        return b
+
+    columns = dict(a["columns"])
+    for name, stats in b["columns"].items():
+        if name not in columns:
+            columns[name] = stats
+        elif stats["type"] != columns[name]["type"]:
+            raise ValueError(
+                f"Column '{name}' changes type across partitions: "
+                f"{columns[name]['type']} vs {stats['type']}"
+            )
+        else:
+            columns[name] = _merge_column(columns[name], stats)
+
+    classes = dict(a["classes"])
+    for label, count in b["classes"].items():
+        classes[label] = classes.get(label, 0) + count
+
+    return {"rows": a["rows"] + b["rows"], "columns": columns, "classes": classes}
+
+
+def summarize(profile: Dict) -> Dict:
+    """Turn accumulated moments into mean/std/skewness/kurtosis"""
+    columns = {}
+    for name, stats in profile["columns"].items():
+        summary = {
+            "type": stats["type"],
+            "count": stats["count"],
+            "nulls": stats["nulls"],
+        }
+        if "m2" in stats:
+            n = stats["count"]
+            variance = stats["m2"] / n if n else 0.0
+            summary.update(
+                {
+                    "min": stats["min"],
+                    "max": stats["max"],
+                    "mean": stats["mean"],
+                    "std": float(np.sqrt(variance)),
+                    "skewness": (
+                        float(np.sqrt(n) * stats["m3"] / stats["m2"] ** 1.5)
+                        if stats["m2"] > 0
+                        else 0.0
+                    ),
+                    "kurtosis": (
+                        float(n * stats["m4"] / stats["m2"] ** 2 - 3.0)
+                        if stats["m2"] > 0
+                        else 0.0
+                    ),
+                    "histogram": stats["histogram"],
+                }
+            )
+        columns[name] = summary
+
+    return {
+        "rows": profile["rows"],
+        "columns": columns,
+        "classes": dict(sorted(profile["classes"].items())),
+    }
+
+
+def run_checks(report: Dict, checks: Dict) -> List[str]:
+    """
+    Evaluate quality checks against a summarized report
+
+    Supported checks: required_columns, max_null_fraction, min_class_count,
+    feature_ranges ({column: [low, high]}).
+
+    Returns:
+        Human-readable failure messages (empty when all checks pass)
+    """
+    failures = []
+    rows = report["rows"]
+    columns = report["columns"]
+
+    for name in checks.get("required_columns", []):
+        if name not in columns:
+            failures.append(f"missing required column '{name}'")
+
+    max_null_fraction = checks.get("max_null_fraction")
+    if max_null_fraction is not None and rows:
+        for name, stats in columns.items():
+            fraction = stats["nulls"] / rows
+            if fraction > max_null_fraction:
+                failures.append(
+                    f"column '{name}' null fraction {fraction:.4f} "
+                    f"> {max_null_fraction}"
+                )
+
+    min_class_count = checks.get("min_class_count")
+    if min_class_count is not None:
+        if not report["classes"]:
+            failures.append("no class labels found")
+        for label, count in report["classes"].items():
+            if count < min_class_count:
+                failures.append(f"class {label} has {count} rows < {min_class_count}")
+
+    for name, (low, high) in checks.get("feature_ranges", {}).items():
+        stats = columns.get(name)
+        if stats is None or "min" not in stats or stats["count"] == 0:
+            continue
+        if stats["min"] < low or stats["max"] > high:
+            failures.append(
+                f"column '{name}' range [{stats['min']}, {stats['max']}] "
+                f"outside [{low}, {high}]"
+            )
+
+    return failures
+
+
+def _numeric_profile(values: np.ndarray, edges: np.ndarray) -> Dict:
+    n = len(values)
+    counts, _ = np.histogram(values, bins=edges)
+    histogram = {
+        "edges": edges.tolist(),
+        "counts": counts.tolist(),
+        "underflow": int((values < edges[0]).sum()),
+        "overflow": int((values > edges[-1]).sum()),
+    }
+    if n == 0:
+        return {
+            "count": 0,
+            "min": None,
+            "max": None,
+            "mean": 0.0,
+            "m2": 0.0,
+            "m3": 0.0,
+            "m4": 0.0,
+            "histogram": histogram,
+        }
+
+    mean = float(values.mean())
+    d = values - mean
+    d2 = d * d
+    return {
+        "count": n,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": mean,
+        "m2": float(d2.sum()),
+        "m3": float((d2 * d).sum()),
+        "m4": float((d2 * d2).sum()),
+        "histogram": histogram,
+    }
+
+
+def _merge_column(a: Dict, b: Dict) -> Dict:
+    merged = {"type": a["type"], "nulls": a["nulls"] + b["nulls"]}
+    if "m2" not in a:
+        merged["count"] = a["count"] + b["count"]
+        return merged
+
+    na, nb = a["count"], b["count"]
+    n = na + nb
+    if na == 0 or nb == 0:
+        source = b if na == 0 else a
+        merged.update({k: source[k] for k in ("count", "mean", "m2", "m3", "m4")})
+    else:
+        # Pébay (2008) pairwise update of central moment sums
+        delta = b["mean"] - a["mean"]
+        delta_n = delta / n
+        term = delta * delta_n * na * nb
+        merged["count"] = n
+        merged["mean"] = a["mean"] + delta_n * nb
+        merged["m2"] = a["m2"] + b["m2"] + term
+        merged["m3"] = (
+            a["m3"]
+            + b["m3"]
+            + term * delta_n * (na - nb)
+            + 3.0 * delta_n * (na * b["m2"] - nb * a["m2"])
+        )
+        merged["m4"] = (
+            a["m4"]
+            + b["m4"]
+            + term * delta_n**2 * (na * na - na * nb + nb * nb)
+            + 6.0 * delta_n**2 * (na * na * b["m2"] + nb * nb * a["m2"])
+            + 4.0 * delta_n * (na * b["m3"] - nb * a["m3"])
+        )
+
+    lows = [v for v in (a["min"], b["min"]) if v is not None]
+    highs = [v for v in (a["max"], b["max"]) if v is not None]
+    merged["min"] = min(lows, default=None)
+    merged["max"] = max(highs, default=None)
+
+    ha, hb = a["histogram"], b["histogram"]
+    if ha["edges"] != hb["edges"]:
+        raise ValueError("Cannot merge histograms with different bin edges")
+    merged["histogram"] = {
+        "edges": ha["edges"],
+        "counts": [x + y for x, y in zip(ha["counts"], hb["counts"])],
+        "underflow": ha["underflow"] + hb["underflow"],
+        "overflow": ha["overflow"] + hb["overflow"],
+    }
+    return merged
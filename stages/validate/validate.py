@@ -0,0 +1,197 @@
+"""
+Validate stage: Profile raw partitions in one streaming pass and run data checks
+"""
+
+import hashlib
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import yaml
+from data_profile import merge_profiles, profile_table, run_checks, summarize
+from parallel import ordered_map
+from processed_data import partition_files
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+INPUT_DIR = Path("/data/raw/iris")
+INPUT_OUT = "data/raw/iris"
+CACHE_DIR = Path("/data/validation")
+REPORT_PATH = Path("/metrics/data_profile.json")
+REPORT_CACHE_SIZE = 16
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = Path("/workspace/params.yaml")
+    if not params_path.exists():
+        return {
+            "bins": 20,
+            "histogram_range": [0.0, 10.0],
+            "n_jobs": 1,
+            "fail_on_error": True,
+            "checks": {"required_columns": ["target"], "min_class_count": 1},
+        }
+
+    with open(params_path) as f:
+        params = yaml.safe_load(f)
+    return params.get("validate", {})
+
+
+def get_input_md5(lock_path=Path("/workspace/dvc.lock"), out_path=INPUT_OUT):
+    """Look up the md5 DVC recorded for out_path in dvc.lock (None if absent)"""
+    if not lock_path.exists():
+        return None
+
+    with open(lock_path) as f:
+        dvc_lock = yaml.safe_load(f) or {}
+
+    for stage_data in dvc_lock.get("stages", {}).values():
+        for out in stage_data.get("outs", []):
+            if out.get("path") == out_path and "md5" in out:
+                return out["md5"]
+    return None
+
+
+def config_key(config):
+    """Short hash of the profiling settings, so cached profiles match them"""
+    encoded = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def _profile_row_group(args):
+    path, row_group, config = args
+    table = pq.ParquetFile(path).read_row_group(row_group)
+    return path.stem, profile_table(table, config)
+
+
+def profile_partitions(files, config, cache_dir, n_jobs):
+    """
+    Profile every partition, reusing cached per-partition profiles
+
+    Raw partitions are content-addressed, so a partition's file name
+    identifies its content and its cached profile never goes stale.
+
+    Returns:
+        (merged profile, number of partitions scanned)
+    """
+    key = config_key(config)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    profiles = {}
+    tasks = []
+    for path in files:
+        cached = cache_dir / f"{path.stem}-{key}.json"
+        if cached.exists():
+            profiles[path.stem] = json.loads(cached.read_text())
+            continue
+        num_row_groups = pq.ParquetFile(path).num_row_groups
+        tasks.extend((path, i, config) for i in range(num_row_groups))
+
+    scanned = {}
+    for stem, profile in ordered_map(_profile_row_group, tasks, n_jobs):
+        scanned[stem] = merge_profiles(scanned.get(stem), profile)
+    for stem, profile in scanned.items():
+        (cache_dir / f"{stem}-{key}.json").write_text(json.dumps(profile))
+    profiles.update(scanned)
+
+    # Drop cached profiles of partitions that no longer exist
+    live = {path.stem for path in files}
+    for cached in cache_dir.glob(f"*-{key}.json"):
+        if cached.stem.rsplit("-", 1)[0] not in live:
+            cached.unlink()
+
+    merged = None
+    for path in files:
+        merged = merge_profiles(merged, profiles[path.stem])
+    return merged, len(scanned)
+
+
+def build_report(input_dir, config, checks, cache_dir, n_jobs):
+    """Profile input_dir and evaluate checks; returns (report, partitions scanned)"""
+    files = partition_files(input_dir, ".parquet")
+    if not files:
+        raise FileNotFoundError(f"No partitions found in {input_dir}")
+
+    profile, scanned = profile_partitions(files, config, cache_dir, n_jobs)
+    report = summarize(profile)
+    failures = run_checks(report, checks)
+    report["input"] = {
+        "partitions": sorted(path.name for path in files),
+        "config": config,
+        "checks": checks,
+    }
+    report["checks"] = {"passed": not failures, "failures": failures}
+    return report, scanned
+
+
+def load_cached_report(path, input_dir):
+    """Return a cached report if it still describes the partitions on disk"""
+    if not path.exists():
+        return None
+    report = json.loads(path.read_text())
+    partitions = sorted(p.name for p in partition_files(input_dir, ".parquet"))
+    if report.get("input", {}).get("partitions") != partitions:
+        return None
+    return report
+
+
+def save_cached_report(report, path):
+    """Store a report in the cache, keeping the most recent entries"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    entries = sorted(path.parent.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for stale in entries[:-REPORT_CACHE_SIZE]:
+        stale.unlink()
+
+
+def main():
+    logger.info("Starting data validation")
+
+    # Load parameters
+    params = load_params()
+    config = {
+        "bins": params.get("bins", 20),
+        "histogram_range": params.get("histogram_range", [0.0, 10.0]),
+        "histogram_ranges": params.get("histogram_ranges") or {},
+    }
+    checks = params.get("checks") or {}
+    n_jobs = params.get("n_jobs", 1)
+
+    # An unchanged input md5 in dvc.lock means the report can be reused as is
+    input_md5 = get_input_md5()
+    cache_key = config_key({"config": config, "checks": checks})
+    cached_path = CACHE_DIR / "reports" / f"{input_md5}-{cache_key}.json"
+
+    report = load_cached_report(cached_path, INPUT_DIR) if input_md5 else None
+    if report is not None:
+        logger.info(f"Input {INPUT_OUT} unchanged (md5 {input_md5}), reusing report")
+    else:
+        report, scanned = build_report(
+            INPUT_DIR, config, checks, CACHE_DIR / "partitions", n_jobs
+        )
+        logger.info(
+            f"Profiled {len(report['input']['partitions'])} partitions "
+            f"({scanned} scanned, n_jobs={n_jobs})"
+        )
+        if input_md5:
+            save_cached_report(report, cached_path)
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+    logger.info(f"Profile saved: {REPORT_PATH} ({report['rows']} rows)")
+    logger.info(f"Class counts: {report['classes']}")
+
+    for failure in report["checks"]["failures"]:
+        logger.error(f"Check failed: {failure}")
+    if not report["checks"]["passed"] and params.get("fail_on_error", True):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import functools
+import importlib
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+MODEL_NAME = "iris-classifier"
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """
+    The train and evaluate stages on iris, tracking to a file:// store in tmp_path
+
+    pipeline.train(**train_params) and pipeline.evaluate(**evaluate_params)
+    write params.yaml and run the stage's main(); train returns the model
+    metadata it saved.
+    """
+    pytest.importorskip("numpy")
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    yaml = pytest.importorskip("yaml")
+    datasets = pytest.importorskip("sklearn.datasets")
+    pytest.importorskip("mlflow")
+    for stage in ("common", "train", "evaluate"):
+        path = str(PROJECT_ROOT / "stages" / stage)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    processed_data = importlib.import_module("processed_data")
+    tracing = importlib.import_module("tracing")
+    train = importlib.import_module("train")
+    evaluate = importlib.import_module("evaluate")
+    from mlflow.tracking import MlflowClient
+
+    # Every third row is a test row, so both splits hold every class
+    iris = datasets.load_iris(as_frame=True)
+    data = iris.data.set_axis(
+        ["sepal_length", "sepal_width", "petal_length", "petal_width"], axis=1
+    )
+    data["target"] = iris.target
+    data["target_name"] = iris.target_names[iris.target]
+    is_test = data.index % 3 == 0
+    processed = tmp_path / "data" / "processed"
+    features = tmp_path / "data" / "features"
+    for name, rows in (("train", data[~is_test]), ("test", data[is_test])):
+        rows = rows.reset_index(drop=True)
+        processed_data.write_split(rows, name, processed)
+        processed_data.write_split(rows.drop(columns="target_name"), name, features)
+
+    workspace = tmp_path / "workspace"
+    models = tmp_path / "models"
+    metrics = tmp_path / "metrics"
+    workspace.mkdir()
+    # One data version for every run; the md5 stands for the features above
+    lock = {
+        "stages": {
+            "featurize": {
+                "outs": [{"path": "data/features", "md5": "0" * 32, "size": 1}]
+            }
+        }
+    }
+    (workspace / "dvc.lock").write_text(yaml.safe_dump(lock))
+
+    uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", uri)
+    monkeypatch.delenv("MLFLOW_OFFLINE", raising=False)
+    monkeypatch.setenv("GIT_COMMIT", "0" * 40)
+    monkeypatch.setattr(tracing, "TRACE_PATH", metrics / "stage_trace.json")
+    for module in (train, evaluate):
+        monkeypatch.setattr(module, "FEATURES_DIR", features)
+        monkeypatch.setattr(module, "PROCESSED_DIR", processed)
+        monkeypatch.setattr(module, "PARAMS_PATH", workspace / "params.yaml")
+        monkeypatch.setattr(module, "PREDICTIONS_DIR", models / "predictions")
+        monkeypatch.setattr(module, "MODEL_CACHE_DIR", models / "model_cache")
+        monkeypatch.setattr(
+            module, "REGISTRY_CACHE", models / "cache" / "registry.json"
+        )
+    monkeypatch.setattr(train, "DVC_LOCK_PATH", workspace / "dvc.lock")
+    monkeypatch.setattr(train, "OUTPUT_DIR", models)
+    monkeypatch.setattr(train, "CACHE_DIR", models / "cache")
+    monkeypatch.setattr(evaluate, "METADATA_PATH", models / "model_metadata.json")
+    monkeypatch.setattr(evaluate, "METRICS_DIR", metrics)
+    monkeypatch.setattr(evaluate, "_models", {})
+    if not hasattr(pd.DataFrame, "applymap"):
+        # mlflow 2.11 hashes datasets with DataFrame.applymap (removed in pandas 3)
+        digest = functools.partial(train.from_pandas, digest="0" * 8)
+        monkeypatch.setattr(train, "from_pandas", digest)
+
+    def write_params(section, values):
+        (workspace / "params.yaml").write_text(yaml.safe_dump({section: values}))
+
+    def run_train(**params):
+        defaults = {
+            "n_estimators": 10,
+            "max_depth": 3,
+            "random_state": 0,
+            "promotion": {"n_resamples": 1000},
+            "resources": {"n_jobs": 1},
+        }
+        write_params("train", {**defaults, **params})
+        train.main()
+        return json.loads((models / "model_metadata.json").read_text())
+
+    def run_evaluate(**params):
+        write_params("evaluate", {"slices": {"enabled": True}, **params})
+        evaluate.main()
+
+    return SimpleNamespace(
+        train=run_train,
+        evaluate=run_evaluate,
+        client=MlflowClient(tracking_uri=uri),
+        model_name=MODEL_NAME,
+        models=models,
+        metrics=metrics,
+        train_module=train,
+        evaluate_module=evaluate,
+    )
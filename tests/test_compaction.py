@@ -0,0 +1,115 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+compaction = importlib.import_module("compaction")
+
+
+@pytest.fixture
+def fitted():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=list("abcd"))
+    y = np.where(X["a"] + 0.3 * X["b"] > 0, "pos", "neg")
+    model = ensemble.RandomForestClassifier(
+        n_estimators=40, max_depth=4, random_state=0
+    )
+    model.fit(X[:200], y[:200])
+    return model, X[200:], y[200:], X[:200], y[:200]
+
+
+def test_prefix_accuracies_match_truncated_forests(fitted):
+    model, X, y, _, _ = fitted
+
+    accuracies = compaction.prefix_accuracies(model, X, y, chunk_rows=32)
+
+    assert len(accuracies) == 40
+    for k in (1, 7, 40):
+        truncated = compaction.truncate_forest(model, k)
+        assert accuracies[k - 1] == pytest.approx(truncated.score(X, y))
+    assert len(model.estimators_) == 40
+
+
+def test_oob_prefix_accuracies_match_sklearn_oob_score(fitted):
+    _, _, _, X_train, y_train = fitted
+    model = ensemble.RandomForestClassifier(
+        n_estimators=40, max_depth=4, random_state=0, oob_score=True
+    ).fit(X_train, y_train)
+
+    accuracies = compaction.oob_prefix_accuracies(model, X_train, y_train, 64)
+
+    assert len(accuracies) == 40
+    assert accuracies[-1] == pytest.approx(model.oob_score_)
+
+
+@pytest.mark.parametrize("max_samples", [None, 150])
+def test_out_of_bag_mask_matches_sklearn_private_helpers(fitted, max_samples):
+    # Fails loudly (no skip) if sklearn drops or changes the helpers that
+    # out_of_bag_mask reimplements with public APIs
+    import inspect
+
+    from sklearn.ensemble import _forest
+
+    _, _, _, X_train, y_train = fitted
+    model = ensemble.RandomForestClassifier(
+        n_estimators=10, max_samples=max_samples, random_state=0
+    ).fit(X_train, y_train)
+    weight = {}
+    if (
+        "sample_weight"
+        in inspect.signature(_forest._get_n_samples_bootstrap).parameters
+    ):
+        weight = {"sample_weight": None}
+    n_bootstrap = _forest._get_n_samples_bootstrap(200, max_samples, **weight)
+
+    mask = compaction.out_of_bag_mask(model, 200)
+
+    for i, tree in enumerate(model.estimators_):
+        expected = _forest._generate_unsampled_indices(
+            tree.random_state, 200, n_bootstrap, **weight
+        )
+        np.testing.assert_array_equal(np.flatnonzero(mask[i]), expected)
+
+
+def test_out_of_bag_mask_rejects_fractional_max_samples(fitted):
+    _, _, _, X_train, y_train = fitted
+    model = ensemble.RandomForestClassifier(
+        n_estimators=2, max_samples=0.5, random_state=0
+    ).fit(X_train, y_train)
+
+    with pytest.raises(ValueError, match="max_samples"):
+        compaction.out_of_bag_mask(model, 200)
+
+
+def test_smallest_prefix_respects_tolerance_and_floor():
+    accuracies = np.array([0.7, 0.8, 0.9, 0.88, 0.92, 0.92])
+
+    assert compaction.smallest_prefix(accuracies, 0.0) == 5
+    assert compaction.smallest_prefix(accuracies, 0.02) == 3
+    assert compaction.smallest_prefix(accuracies, 0.5) == 1
+    assert compaction.smallest_prefix(accuracies, 0.5, min_trees=4) == 4
+    assert compaction.smallest_prefix(accuracies, 0.0, min_trees=10) == 6
+
+
+def test_compact_forest_reports_smaller_model(fitted):
+    model, _, _, X_train, y_train = fitted
+
+    compact, report = compaction.compact_forest(
+        model, X_train, y_train, tolerance=0.05, repeats=1
+    )
+
+    assert len(compact.estimators_) == report.trees <= report.original_trees
+    assert report.accuracy >= report.original_accuracy - 0.05
+    oob = compaction.oob_prefix_accuracies(model, X_train, y_train)
+    assert report.accuracy == oob[report.trees - 1]
+    if report.trees < report.original_trees:
+        assert report.size_bytes < report.original_size_bytes
+        assert compact.n_estimators == report.trees
+    assert set(report.as_dict()) >= {"size_reduction", "latency_speedup"}
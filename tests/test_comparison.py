@@ -0,0 +1,131 @@
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "evaluate"))
+comparison = importlib.import_module("comparison")
+feature_transforms = importlib.import_module("feature_transforms")
+prediction_cache = importlib.import_module("prediction_cache")
+processed_data = importlib.import_module("processed_data")
+
+
+class FakeRegistry:
+    def __init__(self, refs):
+        self.refs = refs
+
+    def resolve(self, model_name, ref):
+        if ref not in self.refs:
+            raise LookupError(f"{model_name}@{ref} not found")
+        version, run_id = self.refs[ref]
+        return SimpleNamespace(version=version, run_id=run_id)
+
+
+class FakeModels:
+    def __init__(self, predict, states):
+        self.predict = predict
+        self.states = states
+        self.loaded = []
+
+    def load(self, run_id, artifact_path, loader=None):
+        if artifact_path == feature_transforms.RUN_ARTIFACT:
+            return loader(self.states[run_id])
+        if artifact_path == "compiled_model":
+            raise OSError("no compiled forest")
+        self.loaded.append(run_id)
+        if run_id not in self.predict:
+            raise OSError("no such model")
+        return SimpleNamespace(predict=self.predict[run_id])
+
+
+def test_disagreement_rates():
+    rates = comparison.disagreement_rates([[0, 1, 2, 2], [0, 1, 1, 1], [0, 1, 2, 2]])
+
+    np.testing.assert_array_equal(
+        rates, [[0.0, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.0]]
+    )
+
+
+def test_compare_models_predicts_each_run_once(tmp_path, monkeypatch):
+    processed, features = tmp_path / "processed", tmp_path / "features"
+    x = np.expm1([0.0, 1.0, 2.0, 3.0])
+    processed_data.write_split(
+        pd.DataFrame({"x": x, "target": [0, 1, 1, 2]}), "test", processed
+    )
+    # The current features come from another fit than the old run's
+    processed_data.write_split(
+        pd.DataFrame({"x": x / 10, "target": [0, 1, 1, 2]}), "test", features
+    )
+    monkeypatch.setattr(comparison, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(comparison, "FEATURES_DIR", features)
+    log1p = feature_transforms.build_state(
+        [{"type": "log1p", "columns": ["x"]}], [None]
+    )
+    feature_transforms.save_state(
+        log1p, tmp_path / "old" / feature_transforms.STATE_FILE
+    )
+    # Runs without cached predictions look for their artifact first
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", (tmp_path / "mlruns").as_uri())
+    predictions = prediction_cache.PredictionCache(tmp_path / "predictions")
+    predictions.save("run-prod", "md5", y_pred=np.array([0, 1, 1, 1]))
+    registry = FakeRegistry(
+        {
+            "production": (2, "run-prod"),
+            "3": (3, "run-new"),
+            "1": (1, "run-old"),
+            "4": (4, "run-broken"),
+            "5": (5, "run-stateless"),
+        }
+    )
+    models = FakeModels(
+        {
+            "run-old": lambda X: np.round(X["x"].to_numpy()).astype(int),
+            "run-stateless": lambda X: np.zeros(len(X), dtype=int),
+        },
+        {"run-old": tmp_path / "old", "run-broken": tmp_path / "old"},
+    )
+
+    report, run_metrics = comparison.compare_models(
+        registry,
+        "m",
+        "run-new",
+        np.array([0, 1, 1, 2]),
+        ["production", "staging", "3", "1", "4", "5"],
+        "md5",
+        candidate_version=3,
+        predictions=predictions,
+        models=models,
+    )
+
+    assert sorted(models.loaded) == ["run-broken", "run-old"]
+    # Re-predicted on the processed rows with the run's own state
+    np.testing.assert_array_equal(predictions.load("run-old", "md5"), [0, 1, 2, 3])
+    assert predictions.load("run-stateless", "md5") is None
+    entries = {entry["name"]: entry for entry in report["models"]}
+    assert list(entries) == ["candidate", "production", "1"]
+    assert entries["candidate"]["refs"] == ["candidate", "3"]
+    assert entries["candidate"]["version"] == 3
+    assert entries["candidate"]["accuracy"] == 1.0
+    assert entries["production"]["source"] == "predictions"
+    assert entries["1"]["source"] == "model"
+    assert report["disagreement"]["models"] == ["candidate", "production", "1"]
+    assert report["disagreement"]["data"][0] == [0.0, 0.25, 0.5]
+    assert set(run_metrics) == {"run-new", "run-prod", "run-old"}
+    assert run_metrics["run-prod"]["eval_accuracy"] == 0.75
+    assert run_metrics["run-prod"]["eval_disagreement_candidate"] == 0.25
+    assert set(run_metrics["run-new"]) == {
+        "eval_accuracy",
+        "eval_precision",
+        "eval_recall",
+        "eval_f1",
+        "eval_disagreement_production",
+        "eval_disagreement_1",
+    }
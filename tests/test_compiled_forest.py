@@ -0,0 +1,98 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+compiled_forest = importlib.import_module("compiled_forest")
+
+
+def make_data(n=600):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(n, 4)), columns=["a", "b", "c", "d"])
+    y = np.where(X["a"] + X["b"] * X["c"] > 0.2, "x", np.where(X["d"] > 0, "y", "z"))
+    return X, y
+
+
+@pytest.mark.parametrize("max_depth", [None, 1, 4])
+def test_predictions_are_identical_to_sklearn(max_depth):
+    X, y = make_data()
+    model = ensemble.RandomForestClassifier(
+        n_estimators=15, max_depth=max_depth, random_state=0
+    ).fit(X[:400], y[:400])
+
+    forest = compiled_forest.CompiledForest.from_sklearn(model)
+
+    X_test = X[400:]
+    np.testing.assert_array_equal(
+        forest.predict_proba(X_test, chunk_rows=64), model.predict_proba(X_test)
+    )
+    np.testing.assert_array_equal(forest.predict(X_test), model.predict(X_test))
+
+
+def test_saved_forest_is_memory_mapped(tmp_path):
+    X, y = make_data()
+    model = ensemble.RandomForestClassifier(n_estimators=5, random_state=0)
+    model.fit(X, y)
+    compiled_forest.CompiledForest.from_sklearn(model).save(tmp_path)
+
+    forest = compiled_forest.CompiledForest.load(tmp_path)
+
+    assert isinstance(forest.threshold, np.memmap)
+    assert forest.meta["n_trees"] == 5
+    # Columns are matched by name, like sklearn's feature_names_in_
+    shuffled = X[["d", "c", "b", "a"]]
+    np.testing.assert_array_equal(forest.predict(shuffled), model.predict(X))
+    with pytest.raises(ValueError):
+        forest.predict(X[["a", "b"]])
+
+
+def test_verify_fails_loudly_on_mismatch():
+    X, y = make_data()
+    model = ensemble.RandomForestClassifier(n_estimators=5, n_jobs=2, random_state=0)
+    model.fit(X, y)
+    forest = compiled_forest.CompiledForest.from_sklearn(model)
+
+    forest.verify(model, X)
+    assert model.n_jobs == 2
+
+    # One ulp off in every leaf is enough to fail
+    forest.value[:] = np.nextafter(forest.value, 2.0)
+    with pytest.raises(ValueError, match="differ from sklearn"):
+        forest.verify(model, X)
+
+
+class FakeModels:
+    def __init__(self, artifacts):
+        self.artifacts = artifacts
+        self.loaded = []
+
+    def load(self, run_id, artifact_path, loader=None):
+        self.loaded.append(artifact_path)
+        if artifact_path not in self.artifacts:
+            raise OSError(f"no {artifact_path} artifact")
+        path = self.artifacts[artifact_path]
+        return path if loader is None else loader(path)
+
+
+def test_load_run_predictor_prefers_the_compiled_forest(tmp_path):
+    X, y = make_data()
+    model = ensemble.RandomForestClassifier(n_estimators=5, random_state=0)
+    model.fit(X, y)
+    compiled_forest.CompiledForest.from_sklearn(model).save(tmp_path)
+
+    models = FakeModels({compiled_forest.ARTIFACT: tmp_path, "model": model})
+    predictor = compiled_forest.load_run_predictor(models, "run")
+
+    assert isinstance(predictor, compiled_forest.CompiledForest)
+    np.testing.assert_array_equal(predictor.predict(X), model.predict(X))
+
+    models = FakeModels({"model": model})
+    assert compiled_forest.load_run_predictor(models, "run") is model
+    assert models.loaded == [compiled_forest.ARTIFACT, "model"]
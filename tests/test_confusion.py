@@ -0,0 +1,66 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+metrics = pytest.importorskip("sklearn.metrics")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "evaluate"))
+confusion = importlib.import_module("confusion")
+
+
+def sklearn_metrics(y_true, y_pred):
+    precision, recall, f1, _ = metrics.precision_recall_fscore_support(
+        y_true, y_pred, average="weighted", zero_division=0
+    )
+    return {
+        "accuracy": float(metrics.accuracy_score(y_true, y_pred)),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunked_merge_matches_sklearn_exactly(seed):
+    rng = np.random.default_rng(seed)
+    n, k = int(rng.integers(1, 500)), int(rng.integers(2, 6))
+    y_true = rng.integers(0, k, n)
+    # Some rows right, some wrong, including a label never in y_true
+    y_pred = np.where(rng.random(n) < 0.7, y_true, rng.integers(0, k + 1, n))
+
+    total = confusion.ConfusionAccumulator()
+    partials = [
+        confusion.ConfusionAccumulator().update(y_true[i : i + 41], y_pred[i : i + 41])
+        for i in range(0, n, 41)
+    ]
+    for partial in reversed(partials):
+        total.merge(partial)
+
+    assert total.metrics() == sklearn_metrics(y_true, y_pred)
+    labels, counts = total.matrix()
+    np.testing.assert_array_equal(counts, metrics.confusion_matrix(y_true, y_pred))
+    assert total.n_rows == n
+
+
+def test_declared_but_unseen_labels_are_dropped_and_strings_work():
+    y_true = np.array(["b", "a", "b", "c"])
+    y_pred = np.array(["b", "b", "b", "c"])
+
+    acc = confusion.ConfusionAccumulator(["a", "b", "c", "d"]).update(y_true, y_pred)
+
+    labels, counts = acc.matrix()
+    assert list(labels) == ["a", "b", "c"]
+    np.testing.assert_array_equal(counts, metrics.confusion_matrix(y_true, y_pred))
+    assert acc.metrics() == sklearn_metrics(y_true, y_pred)
+
+
+def test_rejects_mismatched_or_empty_input():
+    acc = confusion.ConfusionAccumulator([0, 1])
+    with pytest.raises(ValueError):
+        acc.update([0, 1], [0])
+    with pytest.raises(ValueError):
+        acc.metrics()
@@ -0,0 +1,50 @@
+import json
+import shutil
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pytest
+
+
+def test_main_scores_the_predictions_train_saved(pipeline, monkeypatch):
+    metadata = pipeline.train()
+
+    def reload(models, run_id):
+        pytest.fail("evaluate re-predicted instead of scoring saved predictions")
+
+    monkeypatch.setattr(pipeline.evaluate_module, "load_run_predictor", reload)
+    pipeline.evaluate()
+
+    metrics = json.loads((pipeline.metrics / "metrics.json").read_text())
+    assert metrics["accuracy"] == pytest.approx(metadata["test_accuracy"])
+    cm = json.loads((pipeline.metrics / "confusion_matrix.json").read_text())
+    assert cm["labels"] == ["setosa", "versicolor", "virginica"]
+    assert sum(map(sum, cm["data"])) == 50
+    slices = json.loads((pipeline.metrics / "slices.json").read_text())
+    assert {"slice": {"target_name": "setosa"}} in [
+        {"slice": entry["slice"]} for entry in slices["slices"]
+    ]
+    logged = pipeline.client.get_run(metadata["run_id"]).data
+    assert logged.metrics["eval_accuracy"] == pytest.approx(metrics["accuracy"])
+
+
+def test_main_predicts_with_the_model_without_saved_predictions(pipeline, monkeypatch):
+    metadata = pipeline.train()
+    # Neither the local copy nor the run's artifact is left
+    run = pipeline.client.get_run(metadata["run_id"])
+    artifacts = Path(urlparse(run.info.artifact_uri).path)
+    shutil.rmtree(artifacts / "test_predictions")
+    shutil.rmtree(pipeline.models / "predictions")
+    evaluate = pipeline.evaluate_module
+    original, loaded = evaluate.load_run_predictor, []
+
+    def load_run_predictor(models, run_id):
+        loaded.append(run_id)
+        return original(models, run_id)
+
+    monkeypatch.setattr(evaluate, "load_run_predictor", load_run_predictor)
+    pipeline.evaluate(slices={"enabled": False})
+
+    assert loaded == [metadata["run_id"]]
+    metrics = json.loads((pipeline.metrics / "metrics.json").read_text())
+    assert metrics["accuracy"] == pytest.approx(metadata["test_accuracy"])
@@ -0,0 +1,115 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+feature_transforms = importlib.import_module("feature_transforms")
+
+
+def fit(df, spec, chunks=1):
+    steps = feature_transforms.normalize_spec(spec, ["a", "b"])
+    fitted = [None] * len(steps)
+    passes = 0
+    while collect := feature_transforms.plan_pass(steps, fitted):
+        stats = {}
+        for rows in np.array_split(np.arange(len(df)), chunks):
+            chunk = df.iloc[rows]
+            partial = feature_transforms.collect_stats(chunk, steps, fitted, collect)
+            stats = feature_transforms.merge_stats(stats, partial)
+        for i in collect:
+            fitted[i] = feature_transforms.fit_step(steps[i], stats[i])
+        passes += 1
+    return feature_transforms.build_state(steps, fitted), passes
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"a": rng.normal(3, 2, 100), "b": rng.uniform(0, 9, 100)})
+
+
+def test_chunked_fit_matches_single_pass(frame):
+    spec = [{"type": "standardize"}, {"type": "bin", "columns": ["b"], "n_bins": 4}]
+
+    whole, _ = fit(frame, spec, chunks=1)
+    chunked, _ = fit(frame, spec, chunks=7)
+
+    assert whole["params"][0]["a"]["mean"] == pytest.approx(frame["a"].mean())
+    assert whole["params"][0]["a"]["scale"] == pytest.approx(frame["a"].std(ddof=0))
+    for column in ("a", "b"):
+        for key in ("mean", "scale"):
+            assert chunked["params"][0][column][key] == pytest.approx(
+                whole["params"][0][column][key]
+            )
+    assert chunked["params"][1]["b"]["edges"] == pytest.approx(
+        whole["params"][1]["b"]["edges"]
+    )
+
+
+def test_dependent_steps_are_fitted_in_later_passes(frame):
+    spec = [{"type": "minmax"}, {"type": "standardize", "columns": ["a"]}]
+
+    state, passes = fit(frame, spec)
+    out = feature_transforms.transform(state, frame)
+
+    assert passes == 2
+    assert out["a"].mean() == pytest.approx(0.0, abs=1e-12)
+    assert out["b"].between(0, 1).all()
+
+
+def test_category_maps_unknown_values_to_minus_one():
+    df = pd.DataFrame({"a": ["x", "y", "x"], "b": [1.0, 2.0, 3.0]})
+    steps = feature_transforms.normalize_spec(
+        [{"type": "category", "columns": ["a"]}], ["a", "b"]
+    )
+    stats = feature_transforms.collect_stats(df, steps, [None], [0])
+    state = feature_transforms.build_state(
+        steps, [feature_transforms.fit_step(steps[0], stats[0])]
+    )
+
+    out = feature_transforms.transform(
+        state, pd.DataFrame({"a": ["y", "z"], "b": [0, 0]})
+    )
+
+    assert out["a"].tolist() == [1, -1]
+
+
+def test_state_round_trip(tmp_path, frame):
+    state, _ = fit(frame, [{"type": "log1p"}, {"type": "standardize"}])
+    path = tmp_path / feature_transforms.STATE_FILE
+
+    feature_transforms.save_state(state, path)
+    loaded = feature_transforms.load_state(path)
+
+    pd.testing.assert_frame_equal(
+        feature_transforms.transform(loaded, frame),
+        feature_transforms.transform(state, frame),
+    )
+
+
+def test_unknown_transform_is_rejected():
+    with pytest.raises(ValueError, match="Unknown transform"):
+        feature_transforms.normalize_spec([{"type": "pca"}], ["a"])
+
+
+def test_load_run_state_reads_the_runs_artifact(tmp_path, frame):
+    state, _ = fit(frame, [{"type": "standardize"}])
+    feature_transforms.save_state(
+        state, tmp_path / "run-a" / feature_transforms.STATE_FILE
+    )
+
+    class Models:
+        def load(self, run_id, artifact_path, loader):
+            assert artifact_path == feature_transforms.RUN_ARTIFACT
+            if not (tmp_path / run_id).is_dir():
+                raise OSError("no such artifact")
+            return loader(str(tmp_path / run_id))
+
+    assert feature_transforms.load_run_state(Models(), "run-a") == state
+    assert feature_transforms.load_run_state(Models(), "run-b") is None
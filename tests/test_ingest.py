@@ -0,0 +1,140 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "ingest"))
+partition_writer = importlib.import_module("partition_writer")
+sources = importlib.import_module("sources")
+
+
+def make_batch(start, num_rows):
+    values = [float(v) for v in range(start, start + num_rows)]
+    columns = [pa.array(values) for _ in sources.FEATURE_COLUMNS]
+    columns.append(pa.array([v % 3 for v in range(start, start + num_rows)]))
+    columns.append(pa.array(["setosa"] * num_rows))
+    return pa.RecordBatch.from_arrays(columns, schema=sources.RAW_SCHEMA)
+
+
+def test_writer_bounds_row_groups_and_files(tmp_path):
+    with partition_writer.PartitionedParquetWriter(
+        tmp_path, sources.RAW_SCHEMA, row_group_size=4, max_rows_per_file=10
+    ) as writer:
+        for start in range(0, 25, 7):
+            writer.write_batch(make_batch(start, min(7, 25 - start)))
+
+    assert writer.num_rows == 25
+    assert [p.name for p in writer.files] == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+        "part-00002.parquet",
+    ]
+
+    for path in writer.files:
+        metadata = pq.ParquetFile(path).metadata
+        assert metadata.num_rows <= 10
+        for i in range(metadata.num_row_groups):
+            assert metadata.row_group(i).num_rows <= 4
+
+
+def test_writer_preserves_row_order(tmp_path):
+    with partition_writer.PartitionedParquetWriter(
+        tmp_path, sources.RAW_SCHEMA, row_group_size=3, max_rows_per_file=5
+    ) as writer:
+        writer.write_batch(make_batch(0, 8))
+        writer.write_batch(make_batch(8, 4))
+
+    table = pq.read_table(tmp_path)
+    assert table.column("target").to_pylist() == [v % 3 for v in range(12)]
+    assert table.column(sources.FEATURE_COLUMNS[0]).to_pylist() == [
+        float(v) for v in range(12)
+    ]
+
+
+def test_get_source_unknown_name_raises():
+    with pytest.raises(ValueError, match="Unknown ingest source"):
+        sources.get_source("does-not-exist")
+
+
+def test_csv_source_streams_batches(tmp_path):
+    csv_path = tmp_path / "raw.csv"
+    header = ",".join(sources.RAW_SCHEMA.names)
+    rows = [f"{i},{i},{i},{i},{i % 3},setosa" for i in range(10)]
+    csv_path.write_text("\n".join([header, *rows]) + "\n", encoding="utf-8")
+
+    batches = list(sources.csv_source(batch_size=4, path=str(csv_path)))
+
+    assert [b.num_rows for b in batches] == [4, 4, 2]
+    assert batches[0].schema == sources.RAW_SCHEMA
+
+
+def test_content_addressed_partitions_are_immutable(tmp_path):
+    def ingest():
+        with partition_writer.PartitionedParquetWriter(
+            tmp_path,
+            sources.RAW_SCHEMA,
+            row_group_size=4,
+            max_rows_per_file=10,
+            content_addressed=True,
+        ) as writer:
+            writer.write_batch(make_batch(0, 15))
+        return writer
+
+    first = ingest()
+    mtimes = {p: p.stat().st_mtime_ns for p in first.files}
+    second = ingest()
+
+    assert len(first.files) == 2
+    assert all(p.name.startswith("part-") and len(p.stem) == 21 for p in first.files)
+    assert second.files == []
+    assert sorted(second.existing) == sorted(first.files)
+    assert {p: p.stat().st_mtime_ns for p in first.files} == mtimes
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_replace_partitions_swaps_in_a_complete_dataset(tmp_path):
+    def ingest(output_dir, start, num_rows):
+        with partition_writer.PartitionedParquetWriter(
+            output_dir,
+            sources.RAW_SCHEMA,
+            row_group_size=4,
+            max_rows_per_file=10,
+            content_addressed=True,
+        ) as writer:
+            writer.write_batch(make_batch(start, num_rows))
+        return writer
+
+    output_dir, staging = tmp_path / "raw", tmp_path / "raw" / ".tmp-overwrite"
+    old = ingest(output_dir, 0, 15).files
+    # The first 10 rows are unchanged, the last file differs
+    ingest(staging, 0, 12)
+    assert sorted(output_dir.glob("part-*.parquet")) == sorted(old)
+
+    added, unchanged, removed = partition_writer.replace_partitions(staging, output_dir)
+
+    assert unchanged == [old[0]]
+    assert removed == [old[1]]
+    assert len(added) == 1
+    assert sorted(output_dir.glob("part-*.parquet")) == sorted(added + unchanged)
+    assert pq.read_table(output_dir).num_rows == 12
+    assert not staging.exists()
+
+
+def test_synthetic_source_is_deterministic_across_batch_sizes():
+    pytest.importorskip("sklearn")
+    options = {"num_rows": 70000, "class_weights": [8, 1, 1], "noise": 0.1, "seed": 3}
+
+    small = pa.Table.from_batches(list(sources.synthetic_source(1000, **options)))
+    large = pa.Table.from_batches(list(sources.synthetic_source(65536, **options)))
+
+    assert small.num_rows == 70000
+    assert small.schema == sources.RAW_SCHEMA
+    assert small.equals(large)
+    counts = pa.compute.value_counts(small.column("target")).to_pylist()
+    share = {c["values"]: c["counts"] / 70000 for c in counts}
+    assert share[0] == pytest.approx(0.8, abs=0.01)
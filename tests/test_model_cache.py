@@ -0,0 +1,69 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+model_cache = importlib.import_module("model_cache")
+
+
+def write_model(path, payload):
+    path.mkdir(parents=True)
+    (path / "MLmodel").write_text("flavors: {}\n")
+    (path / "model.pkl").write_bytes(payload)
+    return path
+
+
+def test_put_get_dedupes_identical_content(tmp_path):
+    cache = model_cache.ModelCache(tmp_path / "cache")
+    source = write_model(tmp_path / "model", b"x" * 100)
+
+    first = cache.put("run-a", "model", source)
+    second = cache.put("run-b", "model", source)
+
+    assert first == second
+    assert first.name == model_cache.tree_digest(source)
+    assert cache.get("run-a", "model") == first
+    assert cache.get("run-a", "compiled_model") is None
+    assert cache.get("run-c", "model") is None
+    assert (first / "model.pkl").read_bytes() == b"x" * 100
+    assert not [p for p in cache.root.iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = model_cache.ModelCache(tmp_path / "cache", max_bytes=250)
+    a = cache.put("run-a", "model", write_model(tmp_path / "a", b"a" * 100))
+    b = cache.put("run-b", "model", write_model(tmp_path / "b", b"b" * 100))
+    os.utime(b, (1, 1))
+    os.utime(a, (2, 2))
+
+    cache.put("run-c", "model", write_model(tmp_path / "c", b"c" * 100))
+
+    assert cache.get("run-b", "model") is None
+    assert cache.get("run-a", "model") == a
+    assert cache.stats()["objects"] == 2
+
+
+def test_load_counts_hits_and_downloads_misses(tmp_path, monkeypatch):
+    pytest.importorskip("mlflow")
+    from mlflow.tracking import MlflowClient
+
+    uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", uri)
+    client = MlflowClient(tracking_uri=uri)
+    run_id = client.create_run("0").info.run_id
+    client.log_artifacts(run_id, str(write_model(tmp_path / "m", b"m" * 10)), "model")
+
+    cache = model_cache.ModelCache(tmp_path / "cache")
+
+    def loader(path):
+        return Path(path, "model.pkl").read_bytes()
+
+    assert cache.load(run_id, "model", loader) == b"m" * 10
+    assert cache.load(run_id, "model", loader) == b"m" * 10
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["objects"]) == (1, 1, 1)
+    assert not [p for p in cache.root.iterdir() if p.name.startswith(".tmp-")]
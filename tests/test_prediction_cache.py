@@ -0,0 +1,67 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+prediction_cache = importlib.import_module("prediction_cache")
+
+
+def test_split_md5_tracks_file_contents(tmp_path):
+    processed_data = importlib.import_module("processed_data")
+    df = pd.DataFrame({"a": [1.0, 2.0], "target": [0, 1]})
+    processed_data.write_split(df, "test", tmp_path / "one")
+    processed_data.write_split(df, "test", tmp_path / "two")
+    processed_data.write_split(df.iloc[::-1], "test", tmp_path / "reversed")
+
+    digest = prediction_cache.split_md5("test", tmp_path / "one")
+
+    assert digest == prediction_cache.split_md5("test", tmp_path / "two")
+    assert digest != prediction_cache.split_md5("test", tmp_path / "reversed")
+    with pytest.raises(FileNotFoundError):
+        prediction_cache.split_md5("train", tmp_path / "one")
+
+
+def test_save_load_and_prune(tmp_path):
+    cache = prediction_cache.PredictionCache(tmp_path, keep=2)
+
+    cache.save("run-1", "abc", y_pred=np.array([0, 1, 2]))
+    cache.save("run-1", "abc", proba=np.eye(3))
+    np.testing.assert_array_equal(cache.load("run-1", "abc"), [0, 1, 2])
+    assert cache.load("run-1", "abc", "proba").shape == (3, 3)
+    assert cache.load("run-1", "other") is None
+
+    os.utime(cache.path("run-1", "abc"), (1, 1))
+    cache.save("run-2", "abc", y_pred=np.array(["x", "y"], dtype=object))
+    cache.save("run-3", "abc", y_pred=np.array([1]))
+
+    assert cache.load("run-1", "abc") is None
+    assert list(cache.load("run-2", "abc")) == ["x", "y"]
+
+
+def test_fetch_falls_back_to_run_artifact(tmp_path, monkeypatch):
+    pytest.importorskip("mlflow")
+    from mlflow.tracking import MlflowClient
+
+    uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", uri)
+    client = MlflowClient(tracking_uri=uri)
+    run_id = client.create_run("0").info.run_id
+    logged = prediction_cache.PredictionCache(tmp_path / "train")
+    logged.save(run_id, "abc", y_pred=np.array([2, 0]), proba=np.eye(2))
+    client.log_artifacts(
+        run_id, str(logged.path(run_id, "abc")), f"{prediction_cache.ARTIFACT_PATH}/abc"
+    )
+
+    cache = prediction_cache.PredictionCache(tmp_path / "evaluate")
+
+    np.testing.assert_array_equal(cache.fetch(run_id, "abc"), [2, 0])
+    np.testing.assert_array_equal(cache.load(run_id, "abc", "proba"), np.eye(2))
+    assert cache.fetch(run_id, "other") is None
+    assert not [p for p in cache.root.iterdir() if p.name.startswith(".tmp-")]
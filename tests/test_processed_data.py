@@ -0,0 +1,116 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+processed_data = importlib.import_module("processed_data")
+
+
+@pytest.fixture
+def split_df():
+    return pd.DataFrame(
+        {
+            "sepal length (cm)": [5.1, 4.9, 6.3],
+            "petal width (cm)": [0.2, 0.2, 1.8],
+            "target": [0, 0, 2],
+        }
+    )
+
+
+def test_feather_round_trip_keeps_schema(tmp_path, split_df):
+    paths = processed_data.write_split(split_df, "train", tmp_path)
+
+    assert paths == [tmp_path / "train.feather"]
+    loaded = processed_data.read_split("train", tmp_path)
+    pd.testing.assert_frame_equal(loaded, split_df)
+
+
+def test_read_split_falls_back_to_csv(tmp_path, split_df):
+    processed_data.write_split(split_df, "test", tmp_path, formats=["csv"])
+
+    assert processed_data.split_path("test", tmp_path) == tmp_path / "test.csv"
+    loaded = processed_data.read_split("test", tmp_path, columns=["target"])
+    assert loaded["target"].tolist() == [0, 0, 2]
+
+
+def test_split_path_prefers_feather(tmp_path, split_df):
+    processed_data.write_split(split_df, "test", tmp_path, formats=["csv", "feather"])
+
+    assert processed_data.split_path("test", tmp_path) == tmp_path / "test.feather"
+
+
+def test_write_split_rejects_unknown_format(tmp_path, split_df):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        processed_data.write_split(split_df, "train", tmp_path, formats=["xlsx"])
+
+
+def test_read_split_rows_slices_the_split(tmp_path, split_df):
+    processed_data.write_split(split_df, "test", tmp_path)
+
+    rows = processed_data.read_split_rows("test", 1, 3, tmp_path)
+
+    assert rows.equals(split_df.iloc[1:3].reset_index(drop=True))
+    assert processed_data.split_num_rows("test", tmp_path) == len(split_df)
+
+
+def test_indexed_split_reads_sorted_rows_from_feature_store(tmp_path, split_df):
+    processed_data.write_split(split_df, processed_data.FEATURE_STORE, tmp_path)
+    processed_data.write_index("test", [2, 0], tmp_path)
+
+    loaded = processed_data.read_split("test", tmp_path)
+
+    assert processed_data.split_path("test", tmp_path).suffix == ".npy"
+    assert loaded["target"].tolist() == [0, 2]
+    assert processed_data.split_num_rows("test", tmp_path) == 2
+
+
+def test_index_writer_appends_chunks(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    with processed_data.IndexWriter("train", tmp_path) as writer:
+        writer.write(np.array([0, 1]))
+        writer.write(np.array([5]))
+
+    loaded = np.load(tmp_path / processed_data.SPLITS_DIR / "train.npy")
+    assert loaded.tolist() == [0, 1, 5]
+    assert not list((tmp_path / processed_data.SPLITS_DIR).glob(".*"))
+
+
+def test_index_writer_rejects_unsorted_chunks(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    with processed_data.IndexWriter("train", tmp_path) as writer:
+        writer.write(np.array([3, 4]))
+        with pytest.raises(ValueError, match="not ascending"):
+            writer.write(np.array([2]))
+
+
+def test_select_rows_slices_each_contiguous_run():
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"x": np.arange(1000)})
+    indices = np.r_[100:300, 500:700]
+
+    selected = processed_data.select_rows(table, indices)
+
+    assert selected.column("x").to_pylist() == indices.tolist()
+    chunks = selected.column("x").chunks
+    assert [(c.offset, len(c)) for c in chunks] == [(100, 200), (500, 200)]
+
+
+def test_select_rows_gathers_short_runs():
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"x": np.arange(1000)})
+    indices = np.arange(0, 1000, 7)
+
+    selected = processed_data.select_rows(table, indices)
+
+    assert selected.column("x").to_pylist() == indices.tolist()
+    assert selected.column("x").num_chunks == 1
@@ -0,0 +1,66 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+promotion = importlib.import_module("promotion")
+
+
+def test_identical_models_are_not_significant():
+    correct = np.random.default_rng(0).random(500) < 0.9
+
+    result = promotion.paired_bootstrap(correct, correct, n_resamples=2000)
+
+    assert result.diff == 0.0
+    assert result.ci_low == result.ci_high == 0.0
+    assert result.p_value == 1.0
+    assert not result.significant(0.05)
+
+
+def test_one_extra_hit_on_a_small_split_is_not_significant():
+    baseline = np.ones(30, dtype=bool)
+    baseline[:2] = False
+    candidate = baseline.copy()
+    candidate[0] = True
+
+    result = promotion.paired_bootstrap(candidate, baseline)
+
+    assert result.diff == pytest.approx(1 / 30)
+    assert result.p_value > 0.05
+    assert not result.significant(0.05)
+
+
+def test_clear_improvement_is_significant_and_seeded():
+    rng = np.random.default_rng(1)
+    baseline = rng.random(2000) < 0.80
+    candidate = baseline | (rng.random(2000) < 0.3)
+
+    result = promotion.paired_bootstrap(candidate, baseline, seed=3)
+
+    assert result.significant(0.01)
+    assert result.ci_low > 0 and result.ci_low < result.diff < result.ci_high
+    assert result == promotion.paired_bootstrap(candidate, baseline, seed=3)
+
+
+def test_multinomial_bootstrap_matches_row_resampling():
+    rng = np.random.default_rng(2)
+    baseline = rng.random(200) < 0.85
+    candidate = np.where(rng.random(200) < 0.1, ~baseline, baseline)
+    diff = candidate.astype(int) - baseline.astype(int)
+    rows = rng.integers(0, 200, size=(20000, 200))
+    reference = diff[rows].mean(axis=1)
+
+    result = promotion.paired_bootstrap(candidate, baseline, n_resamples=20000)
+
+    assert result.ci_low == pytest.approx(np.quantile(reference, 0.025), abs=0.01)
+    assert result.ci_high == pytest.approx(np.quantile(reference, 0.975), abs=0.01)
+
+
+def test_unpaired_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        promotion.paired_bootstrap([1, 0, 1], [1, 0])
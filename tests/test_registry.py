@@ -0,0 +1,120 @@
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("mlflow")
+from mlflow.exceptions import MlflowException  # noqa: E402
+from mlflow.store.entities.paged_list import PagedList  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+registry = importlib.import_module("registry")
+tracking = importlib.import_module("tracking")
+
+
+class FakeRegistryClient:
+    def __init__(self, n_versions=450, filter_run_id=True):
+        self.versions = [
+            SimpleNamespace(name="m", version=str(v), run_id=f"run-{v % 7}", aliases=[])
+            for v in range(1, n_versions + 1)
+        ]
+        self.aliases = {}
+        self.filter_run_id = filter_run_id
+        self.queries = []
+
+    def search_model_versions(self, filter_string, max_results=100, page_token=None):
+        self.queries.append(filter_string)
+        if " and run_id=" in filter_string:
+            if not self.filter_run_id:
+                raise MlflowException("unsupported filter")
+            run_id = filter_string.split("run_id='")[1].rstrip("'")
+            matches = [mv for mv in self.versions if mv.run_id == run_id]
+        else:
+            matches = self.versions
+        start = int(page_token or 0)
+        end = start + max_results
+        return PagedList(matches[start:end], str(end) if end < len(matches) else None)
+
+    def get_model_version(self, name, version):
+        for mv in self.versions:
+            if mv.version == str(version):
+                return mv
+        raise MlflowException("not found")
+
+    def get_model_version_by_alias(self, name, alias):
+        if alias not in self.aliases:
+            raise MlflowException("alias not found")
+        return self.get_model_version(name, self.aliases[alias])
+
+    def get_run(self, run_id):
+        data = SimpleNamespace(
+            params={"n_estimators": "100"},
+            metrics={"test_accuracy": 0.9},
+            tags={"git_commit": "abc"},
+        )
+        return SimpleNamespace(data=data, info=SimpleNamespace(run_id=run_id))
+
+    def set_registered_model_alias(self, name, alias, version):
+        self.aliases[alias] = str(version)
+
+
+def test_version_for_run_is_filtered_on_the_server():
+    client = tracking.CountingClient(FakeRegistryClient())
+    models = registry.ModelRegistry(client)
+
+    assert models.version_for_run("m", "run-3") == 444
+    assert client.round_trips == {"search_model_versions": 1}
+    assert client._client.queries == ["name='m' and run_id='run-3'"]
+
+
+def test_version_for_run_falls_back_to_paginated_scan():
+    client = tracking.CountingClient(FakeRegistryClient(filter_run_id=False))
+    models = registry.ModelRegistry(client)
+
+    assert models.version_for_run("m", "run-3") == 444
+    # one rejected filtered query, then 3 pages of 200
+    assert client.round_trips == {"search_model_versions": 4}
+    with pytest.raises(RuntimeError):
+        models.version_for_run("m", "run-unknown")
+
+
+def test_alias_lookups_are_cached_until_ttl_expires():
+    now = [0.0]
+    client = tracking.CountingClient(FakeRegistryClient())
+    client._client.aliases["production"] = "5"
+    models = registry.ModelRegistry(client, ttl=60, clock=lambda: now[0])
+
+    first = models.get_alias("m", "production")
+    second = models.get_alias("m", "production")
+    assert first == second
+    assert first.version == 5 and first.metrics["test_accuracy"] == 0.9
+    assert client.total_round_trips == 2
+
+    now[0] = 61
+    models.get_alias("m", "production")
+    assert client.total_round_trips == 4
+    assert models.get_alias("m", "staging") is None
+
+
+def test_set_alias_writes_through_and_cache_is_shared(tmp_path):
+    client = tracking.CountingClient(FakeRegistryClient())
+    client._client.aliases["production"] = "5"
+    cache_path = tmp_path / "registry.json"
+    models = registry.ModelRegistry(client, cache_path=cache_path)
+    models.get_alias("m", "production")
+
+    models.set_alias("m", "production", 7)
+    assert models.get_alias("m", "production").version == 7
+
+    other = registry.ModelRegistry(client, cache_path=cache_path)
+    before = client.total_round_trips
+    info = other.resolve("m", "production")
+    assert info.version == 7 and info.run_id == "run-0"
+    assert other.resolve("m", "5").aliases == ()
+    assert client.total_round_trips == before
+    with pytest.raises(LookupError):
+        other.resolve("m", "9999")
@@ -0,0 +1,72 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+parallel = importlib.import_module("parallel")
+resources = importlib.import_module("resources")
+
+
+def test_cgroup_v2_quota(tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert parallel.cgroup_cpu_limit(tmp_path) == 1.5
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert parallel.cgroup_cpu_limit(tmp_path) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    cpu = tmp_path / "cpu,cpuacct"
+    cpu.mkdir()
+    (cpu / "cpu.cfs_quota_us").write_text("200000\n")
+    (cpu / "cpu.cfs_period_us").write_text("100000\n")
+    assert parallel.cgroup_cpu_limit(tmp_path) == 2.0
+
+    (cpu / "cpu.cfs_quota_us").write_text("-1\n")
+    assert parallel.cgroup_cpu_limit(tmp_path) is None
+
+
+def test_available_cpus_is_capped_by_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, "affinity_cpus", lambda: 8)
+    assert parallel.available_cpus(tmp_path) == 8
+
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert parallel.available_cpus(tmp_path) == 3
+
+    (tmp_path / "cpu.max").write_text("10000 100000\n")
+    assert parallel.available_cpus(tmp_path) == 1
+
+
+def test_plan_splits_cpus_between_sweep_and_fit():
+    single = resources.plan_resources({"n_jobs": 8}, n_candidates=1)
+    assert (single.sweep_workers, single.fit_jobs) == (1, 8)
+    assert single.backend == "threading"
+
+    sweep = resources.plan_resources({"n_jobs": 8, "backend": "loky"}, 12, 3)
+    assert (sweep.sweep_workers, sweep.fit_jobs, sweep.backend) == (3, 2, "loky")
+
+    with pytest.raises(ValueError):
+        resources.plan_resources({"backend": "dask"}, 1)
+    with pytest.raises(ValueError):
+        resources.plan_resources({"backend": "auto"}, 1)
+
+
+def test_scaling_curve_rows():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(100, 3))
+    y = (X[:, 0] > 0).astype(int)
+
+    rows = resources.scaling_curve(
+        {"n_estimators": 4, "random_state": 0}, X, y, max_workers=2, repeats=1
+    )
+
+    assert [row["workers"] for row in rows] == [1, 2]
+    assert rows[0]["speedup"] == 1.0 and rows[0]["efficiency"] == 1.0
+    assert rows[1]["efficiency"] == pytest.approx(rows[1]["speedup"] / 2, abs=1e-3)
@@ -0,0 +1,95 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("joblib")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+result_cache = importlib.import_module("result_cache")
+
+
+def test_key_changes_with_data_params_and_code(tmp_path):
+    code = tmp_path / "train.py"
+    code.write_text("print('v1')")
+    params = [{"n_estimators": 10, "max_depth": None}]
+
+    v1 = result_cache.code_hash([code])
+    key = result_cache.cache_key("abc", params, v1)
+
+    assert key == result_cache.cache_key("abc", [dict(params[0])], v1)
+    assert key != result_cache.cache_key("abd", params, v1)
+    assert key != result_cache.cache_key("abc", [{"n_estimators": 11}], v1)
+    assert key != result_cache.cache_key("abc", params, v1, {"compaction": {}})
+    code.write_text("print('v2')")
+    assert key != result_cache.cache_key("abc", params, result_cache.code_hash([code]))
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = result_cache.ResultCache(tmp_path, max_bytes=1 << 20)
+
+    cache.put("k1", {"weights": [1, 2, 3]}, {"run_id": "r1", "version": 4})
+
+    assert cache.get("k1") == {"run_id": "r1", "version": 4}
+    assert cache.load_model("k1") == {"weights": [1, 2, 3]}
+    assert cache.get("missing") is None
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    payload = b"x" * 4000
+    cache = result_cache.ResultCache(tmp_path, max_bytes=1 << 20)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, payload, {"run_id": key})
+        os.utime(tmp_path / key, (i, i))
+
+    # Reading "a" makes it the most recently used entry
+    assert cache.get("a") is not None
+    cache.max_bytes = 2 * result_cache._dir_size(tmp_path / "a") + 10
+    cache.evict()
+
+    assert sorted(p.name for p in cache.entries()) == ["a", "c"]
+    assert cache.size() <= cache.max_bytes
+
+
+def test_find_warm_start_picks_largest_compatible_forest(tmp_path):
+    cache = result_cache.ResultCache(tmp_path, max_bytes=1 << 20)
+    base = {"max_depth": 5, "random_state": 0}
+
+    def put(key, n, data="d1", code="c1", **params):
+        entry = {"params": {**base, **params, "n_estimators": n}}
+        cache.put(key, None, {**entry, "data_version": data, "code_hash": code})
+
+    put("small", 50)
+    put("large", 100)
+    put("too-big", 400)
+    put("other-data", 200, data="d2")
+    put("other-code", 200, code="c2")
+    put("other-depth", 200, max_depth=8)
+
+    match = cache.find_warm_start("d1", "c1", {**base, "n_estimators": 300})
+
+    assert match[0] == "large"
+    assert cache.find_warm_start("d1", "c1", {**base, "n_estimators": 50}) is None
+
+
+def test_find_warm_start_uses_fitted_size_of_compacted_forests(tmp_path):
+    cache = result_cache.ResultCache(tmp_path, max_bytes=1 << 20)
+    result = {
+        "params": {"max_depth": 5, "n_estimators": 20},
+        "fitted_params": {"max_depth": 5, "n_estimators": 150},
+        "data_version": "d1",
+        "code_hash": "c1",
+    }
+    cache.put("compacted", None, result)
+
+    match = cache.find_warm_start("d1", "c1", {"max_depth": 5, "n_estimators": 200})
+
+    assert match[0] == "compacted"
+    assert result_cache.fitted_params(match[1])["n_estimators"] == 150
+    assert (
+        cache.find_warm_start("d1", "c1", {"max_depth": 5, "n_estimators": 100}) is None
+    )
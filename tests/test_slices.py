@@ -0,0 +1,101 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+metrics = pytest.importorskip("sklearn.metrics")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "evaluate"))
+slices = importlib.import_module("slices")
+
+
+def sklearn_metrics(y_true, y_pred):
+    precision, recall, f1, _ = metrics.precision_recall_fscore_support(
+        y_true, y_pred, average="weighted", zero_division=0
+    )
+    return {
+        "accuracy": float(metrics.accuracy_score(y_true, y_pred)),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+
+def make_rows(seed, n=400):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "length": rng.normal(size=n),
+            "site": rng.choice(["north", "south", None], n),
+            "bin": rng.integers(0, 3, n),
+        }
+    )
+    y_true = rng.integers(0, 3, n)
+    y_pred = np.where(rng.random(n) < 0.7, y_true, rng.integers(0, 4, n))
+    return df, y_true, y_pred
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_every_slice_matches_sklearn_on_its_rows(seed):
+    df, y_true, y_pred = make_rows(seed)
+    codes = {c: slices.encode_column(df[c], bins=4) for c in df.columns}
+
+    report = slices.slice_metrics(df, y_true, y_pred, crosses=True, min_support=1)
+
+    assert report["labels"] == [0, 1, 2, 3]
+    assert len(report["slices"]) == report["n_slices"]
+    for entry in report["slices"]:
+        mask = np.ones(len(df), dtype=bool)
+        for column, name in entry["slice"].items():
+            column_codes, names = codes[column]
+            mask &= column_codes == names.index(name)
+        assert entry["support"] == mask.sum()
+        expected = sklearn_metrics(y_true[mask], y_pred[mask])
+        assert {k: entry[k] for k in expected} == expected
+    accuracies = [entry["accuracy"] for entry in report["slices"]]
+    assert accuracies == sorted(accuracies)
+
+
+def test_buckets_nulls_and_min_support():
+    df = pd.DataFrame({"x": [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, np.nan, 7.0]})
+    y = np.zeros(len(df), dtype=int)
+
+    codes, names = slices.encode_column(df["x"], bins=2)
+    report = slices.slice_metrics(df, y, y, bins=2, min_support=2)
+
+    assert names == ["[0, 3)", "[3, 7]", "null"]
+    assert codes.tolist() == [0, 0, 0, 1, 1, 1, 2, 1]
+    # Equal accuracy: larger slices first
+    assert [e["slice"]["x"] for e in report["slices"]] == ["[3, 7]", "[0, 3)"]
+    assert report["n_slices"] == 3
+
+
+def test_columns_without_finite_values():
+    codes, names = slices._quantile_buckets(np.full(10, np.nan), 4)
+    assert names == ["null"]
+    assert codes.tolist() == [0] * 10
+
+    values = np.array([np.inf, 1.0, np.nan, -np.inf, 1.0])
+    codes, names = slices._quantile_buckets(values, 2)
+    assert names == ["[1, 1]", "null"]
+    assert codes.tolist() == [0, 0, 1, 0, 0]
+
+    df = pd.DataFrame({"x": np.arange(8.0), "empty": np.full(8, np.nan)})
+    y = np.zeros(len(df), dtype=int)
+    report = slices.slice_metrics(df, y, y, bins=2, min_support=1)
+
+    assert report["columns"] == ["x"]
+    assert report["skipped_columns"] == ["empty"]
+    assert all(list(entry["slice"]) == ["x"] for entry in report["slices"])
+
+
+def test_rejects_unknown_columns_and_misaligned_rows():
+    df, y_true, y_pred = make_rows(0, n=10)
+    with pytest.raises(ValueError):
+        slices.slice_metrics(df, y_true, y_pred, columns=["missing"])
+    with pytest.raises(ValueError):
+        slices.slice_metrics(df, y_true[:5], y_pred)
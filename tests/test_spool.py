@@ -0,0 +1,122 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mlflow")
+from mlflow.entities import Metric  # noqa: E402
+from mlflow.tracking import MlflowClient  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+spool = importlib.import_module("spool")
+
+
+def file_client(path):
+    uri = path.resolve().as_uri()
+    return MlflowClient(tracking_uri=uri, registry_uri=uri)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    local = file_client(tmp_path / "spool" / "mlruns")
+    remote = file_client(tmp_path / "remote")
+    ledger = spool.SyncLedger(tmp_path / "spool" / spool.LEDGER_FILE)
+    return local, remote, ledger
+
+
+def log_offline_runs(local, tmp_path):
+    parent = local.create_run("0", run_name="train").info.run_id
+    child = local.create_run(
+        "0", tags={spool.PARENT_TAG: parent}, run_name="candidate-0"
+    ).info.run_id
+    local.log_batch(
+        parent,
+        metrics=[
+            Metric("loss", value, 1000 + step, step)
+            for step, value in enumerate([0.9, 0.5, 0.2])
+        ],
+        params=[],
+        tags=[],
+    )
+    local.log_param(parent, "n_estimators", "100")
+    local.set_tag(parent, "sweep_best_run_id", child)
+    local.log_metric(child, "test_accuracy", 0.9)
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "MLmodel").write_text("flavors: {}\n")
+    local.log_artifacts(parent, str(model_dir), "model")
+    for run_id in (child, parent):
+        local.set_terminated(run_id)
+
+    local.create_registered_model("iris-classifier")
+    source = f"{local.get_run(parent).info.artifact_uri}/model"
+    local.create_model_version("iris-classifier", source, run_id=parent)
+    local.set_registered_model_alias("iris-classifier", "production", "1")
+    return parent, child
+
+
+def test_sync_replays_runs_history_artifacts_and_versions(stores, tmp_path):
+    local, remote, ledger = stores
+    parent, child = log_offline_runs(local, tmp_path)
+    local.create_run("0", run_name="still-running")
+
+    report = spool.sync(local, remote, ledger, max_workers=2)
+
+    assert (report.runs_created, report.runs_synced) == (2, 2)
+    assert len(report.skipped) == 1
+    remote_parent = remote.get_run(ledger.remote_run(parent))
+    remote_child = remote.get_run(ledger.remote_run(child))
+    assert remote_parent.data.params == {"n_estimators": "100"}
+    assert remote_parent.data.tags["sweep_best_run_id"] == remote_child.info.run_id
+    assert remote_child.data.tags[spool.PARENT_TAG] == remote_parent.info.run_id
+    assert remote_child.data.tags[spool.SOURCE_TAG] == child
+    history = remote.get_metric_history(remote_parent.info.run_id, "loss")
+    assert [m.value for m in sorted(history, key=lambda m: m.step)] == [0.9, 0.5, 0.2]
+    assert remote_parent.info.status == "FINISHED"
+    assert [f.path for f in remote.list_artifacts(remote_parent.info.run_id)] == [
+        "model"
+    ]
+
+    (version,) = remote.search_model_versions("name='iris-classifier'")
+    assert version.run_id == remote_parent.info.run_id
+    assert version.source.startswith(remote_parent.info.artifact_uri)
+    # Aliases set offline are only copied on request
+    assert remote.get_registered_model("iris-classifier").aliases == {}
+
+
+def test_sync_is_idempotent_and_recovers_lost_ledger(stores, tmp_path):
+    local, remote, ledger = stores
+    parent, _ = log_offline_runs(local, tmp_path)
+    spool.sync(local, remote, ledger)
+
+    again = spool.sync(local, remote, ledger, aliases=True)
+    assert (again.runs_created, again.runs_synced, again.versions_created) == (0, 0, 0)
+    assert again.aliases_set == 1
+    assert remote.get_registered_model("iris-classifier").aliases == {"production": "1"}
+
+    # A fresh ledger finds the runs by their source tag instead of duplicating
+    lost = spool.SyncLedger(tmp_path / "lost.json")
+    recovered = spool.sync(local, remote, lost)
+    assert recovered.runs_created == 0
+    assert lost.remote_run(parent) == ledger.remote_run(parent)
+    assert len(remote.search_runs(["0"])) == 2
+    history = remote.get_metric_history(lost.remote_run(parent), "loss")
+    assert len(history) == 3
+    assert len(remote.search_model_versions("name='iris-classifier'")) == 1
+
+
+def test_configure_only_switches_when_offline(tmp_path, monkeypatch):
+    monkeypatch.delenv(spool.OFFLINE_ENV, raising=False)
+    assert spool.configure(tmp_path) is False
+
+    uris = []
+    monkeypatch.setattr(spool.mlflow, "set_tracking_uri", uris.append)
+    monkeypatch.setattr(spool.mlflow, "set_registry_uri", uris.append)
+    monkeypatch.setenv(spool.OFFLINE_ENV, "1")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", "https://example.invalid")
+    assert spool.configure(tmp_path) is True
+    assert uris == [spool.tracking_uri(tmp_path)] * 2
+    # Inherited by worker processes and clients created later
+    assert MlflowClient().tracking_uri == spool.tracking_uri(tmp_path)
@@ -0,0 +1,138 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "preprocess"))
+streaming_split = importlib.import_module("streaming_split")
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    rng = np.random.default_rng(0)
+    for part in range(2):
+        n = 300
+        table = pa.table(
+            {
+                "x": rng.normal(size=n),
+                "target": np.repeat([0, 1, 2], n // 3),
+                "target_name": ["c"] * n,
+            }
+        )
+        pq.write_table(table, raw / f"part-{part:05d}.parquet", row_group_size=100)
+    return raw
+
+
+def test_stratified_test_mask_honours_class_quotas():
+    y = np.array([0] * 50 + [1] * 30 + [2] * 20)
+    hashes = streaming_split.row_hashes(seed=7, row_offset=0, num_rows=len(y))
+
+    mask = streaming_split.stratified_test_mask(y, hashes, test_size=0.2)
+
+    assert np.bincount(y[mask]).tolist() == [10, 6, 4]
+
+
+def test_quotas_carry_across_tiny_row_groups(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    # Two rows per row group: per-group rounding would put no row in test
+    y = np.repeat([0, 1, 2], 200)
+    table = pa.table({"x": np.arange(len(y), dtype=np.float64), "target": y})
+    pq.write_table(table, raw / "part-00000.parquet", row_group_size=2)
+
+    counts = streaming_split.streaming_split(raw, tmp_path / "out", 0.2, 42)
+
+    assert counts == (480, 120)
+    test = pa.ipc.open_file(tmp_path / "out" / "test.feather").read_all()
+    assert np.bincount(test.column("target").to_numpy()).tolist() == [40, 40, 40]
+
+
+def test_class_quotas_round_the_running_total():
+    quotas = streaming_split.ClassQuotas(0.2)
+
+    taken = [quotas.take(np.array([0]), np.array([2]))[0] for _ in range(10)]
+
+    assert taken == [0, 1, 0, 1, 0, 0, 1, 0, 1, 0]
+    assert sum(taken) == 4
+
+
+def test_row_hashes_depend_only_on_seed_and_position():
+    full = streaming_split.row_hashes(seed=42, row_offset=0, num_rows=10)
+    tail = streaming_split.row_hashes(seed=42, row_offset=6, num_rows=4)
+
+    np.testing.assert_array_equal(full[6:], tail)
+    assert not np.array_equal(full, streaming_split.row_hashes(43, 0, 10))
+
+
+def test_streaming_split_is_reproducible_across_n_jobs(raw_dir, tmp_path):
+    out_serial = tmp_path / "serial"
+    out_parallel = tmp_path / "parallel"
+
+    counts = streaming_split.streaming_split(raw_dir, out_serial, 0.2, 42, n_jobs=1)
+    streaming_split.streaming_split(raw_dir, out_parallel, 0.2, 42, n_jobs=2)
+
+    assert counts == (480, 120)
+    serial = pa.ipc.open_file(out_serial / "test.feather").read_all()
+    parallel = pa.ipc.open_file(out_parallel / "test.feather").read_all()
+    assert serial.equals(parallel)
+    assert "target_name" in serial.column_names
+    assert np.bincount(serial.column("target").to_numpy()).tolist() == [40, 40, 40]
+
+
+def test_incremental_split_only_processes_new_partitions(raw_dir, tmp_path):
+    processed_data = importlib.import_module("processed_data")
+    out = tmp_path / "processed"
+
+    first = streaming_split.incremental_split(raw_dir, out, 0.2, 42)
+    second = streaming_split.incremental_split(raw_dir, out, 0.2, 42)
+
+    assert first["new_partitions"] == 2
+    assert second["new_partitions"] == 0
+    assert second["cached_partitions"] == 2
+
+    extra = pq.read_table(raw_dir / "part-00000.parquet").slice(0, 30)
+    pq.write_table(extra, raw_dir / "part-00002.parquet")
+    (raw_dir / "part-00001.parquet").unlink()
+
+    third = streaming_split.incremental_split(raw_dir, out, 0.2, 42)
+
+    assert third["new_partitions"] == 1
+    assert third["removed_partitions"] == 1
+    assert len(processed_data.read_split("test", out)) == 60 + 6
+
+
+def test_incremental_split_resplits_when_params_change(raw_dir, tmp_path):
+    out = tmp_path / "processed"
+    streaming_split.incremental_split(raw_dir, out, 0.2, 42)
+
+    summary = streaming_split.incremental_split(raw_dir, out, 0.3, 42)
+
+    assert summary["new_partitions"] == 2
+    assert summary["new_test_rows"] == 180
+
+
+def test_indexed_layout_matches_materialized_split(raw_dir, tmp_path):
+    processed_data = importlib.import_module("processed_data")
+    materialized = tmp_path / "materialized"
+    indexed = tmp_path / "indexed"
+
+    streaming_split.streaming_split(raw_dir, materialized, 0.2, 42)
+    counts = streaming_split.streaming_split(
+        raw_dir, indexed, 0.2, 42, layout="indexed"
+    )
+
+    assert counts == (480, 120)
+    assert not (indexed / "test.feather").exists()
+    for name in ("train", "test"):
+        expected = processed_data.read_split(name, materialized)
+        actual = processed_data.read_split(name, indexed)
+        assert expected.equals(actual)
@@ -0,0 +1,195 @@
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("mlflow")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+sweep = importlib.import_module("sweep")
+
+BASE = {"n_estimators": 10, "max_depth": 5, "random_state": 0}
+
+
+def test_no_sweep_yields_base_params():
+    assert sweep.expand_candidates(BASE, None) == [BASE]
+    assert sweep.expand_candidates(BASE, {"strategy": "none", "search": {}}) == [BASE]
+
+
+def test_grid_expands_every_combination():
+    spec = {
+        "strategy": "grid",
+        "search": {"max_depth": [2, None], "n_estimators": [5, 10, 20]},
+    }
+
+    candidates = sweep.expand_candidates(BASE, spec)
+
+    assert len(candidates) == 6
+    assert {(c["max_depth"], c["n_estimators"]) for c in candidates} == {
+        (d, n) for d in (2, None) for n in (5, 10, 20)
+    }
+    assert all(c["random_state"] == 0 for c in candidates)
+
+
+def test_random_search_is_seeded_and_respects_ranges():
+    spec = {
+        "strategy": "random",
+        "n_trials": 8,
+        "seed": 1,
+        "search": {"max_depth": {"low": 2, "high": 4}, "max_features": [0.5, 1.0]},
+    }
+
+    candidates = sweep.expand_candidates(BASE, spec)
+
+    assert candidates == sweep.expand_candidates(BASE, spec)
+    assert len(candidates) == 8
+    assert all(2 <= c["max_depth"] <= 4 for c in candidates)
+    assert all(c["max_features"] in (0.5, 1.0) for c in candidates)
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown sweep strategy"):
+        sweep.expand_candidates(BASE, {"strategy": "bayes"})
+
+
+def test_sweep_picks_best_candidate_in_parallel():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=["a", "b", "c"])
+    y = (X["a"] + 0.5 * X["b"] > 0).astype(int)
+    candidates = sweep.expand_candidates(
+        BASE, {"strategy": "grid", "search": {"max_depth": [1, 4]}}
+    )
+
+    args = (candidates, X[:150], y[:150], X[150:], y[150:])
+    best, model, results = sweep.run_sweep(*args, n_jobs=1)
+    parallel_best, _, parallel_results = sweep.run_sweep(*args, n_jobs=2)
+
+    assert [r.validation_accuracy for r in results] == [
+        r.validation_accuracy for r in parallel_results
+    ]
+    assert best.index == parallel_best.index
+    # Ranked on validation rows; only the refitted winner sees the test split
+    assert all(r.test_accuracy is None for r in results)
+    assert best.validation_accuracy == max(r.validation_accuracy for r in results)
+    assert model.score(X[150:], y[150:]) == pytest.approx(best.test_accuracy)
+    assert model.max_depth == candidates[best.index]["max_depth"]
+    assert list(model.feature_names_in_) == ["a", "b", "c"]
+    refit = sweep.RandomForestClassifier(**candidates[best.index]).fit(X[:150], y[:150])
+    np.testing.assert_array_equal(model.predict_proba(X), refit.predict_proba(X))
+
+
+def test_final_refit_gets_every_cpu(monkeypatch):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(100, 2)), columns=["a", "b"])
+    y = (X["a"] > 0).astype(int)
+    candidates = sweep.expand_candidates(
+        BASE, {"strategy": "grid", "search": {"max_depth": [1, 4]}}
+    )
+    fit_candidate, jobs = sweep.fit_candidate, []
+
+    def recording_fit(task):
+        jobs.append((task.validate, task.fit_jobs))
+        return fit_candidate(task)
+
+    monkeypatch.setattr(sweep, "fit_candidate", recording_fit)
+    sweep.run_sweep(
+        candidates, X[:80], y[:80], X[80:], y[80:], n_jobs=1, fit_jobs=2, refit_jobs=4
+    )
+
+    assert jobs == [(True, 2), (True, 2), (False, 4)]
+
+
+def test_sweep_logs_candidates_through_the_given_client():
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        def create_run(self, experiment_id, run_name, tags):
+            self.calls.append(("create_run", run_name, tags["mlflow.parentRunId"]))
+            return SimpleNamespace(info=SimpleNamespace(run_id=run_name))
+
+        def log_batch(self, run_id, metrics, params, tags):
+            self.calls.append(("log_batch", run_id, sorted(m.key for m in metrics)))
+
+        def set_terminated(self, run_id):
+            self.calls.append(("set_terminated", run_id))
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(100, 2)), columns=["a", "b"])
+    y = (X["a"] > 0).astype(int)
+    candidates = sweep.expand_candidates(
+        BASE, {"strategy": "grid", "search": {"max_depth": [1, 3]}}
+    )
+    client = Client()
+
+    best, _, results = sweep.run_sweep(
+        candidates,
+        X[:80],
+        y[:80],
+        X[80:],
+        y[80:],
+        n_jobs=1,
+        experiment_id="0",
+        parent_run_id="parent",
+        client=client,
+    )
+
+    assert [r.run_id for r in results] == ["candidate-0000", "candidate-0001"]
+    assert best.run_id == results[best.index].run_id
+    assert client.calls[:3] == [
+        ("create_run", "candidate-0000", "parent"),
+        ("log_batch", "candidate-0000", ["train_accuracy", "validation_accuracy"]),
+        ("set_terminated", "candidate-0000"),
+    ]
+
+
+def test_warm_start_grows_forest_equal_to_fresh_fit(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=["a", "b", "c"])
+    y = (X["a"] + 0.5 * X["b"] > 0).astype(int)
+    args = (X[:150], y[:150], X[150:], y[150:])
+
+    _, small, _ = sweep.run_sweep([BASE], *args, n_jobs=1)
+    init_model = tmp_path / "small.joblib"
+    sweep.joblib.dump(small, init_model)
+    grown_params = {**BASE, "n_estimators": 25}
+
+    best, grown, _ = sweep.run_sweep(
+        [grown_params], *args, n_jobs=1, init_model=str(init_model)
+    )
+    _, fresh, _ = sweep.run_sweep([grown_params], *args, n_jobs=1)
+
+    assert best.warm_started
+    assert len(grown.estimators_) == 25
+    assert not grown.warm_start
+    np.testing.assert_array_equal(
+        grown.predict_proba(X[150:]), fresh.predict_proba(X[150:])
+    )
+
+
+def test_warm_start_falls_back_on_param_mismatch(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(100, 2)), columns=["a", "b"])
+    y = (X["a"] > 0).astype(int)
+    args = (X[:80], y[:80], X[80:], y[80:])
+
+    _, small, _ = sweep.run_sweep([BASE], *args, n_jobs=1)
+    init_model = tmp_path / "small.joblib"
+    sweep.joblib.dump(small, init_model)
+
+    best, model, _ = sweep.run_sweep(
+        [{**BASE, "n_estimators": 20, "max_depth": 2}],
+        *args,
+        n_jobs=1,
+        init_model=str(init_model),
+    )
+
+    assert not best.warm_started
+    assert model.max_depth == 2 and len(model.estimators_) == 20
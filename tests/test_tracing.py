@@ -0,0 +1,109 @@
+import importlib
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+tracing = importlib.import_module("tracing")
+
+
+class FakeClient:
+    tracking_uri = "file:///tmp"
+
+    def get_run(self, run_id):
+        return run_id
+
+
+def test_spans_nest_aggregate_and_trace_client_calls():
+    tracer = tracing.Tracer("train")
+    client = tracing.TracedClient(FakeClient(), tracer)
+
+    with tracer.span("fit"):
+        for _ in range(3):
+            with tracer.span("tree"):
+                pass
+        assert client.get_run("r1") == "r1"
+    with tracer.span("promotion"):
+        client.get_run("r2")
+    assert client.tracking_uri == "file:///tmp"
+
+    trace = tracer.to_dict()
+    fit, promotion = trace["spans"]
+    assert [fit["name"], promotion["name"]] == ["fit", "promotion"]
+    assert [c["name"] for c in fit["children"]] == ["tree", "mlflow.get_run"]
+    assert fit["children"][0]["calls"] == 3
+    assert fit["wall_s"] >= fit["children"][0]["wall_s"]
+    assert trace["mlflow_calls"] == 2
+
+    metrics = tracer.summary_metrics()
+    assert set(metrics) == {
+        "trace_fit_s",
+        "trace_promotion_s",
+        "trace_total_s",
+        "trace_mlflow_calls",
+        "trace_mlflow_s",
+    }
+
+
+def test_helper_thread_spans_are_grouped_under_background():
+    tracer = tracing.Tracer("train")
+
+    def upload():
+        with tracer.span("mlflow.log_artifact"):
+            pass
+
+    with tracer.span("fit"):
+        workers = [threading.Thread(target=upload) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    fit, background = tracer.to_dict()["spans"]
+    assert fit["children"] == []
+    assert background["name"] == tracing.BACKGROUND
+    assert background["children"][0]["calls"] == 2
+    assert "trace_background_s" not in tracer.summary_metrics()
+
+
+def test_write_merges_stages_into_one_file(tmp_path):
+    path = tmp_path / "stage_trace.json"
+    train = tracing.start("train")
+    with tracing.span("fit"):
+        pass
+    train.write(path)
+
+    evaluate = tracing.start("evaluate")
+    assert tracing.current() is evaluate
+    with tracing.span("predict"):
+        pass
+    evaluate.write(path)
+
+    traces = json.loads(path.read_text())
+    assert set(traces) == {"train", "evaluate"}
+    assert traces["train"]["spans"][0]["name"] == "fit"
+    assert traces["evaluate"]["spans"][0]["name"] == "predict"
+
+
+def test_start_run_traces_create_and_end_requests(tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", (tmp_path / "mlruns").as_uri())
+    tracer = tracing.start("train")
+
+    with tracing.start_run(run_name="ok") as run:
+        pass
+    with pytest.raises(RuntimeError):
+        with tracing.start_run(run_name="broken") as broken:
+            raise RuntimeError("fit failed")
+
+    client = mlflow.tracking.MlflowClient()
+    assert client.get_run(run.info.run_id).info.status == "FINISHED"
+    assert client.get_run(broken.info.run_id).info.status == "FAILED"
+    assert mlflow.active_run() is None
+    spans = {span["name"]: span for span in tracer.to_dict()["spans"]}
+    assert spans["mlflow.start_run"]["calls"] == 2
+    assert spans["mlflow.end_run"]["calls"] == 2
@@ -0,0 +1,108 @@
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mlflow")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "train"))
+tracking = importlib.import_module("tracking")
+
+
+class FakeClient:
+    def __init__(self):
+        self.batches = []
+        self.version_tags = {}
+
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        self.batches.append((run_id, list(metrics), list(params), list(tags)))
+
+    def set_model_version_tag(self, name, version, key, value):
+        self.version_tags[(name, version, key)] = value
+
+
+def test_batch_logger_flushes_in_one_request():
+    client = tracking.CountingClient(FakeClient())
+
+    with tracking.BatchLogger(client, "run-1") as batch:
+        batch.set_tags({f"tag_{i}": i for i in range(5)})
+        batch.log_params({"a": 1, "b": None})
+        batch.log_metrics({"acc": 0.9})
+
+    assert client.round_trips == {"log_batch": 1}
+    (run_id, metrics, params, tags) = client._client.batches[0]
+    assert run_id == "run-1"
+    assert [(p.key, p.value) for p in params] == [("a", "1"), ("b", "None")]
+    assert len(tags) == 5
+    assert metrics[0].value == 0.9
+
+
+def test_batch_logger_respects_flush_size_and_api_limits():
+    client = FakeClient()
+
+    batch = tracking.BatchLogger(client, "run", flush_size=10)
+    batch.log_params({f"p{i}": i for i in range(25)})
+    assert [len(b[2]) for b in client.batches] == [10, 10]
+    batch.flush()
+    assert batch.batches == 3
+
+    big = tracking.BatchLogger(client, "run", flush_size=5000)
+    assert big.flush_size == tracking.MAX_BATCH_ENTITIES
+    big.set_tags({f"t{i}": i for i in range(250)})
+    big.flush()
+    assert [len(b[3]) for b in client.batches[3:]] == [100, 100, 50]
+
+
+def test_model_version_tags_are_counted_and_set():
+    client = tracking.CountingClient(FakeClient())
+
+    tracking.set_model_version_tags(
+        client, "model", 3, {f"k{i}": str(i) for i in range(6)}, max_workers=3
+    )
+
+    assert client.total_round_trips == 6
+    assert client._client.version_tags[("model", "3", "k5")] == "5"
+
+
+class SlowClient:
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.uploaded = []
+
+    def log_artifact(self, run_id, local_path, artifact_path=None):
+        time.sleep(self.delay)
+        if artifact_path in self.fail:
+            raise OSError(f"upload of {artifact_path} refused")
+        self.uploaded.append((run_id, artifact_path))
+
+
+def test_uploader_runs_uploads_concurrently(tmp_path):
+    client = SlowClient(delay=0.2)
+
+    started = time.monotonic()
+    with tracking.BackgroundUploader(client, max_workers=4) as uploader:
+        for name in ("a", "b", "c", "d"):
+            uploader.log_artifact("run", tmp_path, name)
+
+    assert time.monotonic() - started < 0.6
+    assert sorted(client.uploaded) == [("run", n) for n in "abcd"]
+
+
+def test_uploader_flush_reports_failures_and_timeouts(tmp_path):
+    uploader = tracking.BackgroundUploader(SlowClient(fail={"bad"}), max_workers=2)
+    uploader.log_artifact("run", tmp_path, "good")
+    uploader.log_artifact("run", tmp_path, "bad")
+    with pytest.raises(tracking.UploadError, match="refused"):
+        uploader.flush()
+    uploader.close()
+
+    slow = tracking.BackgroundUploader(SlowClient(delay=0.5), timeout=0.05)
+    slow.log_artifact("run", tmp_path, "late")
+    with pytest.raises(tracking.UploadError, match="not finished"):
+        slow.flush()
+    slow.close()
@@ -0,0 +1,61 @@
+import pytest
+
+
+def production_and_staging(pipeline):
+    client = pipeline.client
+    return tuple(
+        int(client.get_model_version_by_alias(pipeline.model_name, alias).version)
+        for alias in ("production", "staging")
+    )
+
+
+def test_main_promotes_then_stages_then_reuses_the_run(pipeline):
+    first = pipeline.train()
+
+    assert first["version"] == 1
+    assert first["promoted_to_production"] is True
+    assert "warm_start" not in first
+
+    # Stumps are clearly worse on iris, so they stay in staging
+    second = pipeline.train(max_depth=1)
+
+    assert second["version"] == 2
+    assert second["run_id"] != first["run_id"]
+    assert second["promoted_to_production"] is False
+    assert second["promotion_test"]["diff"] < 0
+    assert production_and_staging(pipeline) == (1, 2)
+    runs = pipeline.client.search_runs(["0"])
+
+    # Same data, params and code: the cached run and version are reused
+    third = pipeline.train(max_depth=1)
+
+    assert (third["run_id"], third["version"]) == (second["run_id"], 2)
+    assert third["promoted_to_production"] is False
+    assert len(pipeline.client.search_runs(["0"])) == len(runs)
+    assert len(pipeline.client.search_model_versions()) == 2
+    assert production_and_staging(pipeline) == (1, 2)
+
+
+def test_main_warm_starts_a_larger_forest(pipeline):
+    first = pipeline.train(n_estimators=10)
+
+    second = pipeline.train(n_estimators=15)
+
+    assert second["warm_start"] == {"run_id": first["run_id"], "trees": 10}
+    assert second["params"]["n_estimators"] == 15
+    assert second["version"] == 2
+    tags = pipeline.client.get_run(second["run_id"]).data.tags
+    assert tags["warm_start_from_run"] == first["run_id"]
+
+
+def test_find_warm_start_needs_a_cache_and_a_single_candidate(pipeline):
+    train = pipeline.train_module
+    candidate = {"n_estimators": 10, "max_depth": 3, "random_state": 0}
+
+    assert train.find_warm_start(None, "v", "code", [candidate]) is None
+
+    class Cache:
+        def find_warm_start(self, data_version, code, params):
+            pytest.fail("sweeps never warm start")
+
+    assert train.find_warm_start(Cache(), "v", "code", [candidate] * 2) is None
@@ -0,0 +1,96 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+yaml = pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "common"))
+sys.path.insert(0, str(PROJECT_ROOT / "stages" / "validate"))
+data_profile = importlib.import_module("data_profile")
+validate = importlib.import_module("validate")
+
+CONFIG = {"bins": 10, "histogram_range": [-5.0, 5.0], "histogram_ranges": {}}
+
+
+def make_table(rng, n):
+    x = rng.normal(0.5, 2.0, n)
+    x[::17] = np.nan
+    return pa.table({"x": x, "target": rng.integers(0, 3, n)})
+
+
+def test_merged_chunks_match_single_pass():
+    rng = np.random.default_rng(0)
+    table = make_table(rng, 500)
+
+    whole = data_profile.summarize(data_profile.profile_table(table, CONFIG))
+    merged = None
+    for start in range(0, 500, 73):
+        chunk = data_profile.profile_table(table.slice(start, 73), CONFIG)
+        merged = data_profile.merge_profiles(merged, chunk)
+    merged = data_profile.summarize(merged)
+
+    x = table.column("x").to_numpy()
+    x = x[~np.isnan(x)]
+    d = x - x.mean()
+    stats = merged["columns"]["x"]
+    assert stats["nulls"] == whole["columns"]["x"]["nulls"] == 30
+    assert stats["mean"] == pytest.approx(x.mean())
+    assert stats["std"] == pytest.approx(x.std())
+    assert stats["skewness"] == pytest.approx((d**3).mean() / x.std() ** 3)
+    assert stats["kurtosis"] == pytest.approx((d**4).mean() / x.var() ** 2 - 3)
+    assert stats["histogram"] == whole["columns"]["x"]["histogram"]
+    assert merged["classes"] == whole["classes"]
+    assert sum(merged["classes"].values()) == 500
+
+
+def test_checks_report_failures():
+    table = pa.table({"x": [1.0, None, 20.0], "target": [0, 0, 1]})
+    report = data_profile.summarize(data_profile.profile_table(table, CONFIG))
+
+    failures = data_profile.run_checks(
+        report,
+        {
+            "required_columns": ["target", "y"],
+            "max_null_fraction": 0.0,
+            "min_class_count": 2,
+            "feature_ranges": {"x": [0, 10]},
+        },
+    )
+
+    assert len(failures) == 4
+    assert report["columns"]["x"]["histogram"]["overflow"] == 1
+
+
+def test_report_cached_by_partition_and_lock_md5(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for name in ("part-a", "part-b"):
+        pq.write_table(make_table(rng, 200), raw / f"{name}.parquet", row_group_size=64)
+    cache = tmp_path / "cache"
+
+    report, scanned = validate.build_report(raw, CONFIG, {}, cache, n_jobs=1)
+    assert scanned == 2
+    assert report["rows"] == 400
+
+    pq.write_table(make_table(rng, 50), raw / "part-c.parquet")
+    again, scanned = validate.build_report(raw, CONFIG, {}, cache, n_jobs=1)
+    assert scanned == 1
+    assert again["rows"] == 450
+
+    lock = tmp_path / "dvc.lock"
+    out = {"path": "data/raw/iris", "md5": "abc.dir"}
+    lock.write_text(yaml.safe_dump({"stages": {"ingest": {"outs": [out]}}}))
+    assert validate.get_input_md5(lock) == "abc.dir"
+
+    cached = cache / "reports" / "abc.dir.json"
+    validate.save_cached_report(again, cached)
+    assert validate.load_cached_report(cached, raw) == again
+    (raw / "part-c.parquet").unlink()
+    assert validate.load_cached_report(cached, raw) is None